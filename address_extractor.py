@@ -0,0 +1,150 @@
+import json
+import re
+from urllib.parse import urljoin, urlparse
+
+from bs4 import BeautifulSoup
+
+from http_fetch import fetch_text, normalize_url
+
+MAX_PAGES = 6  # Pages fetched per company, homepage included
+
+# Links worth following from the homepage, in Dutch, English and German
+CONTACT_LINK_RE = re.compile(
+    r'contact|about|over[-_ ]?ons|impressum|imprint|colofon|locati|office|kantoor|bezoek',
+    re.IGNORECASE
+)
+# Tried when the homepage doesn't link to anything useful
+FALLBACK_PATHS = ['/contact', '/contact-us', '/about', '/about-us', '/over-ons', '/impressum']
+
+# "Rozengracht 207, 1016 LZ Amsterdam": street + number, Dutch postcode, city.
+# The parts may be separated by commas, line breaks or spaces; a street never spans lines.
+NAME_CHARS = r"A-Za-zÀ-ÿ'.\-"
+CITY_CHARS = r"A-Za-zÀ-ÿ'\-"  # No '.', so "Amsterdam. All rights reserved" ends at the city
+# Lowercase words that may sit inside a street name ("Jan van Galenstraat")
+STREET_PARTICLES = r"(?:van|de|der|den|het|'t|ter|ten|aan|op|in|bij)"
+# Capitalized words that precede an address but are never part of the street
+LABEL_WORDS = (r"(?:Adres|Address|Bezoekadres|Postadres|Hoofdkantoor|Headquarters|Kantoor|Office|"
+               r"Locatie|Location|Visit|Call|Contact|Bezoek)")
+# A capitalized word ("Herengracht", "IJsbaanpad") or initials ("H.J.E."), but not
+# an all-caps word or legal form ("Acme BV Herengracht" keeps only "Herengracht")
+STREET_WORD = (rf"(?!{LABEL_WORDS}(?![{NAME_CHARS}]))"
+               rf"(?:(?:IJ|[A-ZÀ-Þ])[a-zß-ÿ][{NAME_CHARS}]*|(?!(?:B\.V|N\.V)\.)(?:[A-Z]\.){{1,4}})")
+COUNTRY_NAMES = r"(?i:(?:the[^\S\n])?(?:netherlands|nederland|holland|niederlande|nl))"
+ADDRESS_RE = re.compile(
+    rf"(?<![{NAME_CHARS}])"
+    rf"(?P<street>{STREET_WORD}(?:[^\S\n](?:{STREET_WORD}|{STREET_PARTICLES})){{0,4}}"
+    rf"[^\S\n]\d{{1,5}}(?:[^\S\n]?[A-Za-z](?![A-Za-z]))?(?:[-/]\d{{1,4}}[A-Za-z]?)?)"
+    rf"(?:[^\S\n]*[,\n][\s,]*|[^\S\n]+)"
+    rf"(?P<postcode>[1-9]\d{{3}}[^\S\n]?(?!SA|SD|SS)[A-Z]{{2}})\b[\s,]*"
+    rf"(?P<city>[A-ZÀ-Þ][{CITY_CHARS}]+(?:[^\S\n](?!{COUNTRY_NAMES}(?![{CITY_CHARS}]))[A-ZÀ-Þ][{CITY_CHARS}]+)?)"
+)
+TRAILING_COUNTRY_RE = re.compile(rf"[\s,]+{COUNTRY_NAMES}$")
+
+
+def format_address(street, postcode, city):
+    """Dutch format: 'Street 1, 1234 AB City'."""
+    postcode = re.sub(r'\s+', '', postcode).upper()
+    postcode = f"{postcode[:4]} {postcode[4:]}"
+    street = re.sub(r'\s+', ' ', street).strip(' ,')
+    city = TRAILING_COUNTRY_RE.sub('', re.sub(r'\s+', ' ', city)).strip(' ,.;:')
+    return f"{street}, {postcode} {city}"
+
+
+def _iter_json_ld_addresses(node):
+    if isinstance(node, list):
+        for item in node:
+            yield from _iter_json_ld_addresses(item)
+    elif isinstance(node, dict):
+        node_type = node.get('@type')
+        types = node_type if isinstance(node_type, list) else [node_type]
+        if 'PostalAddress' in types:
+            yield node
+        for value in node.values():
+            if isinstance(value, (dict, list)):
+                yield from _iter_json_ld_addresses(value)
+
+
+def find_schema_org_address(soup):
+    """PostalAddress from JSON-LD or microdata, if it has a Dutch postcode."""
+    candidates = []
+    for script in soup.find_all('script', type='application/ld+json'):
+        try:
+            data = json.loads(script.string or '')
+        except (json.JSONDecodeError, TypeError):
+            continue
+        candidates.extend(_iter_json_ld_addresses(data))
+
+    for scope in soup.find_all(itemtype=re.compile('PostalAddress')):
+        address = {}
+        for prop in ('streetAddress', 'postalCode', 'addressLocality'):
+            element = scope.find(itemprop=prop)
+            if element:
+                address[prop] = element.get('content') or element.get_text(' ', strip=True)
+        candidates.append(address)
+
+    for address in candidates:
+        street = str(address.get('streetAddress') or '')
+        postcode = str(address.get('postalCode') or '')
+        city = str(address.get('addressLocality') or '')
+        if street and city and re.fullmatch(r'[1-9]\d{3}\s?[A-Za-z]{2}', postcode.strip()):
+            return format_address(street, postcode, city)
+    return None
+
+
+def find_text_address(soup):
+    """First street + Dutch postcode + city found in the visible page text."""
+    for element in soup(['script', 'style', 'noscript']):
+        element.decompose()
+    text = soup.get_text('\n')
+    match = ADDRESS_RE.search(text)
+    if match:
+        return format_address(match.group('street'), match.group('postcode'), match.group('city'))
+    return None
+
+
+def find_candidate_pages(base_url, soup):
+    """Same-site contact/about/impressum links from the homepage, then common paths."""
+    host = urlparse(base_url).netloc.lower().removeprefix('www.')
+    pages = []
+    for link in soup.find_all('a', href=True):
+        url = urljoin(base_url, link['href']).split('#')[0]
+        if urlparse(url).netloc.lower().removeprefix('www.') != host:
+            continue
+        if CONTACT_LINK_RE.search(link['href']) or CONTACT_LINK_RE.search(link.get_text(' ', strip=True)):
+            pages.append(url)
+    pages.extend(urljoin(base_url, path) for path in FALLBACK_PATHS)
+    return list(dict.fromkeys(pages))
+
+
+def find_address_in_html(html):
+    soup = BeautifulSoup(html, 'html.parser')
+    return find_schema_org_address(soup) or find_text_address(soup)
+
+
+def find_address(website, fetch=fetch_text, max_pages=MAX_PAGES):
+    """Look for a Dutch street address on a company's own website without any LLM.
+
+    Checks the homepage and then its contact/about/impressum pages, preferring
+    schema.org PostalAddress markup over free-text matches. Returns the address
+    in Dutch format, or None if nothing was found.
+    """
+    base_url = normalize_url(website)
+    if not base_url:
+        return None
+    html = fetch(base_url)
+    if not html:
+        return None
+
+    soup = BeautifulSoup(html, 'html.parser')
+    candidate_pages = find_candidate_pages(base_url, soup)
+    address = find_schema_org_address(soup) or find_text_address(soup)
+    if address:
+        return address
+
+    for url in candidate_pages[:max_pages - 1]:
+        html = fetch(url)
+        if html:
+            address = find_address_in_html(html)
+            if address:
+                return address
+    return None
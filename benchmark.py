@@ -0,0 +1,398 @@
+"""Offline benchmark of every pipeline stage against local stand-ins.
+
+Nothing talks to Gmail, OpenAI or Serper. A fake Gmail service serves
+synthetic raw MIME messages, one local HTTP server plays an OpenAI-compatible
+LLM (used through LLM_PROVIDER=local and by crewai), the Serper search API
+(through SERPER_BASE_URL) and the company websites, and synthetic
+ai_companies*.csv files feed the company stages. Each stage runs the real
+code in a scratch directory, so a regression in any of them shows up as a
+change in this table:
+
+    python cli.py bench --emails 10000 --companies 40
+    python benchmark.py --stages gmail dedupe extraction --emails 100000 --llm-latency 0.5
+
+Latencies are per request and tunable. The per-stage p50/p95 report from
+metrics.py is printed afterwards; --output appends the results as JSON lines
+to track them over time. Cover letters need WeasyPrint and its system
+libraries; without them the letters stage reports that nothing was rendered.
+"""
+import argparse
+import contextlib
+import csv
+import json
+import os
+import random
+import re
+import shutil
+import sys
+import tempfile
+import time
+import zlib
+from email.utils import parseaddr, parsedate_to_datetime
+
+from filter_benchmark import CITIES, STREETS
+from stubs import BENCH_LABEL, CATEGORIES, FIRST_NAMES, LAST_NAMES, FakeGmailService, StubServer, synthetic_sender
+
+REPO_DIR = os.path.dirname(os.path.abspath(__file__))
+STAGES = ['gmail', 'dedupe', 'extraction', 'contacts', 'locations', 'amsterdam', 'recruitment', 'rank', 'analyze',
+          'letters']
+SITE_SERVERS = 8  # Company sites are spread over several host:port pairs, like real sites
+
+
+# Stub LLM, search and website server
+
+def contact_from_email_text(text):
+    """The recruiter fields a perfect extraction would return for an email in a prompt."""
+    sender = re.search(r'From: (.*)', text)
+    name, address = parseaddr(sender.group(1) if sender else '')
+    date = re.search(r'Date: (.*)', text)
+    try:
+        last_contact = parsedate_to_datetime(date.group(1).strip()).date().isoformat()
+    except (AttributeError, TypeError, ValueError):
+        last_contact = ''
+    role = re.search(r'have a (.+?) opening', text)
+    return {
+        'name': name,
+        'email': address,
+        'company': address.split('@')[-1].split('.')[0].title() if '@' in address else '',
+        'last_contact': last_contact,
+        'job_type': role.group(1) if role else '',
+    }
+
+
+def extraction_answer(prompt):
+    if '### Email ' in prompt:
+        sections = re.split(r'### Email (\S+)', prompt)[1:]
+        return json.dumps([dict(contact_from_email_text(text), message_id=message_id)
+                           for message_id, text in zip(sections[::2], sections[1::2])])
+    return json.dumps(contact_from_email_text(prompt))
+
+
+def crew_answer(messages):
+    """ReAct-style reply for crewai agents: one tool call if the agent has tools, then a final answer."""
+    system = messages[0]['content'] if messages else ''
+    conversation = '\n'.join(str(message.get('content') or '') for message in messages)
+    task_match = re.search(r'Current Task: (.*)', conversation)
+    task = task_match.group(1).strip() if task_match else ''
+    tools = re.findall(r"Tool Name: (.+)\nTool Arguments: \{'(\w+)'", system)
+    url = re.search(r'https?://[^\s)\'"]+', conversation)
+
+    # The format instructions mention 'Observation:' too; a tool result comes back as an assistant turn
+    if tools and not any(message.get('role') == 'assistant' for message in messages[1:]):
+        for tool_name, argument in tools:
+            if argument == 'website_url' and url:
+                value = url.group(0).rstrip('.,')
+                break
+            if argument == 'search_query':
+                value = task[:120]
+                break
+        else:
+            tool_name = None
+        if tool_name:
+            return (f"Thought: I should use a tool first\nAction: {tool_name}\n"
+                    f"Action Input: {json.dumps({argument: value})}")
+
+    lowered = task.lower()
+    digest = zlib.crc32(task.encode())
+    if 'career' in lowered or 'recruitment' in lowered:
+        answer = f"https://careers.example.com/{digest % 1000}"
+    elif 'address' in lowered:
+        if digest % 4 == 0:
+            answer = "Address Not Found"
+        else:
+            city, pc4 = CITIES[digest % len(CITIES)]
+            answer = f"{STREETS[digest % len(STREETS)]} {digest % 300 + 1}, {pc4} AB {city}"
+    else:
+        answer = ("Your work on explainable computer vision models stood out to me, and I would like to "
+                  "help build and deploy them in production.")
+    return f"Thought: I now know the final answer\nFinal Answer: {answer}"
+
+
+def company_page(index, path):
+    """HTML of a synthetic company site: the address on the homepage, on the contact page, or nowhere."""
+    city, pc4 = CITIES[index % len(CITIES)]
+    address = f"{STREETS[index % len(STREETS)]} {index % 300 + 1}, {pc4} AB {city}"
+    kind = index % 3
+    if path in ('', '/'):
+        footer = f"<footer><p>{address}</p></footer>" if kind == 0 else ''
+        return (f"<html><head><title>Company {index}</title></head><body><h1>Company {index}</h1>"
+                f"<p>We build AI products.</p><a href=\"contact\">Contact</a>{footer}</body></html>")
+    if path == '/contact' and kind == 1:
+        street, rest = address.split(', ')
+        postcode, city_name = rest[:7], rest[8:]
+        schema = json.dumps({'@context': 'https://schema.org', '@type': 'Organization', 'address': {
+            '@type': 'PostalAddress', 'streetAddress': street, 'postalCode': postcode, 'addressLocality': city_name}})
+        return (f"<html><head><script type=\"application/ld+json\">{schema}</script></head>"
+                f"<body><h1>Contact</h1></body></html>")
+    return None
+
+
+def delay(latency):
+    if latency:
+        # +-50% jitter around the configured mean
+        time.sleep(latency * (0.5 + random.random()))
+
+
+def stub_handler(llm_latency=0.0, search_latency=0.0, site_latency=0.0):
+    """StubServer handler for OpenAI-compatible /v1/chat/completions, Serper-compatible /search and /site/<n>/ pages."""
+    def handle(method, path, request):
+        if method == 'POST' and path.endswith('/chat/completions'):
+            delay(llm_latency)
+            messages = request.get('messages', [])
+            prompt = str(messages[-1].get('content') or '') if messages else ''
+            if 'recruiter email' in prompt:
+                text = extraction_answer(prompt)
+            else:
+                text = crew_answer(messages)
+            prompt_tokens = sum(len(str(message.get('content') or '')) for message in messages) // 4
+            return 200, {
+                'id': 'bench', 'object': 'chat.completion', 'created': int(time.time()),
+                'model': request.get('model', 'bench'),
+                'choices': [{'index': 0, 'message': {'role': 'assistant', 'content': text}, 'finish_reason': 'stop'}],
+                'usage': {'prompt_tokens': prompt_tokens, 'completion_tokens': len(text) // 4,
+                          'total_tokens': prompt_tokens + len(text) // 4},
+            }
+        if method == 'POST' and path.rstrip('/').rsplit('/', 1)[-1] in ('search', 'news'):
+            delay(search_latency)
+            query = str(request.get('q', ''))
+            digest = zlib.crc32(query.encode())
+            organic = [{
+                'title': f"{query[:40]} - result {position}",
+                'link': f"https://example{digest % 97}.nl/{position}",
+                'snippet': f"Office: Herengracht {position}, 1015 BA Amsterdam. Careers at example{digest % 97}.nl/careers",
+                'position': position,
+            } for position in range(1, int(request.get('num', 10)) + 1)]
+            return 200, {'searchParameters': {'q': query, 'type': 'search'}, 'organic': organic}
+        if method == 'POST':
+            return 404, {}
+        match = re.match(r'/site/(\d+)(/.*)?$', path.split('?')[0])
+        delay(site_latency)
+        page = company_page(int(match.group(1)), match.group(2) or '') if match else None
+        return (404, 'Not found') if page is None else (200, page)
+    return handle
+
+
+@contextlib.contextmanager
+def stub_servers(llm_latency=0.0, search_latency=0.0, site_latency=0.0, site_servers=SITE_SERVERS):
+    """Start the stub server plus extra site servers on free local ports; yields their base URLs."""
+    handler = stub_handler(llm_latency, search_latency, site_latency)
+    servers = [StubServer(handler) for _ in range(1 + site_servers)]
+    try:
+        yield [server.url for server in servers]
+    finally:
+        for server in servers:
+            server.close()
+
+
+# Synthetic company CSVs
+
+def company_rows(count, site_urls):
+    rows = []
+    for index in range(count):
+        city, pc4 = CITIES[index % len(CITIES)]
+        rows.append({
+            'Rank': index + 1,
+            'Name': f"Company {index}",
+            'Category': CATEGORIES[index % len(CATEGORIES)],
+            'Website': f"{site_urls[index % len(site_urls)]}/site/{index}/",
+            'address': f"{STREETS[index % len(STREETS)]} {index % 300 + 1}, {pc4} AB {city}",
+            'recruitment_page': f"https://careers.example.com/{index}",
+            'rank': str(index % 4),
+            'personalized_content': f"Your work on {CATEGORIES[index % len(CATEGORIES)]} is what I want to work on.",
+            'dear_name': f"{FIRST_NAMES[index % len(FIRST_NAMES)]} {LAST_NAMES[index % len(LAST_NAMES)]}",
+        })
+    return rows
+
+
+def write_csv(path, rows, columns):
+    with open(path, 'w', encoding='utf-8', newline='') as f:
+        writer = csv.DictWriter(f, fieldnames=columns, extrasaction='ignore')
+        writer.writeheader()
+        writer.writerows(rows)
+
+
+BASE_COLUMNS = ['Rank', 'Name', 'Category', 'Website']
+# Input file each company stage reads, and the columns the earlier stages would have added
+STAGE_INPUTS = {
+    'locations': ('ai_companies.csv', BASE_COLUMNS),
+    'amsterdam': ('ai_companies2.csv', BASE_COLUMNS + ['address']),
+    'recruitment': ('ai_companies3.csv', BASE_COLUMNS + ['address']),
+    'rank': ('ai_companies5.csv', BASE_COLUMNS + ['address', 'recruitment_page', 'rank']),
+    'analyze': ('ai_companies6.csv', BASE_COLUMNS + ['address', 'recruitment_page', 'rank']),
+    'letters': ('ai_companies8.csv', BASE_COLUMNS + ['personalized_content', 'dear_name']),
+}
+
+
+# Stages
+
+def configure_environment(llm_url, search_url, scratch_dir, verbose):
+    """Point every client at the stubs. Must run before the stage modules are imported."""
+    os.environ.update({
+        'LLM_PROVIDER': 'local',
+        'LLM_BASE_URL': f"{llm_url}/v1",
+        'OPENAI_API_KEY': 'bench',
+        'OPENAI_API_BASE': f"{llm_url}/v1",  # crewai / litellm
+        'OPENAI_MODEL_NAME': os.getenv('OPENAI_MODEL_NAME', 'gpt-4o-mini'),
+        'SERPER_API_KEY': 'bench',
+        'SERPER_BASE_URL': search_url,
+        # The stubs have no rate limits to respect; the limiters would only measure themselves
+        'LLM_REQUESTS_PER_MINUTE': '1000000',
+        'LLM_TOKENS_PER_MINUTE': '1000000000',
+        'CREW_RUNS_PER_MINUTE': '1000000',
+        'LOCATION_START_ROW': '0',  # Every synthetic company is new
+        'METRICS_FILE': os.path.join(scratch_dir, 'metrics.jsonl'),
+        'VERBOSITY': '2' if verbose else '0',
+        'CREWAI_DISABLE_TELEMETRY': 'true',
+        'OTEL_SDK_DISABLED': 'true',
+    })
+
+
+class Bench:
+    """Runs stages in a scratch directory, sharing emails and contacts between the email stages."""
+
+    def __init__(self, args, site_urls):
+        self.args = args
+        self.site_urls = site_urls
+        self.companies = company_rows(args.companies, site_urls)
+        self.service = FakeGmailService(args.emails, latency=args.gmail_latency, error_rate=args.gmail_error_rate)
+        self.emails = None
+        self.new_emails = None
+        self.extracted = None
+        self.store = None
+        self.sync_state = None
+
+    def prepare(self, stage):
+        """Untimed setup: synthetic inputs, and earlier email stages if they weren't selected."""
+        if stage in STAGE_INPUTS:
+            filename, columns = STAGE_INPUTS[stage]
+            rows = self.companies
+            if stage == 'analyze':
+                rows = [row for row in rows if row['rank'] != '0']
+            write_csv(filename, rows, columns)
+            if stage == 'letters':
+                shutil.copy(os.path.join(REPO_DIR, 'cover_letter.md'), 'cover_letter.md')
+        if stage in ('dedupe', 'extraction', 'contacts') and self.emails is None:
+            self.run('gmail')
+        if stage in ('extraction', 'contacts') and self.new_emails is None:
+            self.run('dedupe')
+        if stage == 'contacts' and self.extracted is None:
+            self.run('extraction')
+
+    def run(self, stage):
+        """Run one stage; returns the number of items it handled."""
+        import recruiter_app
+        if stage == 'gmail':
+            self.emails = recruiter_app.get_recruiter_emails(self.service, label_name=BENCH_LABEL, max_results=None)
+            return len(self.emails)
+        if stage == 'dedupe':
+            from contact_store import ContactStore
+            self.store = ContactStore('bench_contacts.sqlite')
+            # A third of the senders are already known contacts
+            senders = self.service.distinct_senders
+            self.store.upsert_many({'name': name, 'email': address} for name, address in (
+                synthetic_sender(sender, senders) for sender in range(0, senders, 3)))
+            self.sync_state = {'history_id': None, 'processed_ids': set()}
+            self.new_emails = list(recruiter_app.iter_new_emails(self.emails, self.store, self.sync_state))
+            return len(self.emails)
+        if stage == 'extraction':
+            self.extracted = list(recruiter_app.iter_extracted_recruiter_info(self.new_emails))
+            return len(self.extracted)
+        if stage == 'contacts':
+            recruiter_app.store_extracted_contacts(self.extracted, self.store, self.sync_state)
+            self.store.export_csv('recruiter_contacts.csv')
+            return len(self.extracted)
+
+        companies = len(self.companies)
+        if stage == 'locations':
+            import location_getter
+            location_getter.main()
+        elif stage == 'amsterdam':
+            import filter_amsterdam
+            filter_amsterdam.filter_amsterdam_companies()
+        elif stage == 'recruitment':
+            import recruitment_email
+            recruitment_email.main()
+        elif stage == 'rank':
+            import filter_companies
+            filter_companies.filter_companies()
+        elif stage == 'analyze':
+            import company_analyzer
+            company_analyzer.main()
+            companies = sum(1 for row in self.companies if row['rank'] != '0')
+        elif stage == 'letters':
+            import generate_cover_letters
+            generate_cover_letters.main()
+            output_dir = generate_cover_letters.OUTPUT_DIR
+            companies = sum(1 for name in os.listdir(output_dir) if name.endswith('.pdf'))
+            if not companies:
+                raise RuntimeError("no PDFs rendered (WeasyPrint missing?)")
+        return companies
+
+
+def run_benchmark(args):
+    results = []
+    with tempfile.TemporaryDirectory() as scratch_dir, \
+            stub_servers(args.llm_latency, args.search_latency, args.site_latency) as urls:
+        configure_environment(urls[0], urls[0], scratch_dir, args.verbose)
+        previous_dir = os.getcwd()
+        os.chdir(scratch_dir)
+        try:
+            bench = Bench(args, urls[1:])
+            print(f"{args.emails} emails, {args.companies} companies; latency llm {args.llm_latency}s, "
+                  f"search {args.search_latency}s, site {args.site_latency}s, gmail {args.gmail_latency}s")
+            print(f"{'stage':<14}{'items':>8}{'seconds':>10}{'items/s':>10}  status")
+            for stage in [stage for stage in STAGES if stage in args.stages]:
+                with open(os.devnull, 'w') as devnull, \
+                        contextlib.redirect_stdout(sys.stdout if args.verbose else devnull):
+                    status = 'ok'
+                    items = 0
+                    try:
+                        bench.prepare(stage)
+                        start = time.perf_counter()
+                        items = bench.run(stage)
+                    except Exception as e:
+                        status = f"failed: {str(e).splitlines()[0][:100] if str(e) else type(e).__name__}"
+                    elapsed = time.perf_counter() - start if status == 'ok' else 0.0
+                rate = items / elapsed if elapsed else 0.0
+                print(f"{stage:<14}{items:>8}{elapsed:>10.2f}{rate:>10.1f}  {status}")
+                results.append({'stage': stage, 'items': items, 'seconds': round(elapsed, 3),
+                                'items_per_second': round(rate, 2), 'status': status})
+
+            import metrics
+            metrics.flush()
+            print()
+            metrics.print_report(metrics.METRICS_FILE)
+        finally:
+            os.chdir(previous_dir)
+
+    if args.output:
+        settings = {key: getattr(args, key) for key in (
+            'emails', 'companies', 'llm_latency', 'search_latency', 'site_latency', 'gmail_latency')}
+        timestamp = time.strftime('%Y-%m-%dT%H:%M:%S')
+        with open(args.output, 'a', encoding='utf-8') as f:
+            for result in results:
+                f.write(json.dumps(dict(result, settings=settings, timestamp=timestamp)) + '\n')
+    return 1 if any(result['status'] != 'ok' for result in results) else 0
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="Offline benchmark of the pipeline stages against local stubs")
+    parser.add_argument('--stages', nargs='+', choices=STAGES, default=STAGES, help='Stages to time (default: all)')
+    parser.add_argument('--emails', type=int, default=1000, help='Synthetic messages in the fake Gmail label')
+    parser.add_argument('--companies', type=int, default=20, help='Synthetic companies per company stage')
+    parser.add_argument('--llm-latency', type=float, default=0.2, help='Mean seconds per LLM request')
+    parser.add_argument('--search-latency', type=float, default=0.1, help='Mean seconds per search request')
+    parser.add_argument('--site-latency', type=float, default=0.02, help='Mean seconds per company web page')
+    parser.add_argument('--gmail-latency', type=float, default=0.05, help='Seconds per Gmail list/batch call')
+    parser.add_argument('--gmail-error-rate', type=float, default=0.0, help='Share of batched messages answered 429')
+    parser.add_argument('--output', help='Append results as JSON lines to this file')
+    parser.add_argument('--verbose', action='store_true', help="Show the stages' own output")
+    return parser
+
+
+def main(argv=None):
+    return run_benchmark(build_parser().parse_args(argv))
+
+
+if __name__ == "__main__":
+    sys.exit(main())
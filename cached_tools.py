@@ -0,0 +1,92 @@
+import os
+import re
+import threading
+from typing import Any
+
+from bs4 import BeautifulSoup
+from crewai_tools import ScrapeWebsiteTool, SerperDevTool
+
+from http_fetch import fetch_text
+from metrics import add
+from sqlite_cache import SQLiteCache, make_cache_key
+
+MAX_PAGE_CHARS = 20000  # Keeps a single page from flooding the agent's context
+SEARCH_CACHE_FILE = 'search_cache.sqlite'  # Serper responses shared by every script
+SEARCH_CACHE_TTL_DAYS = int(os.getenv('SEARCH_CACHE_TTL_DAYS', '30'))
+SEARCH_CACHE_MAX_ENTRIES = 20000
+SERPER_BASE_URL = os.getenv('SERPER_BASE_URL', 'https://google.serper.dev')  # Or a Serper-compatible stand-in
+
+_search_cache = None
+_search_cache_lock = threading.Lock()
+
+
+def get_search_cache():
+    """Process-wide search cache, so hit rates add up across tool instances."""
+    global _search_cache
+    with _search_cache_lock:
+        if _search_cache is None:
+            _search_cache = SQLiteCache(
+                SEARCH_CACHE_FILE,
+                ttl_seconds=SEARCH_CACHE_TTL_DAYS * 86400,
+                max_entries=SEARCH_CACHE_MAX_ENTRIES
+            )
+        return _search_cache
+
+
+def normalize_query(query):
+    """Case- and whitespace-insensitive form of a search query for cache keys."""
+    return re.sub(r'\s+', ' ', str(query or '')).strip().lower()
+
+
+def search_cache_report():
+    """One-line summary of search cache hits for the end of a run."""
+    stats = get_search_cache().stats()
+    return (f"Search cache: {stats['hits']} hits, {stats['misses']} misses "
+            f"({stats['hit_rate']:.0%} hit rate, {stats['entries']} entries)")
+
+
+class CachedSerperDevTool(SerperDevTool):
+    """Drop-in SerperDevTool that stores responses in a local SQLite cache.
+
+    Responses are keyed on the normalised query plus every parameter that
+    changes the result (type, result count, country, location, locale), kept
+    for SEARCH_CACHE_TTL_DAYS and evicted least-recently-used. base_url
+    defaults to SERPER_BASE_URL, so another search backend (e.g. the stub in
+    benchmark.py) can be used without code changes.
+    """
+
+    base_url: str = SERPER_BASE_URL
+
+    def _make_api_request(self, search_query: str, search_type: str) -> dict:
+        cache = get_search_cache()
+        cache_key = make_cache_key(
+            'serper', self.base_url, normalize_query(search_query), search_type.lower(),
+            self.n_results, self.country, self.location, self.locale)
+        results = cache.get(cache_key)
+        if results is None:
+            add('cache_misses')
+            add('search_calls')
+            results = super()._make_api_request(search_query, search_type)
+            cache.set(cache_key, results)
+        else:
+            add('cache_hits')
+        return results
+
+
+class CachedScrapeWebsiteTool(ScrapeWebsiteTool):
+    """ScrapeWebsiteTool that reads pages through the shared http_fetch layer.
+
+    Pages already fetched by other stages (or earlier runs) come from the
+    on-disk cache instead of being downloaded again.
+    """
+
+    def _run(self, **kwargs: Any) -> Any:
+        website_url = kwargs.get("website_url", self.website_url)
+        html = fetch_text(website_url)
+        if html is None:
+            return f"Could not read {website_url}"
+
+        text = BeautifulSoup(html, "html.parser").get_text(" ")
+        text = re.sub("[ \t]+", " ", text)
+        text = re.sub("\\s+\n\\s+", "\n", text)
+        return text[:MAX_PAGE_CHARS]
@@ -0,0 +1,65 @@
+"""Single entry point for every pipeline stage: python cli.py <command>.
+
+Stage modules are imported only when their command runs, so `--help`, the
+CSV filters and the import benchmark start without loading crewai, pandas,
+weasyprint or the Google client libraries.
+"""
+import argparse
+import importlib
+import sys
+
+# command -> (module, function, help text), in pipeline order
+COMMANDS = {
+    'emails': ('recruiter_app', 'main', 'Extract recruiter contacts from the Gmail Recruiters label'),
+    'locations': ('location_getter', 'main', 'Find office addresses (ai_companies -> ai_companies2)'),
+    'amsterdam': ('filter_amsterdam', 'filter_amsterdam_companies', 'Keep Amsterdam companies (-> ai_companies3)'),
+    'recruitment': ('recruitment_email', 'main', 'Find career pages (-> ai_companies4)'),
+    'rank': ('filter_companies', 'filter_companies', 'Drop companies ranked 0 (ai_companies5 -> ai_companies6)'),
+    'analyze': ('company_analyzer', 'main', 'Write personalised cover letter sentences (-> ai_companies7)'),
+    'letters': ('generate_cover_letters', 'main', 'Render cover letter PDFs from ai_companies8'),
+    'metrics': ('metrics', 'print_report', 'Latency, token and cost per stage for the latest run (metrics.jsonl)'),
+}
+
+
+def load_command(name):
+    """Import a command's module and return its entry point."""
+    module_name, function_name, _ = COMMANDS[name]
+    return getattr(importlib.import_module(module_name), function_name)
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="Job search agent pipeline")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    for name, (_, _, help_text) in COMMANDS.items():
+        subparsers.add_parser(name, help=help_text)
+
+    # Listed for --help only; its arguments are handled by pipeline.main
+    subparsers.add_parser('pipeline', help='Incremental DAG over all company stages (pipeline --help for more)')
+    # Likewise handled by benchmark.main
+    subparsers.add_parser('bench', help='Time every stage offline against stub Gmail, LLM and search (bench --help)')
+
+    bench = subparsers.add_parser('bench-imports', help='Measure startup import time of each command')
+    bench.add_argument('commands', nargs='*', help='Commands to measure (default: all)')
+    bench.add_argument('--repeat', type=int, default=3, help='Runs per command; the median is reported')
+    bench.add_argument('--top', type=int, default=3, help='Heaviest imports listed per command')
+    bench.add_argument('--output', help='Append results as JSON lines to this file, to track startup over time')
+    return parser
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    if argv and argv[0] == 'pipeline':
+        from pipeline import main as pipeline_main
+        return pipeline_main(argv[1:])
+    if argv and argv[0] == 'bench':
+        from benchmark import main as benchmark_main
+        return benchmark_main(argv[1:])
+    args = build_parser().parse_args(argv)
+    if args.command == 'bench-imports':
+        from import_benchmark import run_benchmark
+        return run_benchmark(args.commands or list(COMMANDS), args.repeat, args.top, args.output)
+    return load_command(args.command)()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
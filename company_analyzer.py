@@ -1,42 +1,48 @@
+import asyncio
 import os
-from crewai import Agent, Task, Crew, Process
-from crewai_tools import SerperDevTool
+from crew_runner import CrewRunner, result_text
+from llm_client import llm_rate_limiter
+from metrics import CREW_VERBOSE, log
 from dotenv import load_dotenv
-import pandas as pd
 
 # Load environment variables
 load_dotenv()
 
-# Initialize tools
-search_tool = SerperDevTool()
+ANALYSIS_WORKERS = int(os.getenv('ANALYSIS_WORKERS', '4'))  # Crew runs in flight at once
 
-# Create agents
-company_researcher = Agent(
-    role="Company Research Specialist",
-    goal="Research and analyze companies to find their key AI focus areas and achievements",
-    backstory="""You are an expert at analyzing AI companies and their technological focus.
-    You excel at identifying key themes, achievements, and unique selling points of AI companies.""",
-    tools=[search_tool],
-    verbose=True
-)
+def build_analysis_crew():
+    """Research + writing crew; {company_name}, {website} and {category} are filled in per run."""
+    # crewai and its tools take seconds to import, so they load with the first crew
+    from crewai import Agent, Task, Crew, Process
+    from cached_tools import CachedSerperDevTool
+    search_tool = CachedSerperDevTool()  # Search results cached on disk across runs and scripts
 
-content_generator = Agent(
-    role="Cover Letter Content Refiner",
-    goal="Craft concise, professional, and genuinely interested sentences for a cover letter, specifically highlighting the company's AI focus and expressing a desire to work on their specific AI implementations.",
-    backstory="""You are an expert at creating direct, authentic, and professional content for cover letters, specifically for a Dutch business audience.
-    You understand that the tone should be respectful, straightforward, and avoid hyperbole or marketing jargon.
-    Your primary focus is to demonstrate that the applicant has researched the company's specific AI work and is keen to engage with their technology in a hands-on capacity.
-    You will avoid repeating known product features back to the company.
-    You will never fabricate details about the applicant's past achievements or make generic "aligns with my interests" statements.
-    Instead, you will formulate sentences that convey a genuine desire to learn from and contribute to their specific AI projects and implementations.""",
-    tools=[search_tool],
-    verbose=True
-)
+    # Create agents
+    company_researcher = Agent(
+        role="Company Research Specialist",
+        goal="Research and analyze companies to find their key AI focus areas and achievements",
+        backstory="""You are an expert at analyzing AI companies and their technological focus.
+        You excel at identifying key themes, achievements, and unique selling points of AI companies.""",
+        tools=[search_tool],
+        verbose=CREW_VERBOSE
+    )
+
+    content_generator = Agent(
+        role="Cover Letter Content Refiner",
+        goal="Craft concise, professional, and genuinely interested sentences for a cover letter, specifically highlighting the company's AI focus and expressing a desire to work on their specific AI implementations.",
+        backstory="""You are an expert at creating direct, authentic, and professional content for cover letters, specifically for a Dutch business audience.
+        You understand that the tone should be respectful, straightforward, and avoid hyperbole or marketing jargon.
+        Your primary focus is to demonstrate that the applicant has researched the company's specific AI work and is keen to engage with their technology in a hands-on capacity.
+        You will avoid repeating known product features back to the company.
+        You will never fabricate details about the applicant's past achievements or make generic "aligns with my interests" statements.
+        Instead, you will formulate sentences that convey a genuine desire to learn from and contribute to their specific AI projects and implementations.""",
+        tools=[search_tool],
+        verbose=CREW_VERBOSE
+    )
 
-def analyze_company(company_name, website, category):
     # Create research task
     research_task = Task(
-        description=f"""Research {company_name} ({website}) focusing on their AI initiatives and achievements.
+        description="""Research {company_name} ({website}) focusing on their AI initiatives and achievements.
         Pay special attention to their work in {category}.
         Find specific examples of their AI work and any notable achievements.
         Return a concise summary of their key AI focus areas and achievements.""",
@@ -46,7 +52,7 @@ def analyze_company(company_name, website, category):
 
     # Create content generation task
     content_task = Task(
-        description=f"""Using the research about {company_name} (focusing on their specific AI work found by the Company Research Specialist), create 1-2 concise sentences for a cover letter.
+        description="""Using the research about {company_name} (focusing on their specific AI work found by the Company Research Specialist), create 1-2 concise sentences for a cover letter.
         The sentences must:
         1.  Clearly indicate that you have researched and understand a *specific aspect* of their AI implementation or focus (e.g., their approach to explainability, a particular AI tool they use, or a domain-specific AI solution). Do not simply state their product features back to them.
         2.  Express a professional and direct interest in working *with* or *on* this specific AI technology at their company.
@@ -62,18 +68,44 @@ def analyze_company(company_name, website, category):
     )
 
     # Create crew
-    crew = Crew(
+    return Crew(
         agents=[company_researcher, content_generator],
         tasks=[research_task, content_task],
         process=Process.sequential,
-        verbose=True
+        verbose=CREW_VERBOSE
     )
 
-    # Execute crew
-    result = crew.kickoff()
-    return result
+# Built once per worker thread and reused for every company; concurrent crews
+# share the process-wide LLM rate limit
+analysis_runner = CrewRunner(build_analysis_crew, name='analysis.crew', llm_rate_limiter=llm_rate_limiter)
+
+def crew_inputs(company_name, website, category):
+    return {'company_name': str(company_name), 'website': str(website), 'category': str(category)}
+
+def analyze_company(company_name, website, category):
+    return result_text(analysis_runner.kickoff(crew_inputs(company_name, website, category)))
+
+def analyze_companies(rows):
+    """Analyze (name, website, category) rows concurrently, returning results in order.
+
+    A company whose crew failed gets None, so one failure doesn't throw away
+    the rest of the batch.
+    """
+    outputs = asyncio.run(analysis_runner.kickoff_for_each_async(
+        [crew_inputs(*row) for row in rows], concurrency=ANALYSIS_WORKERS, return_exceptions=True))
+    results = []
+    for (company_name, _, _), output in zip(rows, outputs):
+        if isinstance(output, BaseException):
+            print(f"Error analyzing {company_name}: {str(output)}")
+            results.append(None)
+        else:
+            results.append(result_text(output))
+    return results
 
 def main():
+    import pandas as pd
+    from cached_tools import search_cache_report
+    
     # Read the CSV file
     df = pd.read_csv('ai_companies6.csv')
     
@@ -84,18 +116,19 @@ def main():
     # Add a new column for the personalized content
     df_subset['personalized_content'] = None
     
-    # Process each company
-    for index, row in df_subset.iterrows():
-        print(f"\nProcessing {row['Name']}...")
-        personalized_content = analyze_company(row['Name'], row['Website'], row['Category'])
-        df_subset.at[index, 'personalized_content'] = personalized_content
-        print(f"\nPersonalized content for {row['Name']}:")
-        print(personalized_content)
-        print("\n" + "="*80)
+    # Process all companies through the prebuilt crew
+    rows = list(zip(df_subset['Name'], df_subset['Website'], df_subset['Category']))
+    df_subset['personalized_content'] = analyze_companies(rows)
+    failed = df_subset['personalized_content'].isna().sum()
+    if failed:
+        print(f"{failed} companies could not be analyzed and have no personalized content")
+    for name, personalized_content in zip(df_subset['Name'], df_subset['personalized_content']):
+        log(f"\nPersonalized content for {name}:\n{personalized_content}\n\n" + "="*80)
     
     # Save to new CSV file
     df_subset.to_csv('ai_companies7.csv', index=False)
     print("\nResults saved to ai_companies7.csv")
+    print(search_cache_report())
 
 if __name__ == "__main__":
     main() 
\ No newline at end of file
@@ -0,0 +1,221 @@
+import csv
+import os
+import sqlite3
+import threading
+from datetime import datetime, timezone
+from email.utils import parseaddr, parsedate_to_datetime
+
+LINKEDIN_INMAIL = 'inmail-hit-reply@linkedin.com'
+CONTACT_FIELDS = ['name', 'email', 'company', 'last_contact', 'job_type']
+
+# Domains that deliver to the same mailbox
+DOMAIN_ALIASES = {
+    'googlemail.com': 'gmail.com'
+}
+# Known alternative addresses of the same recruiter, mapped to the address we keep
+SENDER_ALIASES = {}
+# What LinkedIn appends to the display name of InMail senders
+LINKEDIN_NAME_SUFFIXES = (' via linkedin', ' (linkedin)', ' | linkedin')
+
+
+def normalize_email(address):
+    """Reduce an address or a full From header to a canonical lowercase address.
+
+    Display names are dropped, plus-addressing tags are removed and known
+    domain/sender aliases are mapped, so 'Jane <Jane+jobs@GoogleMail.com>'
+    and 'jane@gmail.com' normalise to the same key.
+    """
+    email = parseaddr(address or '')[1].lower().strip()
+    if '@' not in email:
+        return email
+    local, domain = email.rsplit('@', 1)
+    local = local.split('+', 1)[0]
+    domain = DOMAIN_ALIASES.get(domain, domain)
+    email = f"{local}@{domain}"
+    return SENDER_ALIASES.get(email, email)
+
+
+def normalize_name(name):
+    """Lowercase a sender name and strip LinkedIn's InMail decoration."""
+    name = (name or '').lower().strip().strip('"')
+    for suffix in LINKEDIN_NAME_SUFFIXES:
+        if name.endswith(suffix):
+            name = name[:-len(suffix)].strip()
+    return name
+
+
+def normalize_date(value):
+    """Reduce an ISO 8601 or RFC 2822 date to an ISO 'YYYY-MM-DD' date in UTC.
+
+    last_contact is compared as a string (MAX in SQL), which only orders
+    dates correctly when they all share this form. Unparseable values are
+    kept as they are.
+    """
+    value = str(value or '').strip()
+    if not value:
+        return ''
+    try:
+        parsed = datetime.fromisoformat(value)
+    except ValueError:
+        try:
+            parsed = parsedate_to_datetime(value)
+        except (TypeError, ValueError):
+            return value
+    if parsed.tzinfo is not None:
+        parsed = parsed.astimezone(timezone.utc)
+    return parsed.date().isoformat()
+
+
+def parse_sender(header):
+    """Split a From header into normalised (name, email) keys."""
+    name, _ = parseaddr(header or '')
+    return normalize_name(name), normalize_email(header)
+
+
+def contact_keys(contact):
+    """Normalised (name, email) lookup keys for a contact."""
+    return normalize_name(contact.get('name')), normalize_email(contact.get('email'))
+
+
+class ContactStore:
+    """Recruiter contacts in SQLite with unique indexes for deduplication.
+
+    Regular contacts are unique by normalised email (see normalize_email).
+    LinkedIn InMail contacts all share one relay address, so they are unique
+    by (name, email) instead. Both indexes are enforced by SQLite, so
+    concurrent runs cannot insert the same contact twice.
+    """
+
+    def __init__(self, path='recruiter_contacts.sqlite'):
+        self.path = path
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(path, timeout=30, check_same_thread=False, isolation_level=None)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS contacts (
+                id INTEGER PRIMARY KEY,
+                name TEXT NOT NULL DEFAULT '',
+                email TEXT NOT NULL DEFAULT '',
+                company TEXT NOT NULL DEFAULT '',
+                last_contact TEXT NOT NULL DEFAULT '',
+                job_type TEXT NOT NULL DEFAULT '',
+                name_key TEXT NOT NULL,
+                email_key TEXT NOT NULL
+            )
+        """)
+        self.conn.execute(f"""
+            CREATE UNIQUE INDEX IF NOT EXISTS contacts_email
+            ON contacts (email_key) WHERE email_key != '{LINKEDIN_INMAIL}'
+        """)
+        self.conn.execute(f"""
+            CREATE UNIQUE INDEX IF NOT EXISTS contacts_linkedin
+            ON contacts (name_key, email_key) WHERE email_key = '{LINKEDIN_INMAIL}'
+        """)
+        self._normalize_stored_dates()
+
+    def _normalize_stored_dates(self):
+        """Rewrite last_contact values stored before dates were normalised (e.g. RFC 2822)."""
+        with self.lock:
+            rows = self.conn.execute(
+                "SELECT id, last_contact FROM contacts "
+                "WHERE last_contact != '' AND last_contact NOT GLOB '[0-9][0-9][0-9][0-9]-[0-9][0-9]-[0-9][0-9]'"
+            ).fetchall()
+            updates = [(normalize_date(value), row_id) for row_id, value in rows if normalize_date(value) != value]
+            if updates:
+                self.conn.execute("BEGIN IMMEDIATE")
+                self.conn.executemany("UPDATE contacts SET last_contact = ? WHERE id = ?", updates)
+                self.conn.execute("COMMIT")
+
+    def _find(self, name_key, email_key):
+        if email_key == LINKEDIN_INMAIL:
+            return self.conn.execute(
+                "SELECT id FROM contacts WHERE name_key = ? AND email_key = ?",
+                (name_key, email_key)).fetchone()
+        return self.conn.execute(
+            f"SELECT id FROM contacts WHERE email_key = ? AND email_key != '{LINKEDIN_INMAIL}'",
+            (email_key,)).fetchone()
+
+    def has_email(self, email):
+        """Whether a regular (non-InMail) contact with this email exists."""
+        email_key = normalize_email(email)
+        if email_key == LINKEDIN_INMAIL:
+            return False
+        with self.lock:
+            return self._find('', email_key) is not None
+
+    def has_linkedin_contact(self, name):
+        """Whether a LinkedIn InMail contact with this name exists."""
+        with self.lock:
+            return self._find(normalize_name(name), LINKEDIN_INMAIL) is not None
+
+    def upsert(self, contact):
+        """Insert a contact, or merge it into the existing one. Returns True if it was new."""
+        name_key, email_key = contact_keys(contact)
+        if not email_key:
+            return False
+        values = {field: contact.get(field) or '' for field in CONTACT_FIELDS}
+        values['last_contact'] = normalize_date(values['last_contact'])
+
+        with self.lock:
+            # IMMEDIATE takes the write lock up front, so the existence check and
+            # the write are atomic with respect to other processes
+            self.conn.execute("BEGIN IMMEDIATE")
+            try:
+                existing = self._find(name_key, email_key)
+                if existing is None:
+                    self.conn.execute("""
+                        INSERT INTO contacts (name, email, company, last_contact, job_type, name_key, email_key)
+                        VALUES (:name, :email, :company, :last_contact, :job_type, :name_key, :email_key)
+                    """, dict(values, name_key=name_key, email_key=email_key))
+                else:
+                    self.conn.execute("""
+                        UPDATE contacts SET
+                            name = CASE WHEN :name != '' THEN :name ELSE name END,
+                            company = CASE WHEN :company != '' THEN :company ELSE company END,
+                            job_type = CASE WHEN :job_type != '' THEN :job_type ELSE job_type END,
+                            last_contact = MAX(last_contact, :last_contact)
+                        WHERE id = :id
+                    """, dict(values, id=existing[0]))
+                self.conn.execute("COMMIT")
+            except Exception:
+                self.conn.execute("ROLLBACK")
+                raise
+        return existing is None
+
+    def upsert_many(self, contacts):
+        """Upsert several contacts, returning how many were new."""
+        return sum(self.upsert(contact) for contact in contacts)
+
+    def import_csv(self, filename):
+        """Load contacts from a recruiter_contacts.csv style file. Returns how many were new."""
+        with open(filename, 'r', encoding='utf-8') as csvfile:
+            return self.upsert_many(csv.DictReader(csvfile))
+
+    def export_csv(self, filename):
+        """Write all contacts to CSV (atomically), in insertion order. Returns the row count."""
+        temp_filename = f"{filename}.tmp"
+        with self.lock:
+            rows = self.conn.execute(
+                f"SELECT {', '.join(CONTACT_FIELDS)} FROM contacts ORDER BY id").fetchall()
+        with open(temp_filename, 'w', newline='', encoding='utf-8') as csvfile:
+            writer = csv.writer(csvfile)
+            writer.writerow(CONTACT_FIELDS)
+            writer.writerows(rows)
+        os.replace(temp_filename, filename)
+        return len(rows)
+
+    def counts(self):
+        """Number of regular and LinkedIn InMail contacts."""
+        with self.lock:
+            linkedin = self.conn.execute(
+                "SELECT COUNT(*) FROM contacts WHERE email_key = ?", (LINKEDIN_INMAIL,)).fetchone()[0]
+            total = self.conn.execute("SELECT COUNT(*) FROM contacts").fetchone()[0]
+        return {'regular': total - linkedin, 'linkedin': linkedin}
+
+    def __len__(self):
+        with self.lock:
+            return self.conn.execute("SELECT COUNT(*) FROM contacts").fetchone()[0]
+
+    def close(self):
+        with self.lock:
+            self.conn.close()
@@ -0,0 +1,140 @@
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from llm_client import estimate_tokens
+from metrics import add_llm_usage, event, span
+
+_build_lock = threading.Lock()
+
+
+def result_text(output):
+    """Plain text of a crew result (CrewOutput is not a str)."""
+    if output is None:
+        return ''
+    return str(getattr(output, 'raw', output))
+
+
+def crew_usage(crew):
+    """Cumulative (prompt tokens, completion tokens, requests) of every agent in a crew."""
+    usage = crew.calculate_usage_metrics()
+    return usage.prompt_tokens, usage.completion_tokens, usage.successful_requests
+
+
+def limit_llm_calls(crew, rate_limiter):
+    """Make every LLM call of the crew's agents take a slot (and its prompt's tokens) from rate_limiter."""
+    llms = {id(agent.llm): agent.llm for agent in crew.agents if agent.llm is not None}
+    for llm in llms.values():
+        call = llm.call
+
+        def limited_call(messages, *args, _call=call, **kwargs):
+            rate_limiter.acquire(estimate_tokens(str(messages)))
+            return _call(messages, *args, **kwargs)
+        llm.call = limited_call
+
+
+def crew_model(crew):
+    llm = crew.agents[0].llm if crew.agents else None
+    return getattr(llm, 'model', llm)
+
+
+class CrewRunner:
+    """Runs one prebuilt crew for many companies.
+
+    build_crew is a factory returning a Crew whose task descriptions use
+    {placeholders} (e.g. {company_name}); each kickoff fills them in through
+    crewai's input interpolation instead of constructing new Task and Crew
+    objects. crewai crews are not safe to run concurrently, so every worker
+    thread builds its own crew on first use and reuses it afterwards.
+
+    If a rate_limiter is given, every kickoff takes a slot from it first; an
+    llm_rate_limiter is applied to each LLM call the crew's agents make, so
+    concurrent crews share the process-wide LLM limits (see llm_client).
+
+    Every kickoff is recorded as a metrics span named `name`, with the tokens
+    the crew used; each task (per agent) and agent step is recorded under it.
+    """
+
+    def __init__(self, build_crew, rate_limiter=None, name=None, llm_rate_limiter=None):
+        self.build_crew = build_crew
+        self.rate_limiter = rate_limiter
+        self.llm_rate_limiter = llm_rate_limiter
+        self.name = name or build_crew.__name__
+        self._local = threading.local()
+
+    def crew(self):
+        """The current thread's crew, built on first use."""
+        if not hasattr(self._local, 'crew'):
+            # Builds are serialised: the first one imports crewai, which is not
+            # something to race on from several threads
+            with _build_lock:
+                crew = self.build_crew()
+            if self.llm_rate_limiter is not None:
+                limit_llm_calls(crew, self.llm_rate_limiter)
+            crew.step_callback = self.record_step
+            crew.task_callback = self.record_task
+            self._local.crew = crew
+        return self._local.crew
+
+    def record_step(self, step):
+        now = time.perf_counter()
+        event('step', tool=getattr(step, 'tool', None) or type(step).__name__,
+              seconds=round(now - self._local.step_mark, 4))
+        self._local.step_mark = now
+
+    def record_task(self, output):
+        # Tasks run one after another, so the usage since the last task is this task's
+        now = time.perf_counter()
+        usage = crew_usage(self._local.crew)
+        previous = self._local.task_usage
+        event('task', agent=str(getattr(output, 'agent', '')), seconds=round(now - self._local.task_mark, 4),
+              llm_calls=usage[2] - previous[2], input_tokens=usage[0] - previous[0],
+              output_tokens=usage[1] - previous[1])
+        self._local.task_mark = now
+        self._local.task_usage = usage
+
+    def kickoff(self, inputs):
+        if self.rate_limiter is not None:
+            self.rate_limiter.acquire()
+        crew = self.crew()
+        with span(self.name, item=inputs.get('company_name')):
+            # Agents' token counters are cumulative, and this thread's crew only runs one kickoff at a time
+            start = crew_usage(crew)
+            self._local.task_usage = start
+            self._local.step_mark = self._local.task_mark = time.perf_counter()
+            try:
+                return crew.kickoff(inputs=inputs)
+            finally:
+                end = crew_usage(crew)
+                add_llm_usage(crew_model(crew), end[0] - start[0], end[1] - start[1], calls=end[2] - start[2])
+
+    def kickoff_for_each(self, inputs_list, workers=1, return_exceptions=False):
+        """Run the crew once per inputs dict, returning results in input order.
+
+        With return_exceptions, a failed run's exception is returned in its
+        slot instead of being raised.
+        """
+        def run(inputs):
+            try:
+                return self.kickoff(inputs)
+            except Exception as e:
+                if not return_exceptions:
+                    raise
+                return e
+
+        if workers <= 1:
+            return [run(inputs) for inputs in inputs_list]
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            return list(executor.map(run, inputs_list))
+
+    async def kickoff_for_each_async(self, inputs_list, concurrency=4, return_exceptions=False):
+        """Async kickoff_for_each: at most `concurrency` runs in flight at once."""
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def run(inputs):
+            async with semaphore:
+                return await asyncio.to_thread(self.kickoff, inputs)
+
+        return await asyncio.gather(*(run(inputs) for inputs in inputs_list),
+                                    return_exceptions=return_exceptions)
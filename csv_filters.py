@@ -0,0 +1,115 @@
+"""Streaming CSV filters that compose into a single pass over a file.
+
+Rows are read, tested and written in fixed-size chunks, so memory stays
+constant no matter how large the company list is. Filters are built from a
+column name and bound to the file's header once. A column_predicate tests one
+value at a time; a column_mask tests a whole chunk's column in one call,
+which is how the vectorized geo-index check runs:
+
+    filter_csv('ai_companies2.csv', 'ai_companies3.csv', column_mask('address', amsterdam_area().mask))
+    filter_csv('ai_companies5.csv', 'ai_companies6.csv', column_predicate('rank', is_ranked))
+
+Kept records are copied as the input lines, byte for byte, unless a chunk
+holds a record that spans lines; only then is it written back through csv.
+
+What counts as Amsterdam is decided by filter_amsterdam.amsterdam_area (the
+geo index); this module only knows about columns and rows.
+"""
+import csv
+import os
+from itertools import compress, islice, tee
+from operator import itemgetter
+
+CHUNK_ROWS = int(os.getenv('CSV_FILTER_CHUNK_ROWS', '4096'))  # Rows tested and written per batch
+
+
+def column_index(header, name):
+    """Position of a column by header name, exact match first, then case-insensitive."""
+    if name in header:
+        return header.index(name)
+    lowered = [column.strip().lower() for column in header]
+    if name.lower() in lowered:
+        return lowered.index(name.lower())
+    raise KeyError(f"No column named {name!r} in {header}")
+
+
+def column_values(rows, index):
+    """The values at index for a chunk of rows; short rows count as an empty value."""
+    if min(map(len, rows), default=0) > index:
+        return list(map(itemgetter(index), rows))
+    return [row[index] if index < len(row) else '' for row in rows]
+
+
+def column_predicate(column, test):
+    """Filter factory: test(value) on the named column, one row at a time.
+
+    Short rows count as an empty value.
+    """
+    def bind(header):
+        index = column_index(header, column)
+        return lambda rows: map(test, column_values(rows, index))
+    return bind
+
+
+def column_mask(column, mask):
+    """Filter factory: mask(values) gives one truth value per value of the named column.
+
+    The mask sees a whole chunk of values at once, so a vectorized check
+    (e.g. NearPlace.mask) runs once per chunk instead of once per row.
+    """
+    def bind(header):
+        index = column_index(header, column)
+        return lambda rows: mask(column_values(rows, index))
+    return bind
+
+
+def filter_chunk(rows, lines, filters):
+    """Keep the rows (and their input lines, if given) that pass every bound filter."""
+    for keep in filters:
+        if not rows:
+            break
+        keep = list(keep(rows))
+        rows = list(compress(rows, keep))
+        if lines is not None:
+            lines = list(compress(lines, keep))
+    return rows, lines
+
+
+def filter_csv(input_path, output_path, *filter_factories):
+    """Copy the rows of input_path that pass all filters to output_path in one streaming pass.
+
+    The output is written to a temporary file and moved into place at the
+    end. Returns (rows kept, rows read).
+    """
+    kept = read = 0
+    temp_path = f"{output_path}.tmp"
+    with open(input_path, 'r', encoding='utf-8', newline='') as infile, \
+            open(temp_path, 'w', encoding='utf-8', newline='') as outfile:
+        # The reader pulls from one copy of the lines; the other copy is what
+        # gets written, so each chunk's lines are known without re-serializing
+        parsed, raw = tee(infile)
+        reader = csv.reader(parsed)
+        header = next(reader, [])
+        header_lines = list(islice(raw, reader.line_num))
+        line_end = '\r\n' if header_lines and header_lines[-1].endswith('\r\n') else '\n'
+        writer = csv.writer(outfile, lineterminator=line_end)
+        if len(header_lines) == 1:
+            outfile.write(header_lines[0])
+        elif header_lines:
+            writer.writerow(header)
+        filters = [factory(header) for factory in filter_factories]
+
+        lines_read = reader.line_num
+        while rows := list(islice(reader, CHUNK_ROWS)):
+            lines = list(islice(raw, reader.line_num - lines_read))
+            lines_read = reader.line_num
+            read += len(rows)
+            # A record with a quoted newline spans several lines; such a chunk goes through csv
+            rows, lines = filter_chunk(rows, lines if len(lines) == len(rows) else None, filters)
+            if lines is None:
+                writer.writerows(rows)
+            else:
+                outfile.writelines(lines)
+            kept += len(rows)
+    os.replace(temp_path, output_path)
+    return kept, read
@@ -0,0 +1,169 @@
+import re
+from html import unescape
+from html.parser import HTMLParser
+
+BODY_TOKEN_BUDGET = 1500  # Default cap on body size sent to the LLM (~4 characters per token)
+
+# A line that starts a quoted reply chain; everything from it on is dropped
+REPLY_MARKERS = re.compile(
+    r"^(on .{0,200} wrote:|op .{0,200} schreef .{0,100}:|-{2,} ?original message ?-{2,})$",
+    re.IGNORECASE
+)
+# Outlook quotes a reply under a header block: a From: line directly followed by Sent:/Date:.
+# A From: line on its own is ordinary body text ("From: our Amsterdam office...")
+QUOTE_HEADER_FROM = re.compile(r"^(from|van): .+$", re.IGNORECASE)
+QUOTE_HEADER_NEXT = re.compile(r"^(sent|date|verzonden|datum): .+$", re.IGNORECASE)
+# A forwarded email is the content we want. Its From:/Date: lines name the original
+# sender (the recruiter, not the person who forwarded it); the rest of its header is dropped
+FORWARDED_MARKER = re.compile(r"^-{2,} ?(forwarded message|doorgestuurd bericht) ?-{2,}$", re.IGNORECASE)
+FORWARDED_HEADER = re.compile(
+    r"^(from|van|date|datum|sent|verzonden|subject|onderwerp|to|aan|cc): .*$", re.IGNORECASE
+)
+FORWARDED_HEADER_KEEP = re.compile(r"^(from|van|date|datum|sent|verzonden): .*$", re.IGNORECASE)
+# Signature delimiters ("-- " is the RFC 3676 one)
+SIGNATURE_MARKERS = re.compile(r"^(-- ?|__+|sent from my .+)$", re.IGNORECASE)
+SIGNATURE_KEEP_LINES = 4  # The recruiter's name, title, company and phone; the rest is disclaimers
+# LinkedIn notification footers that carry no recruiter information
+LINKEDIN_BOILERPLATE = re.compile(
+    r"^(this email was intended for .+|you are receiving .+ emails?\.?|learn why we included this.*|"
+    r"unsubscribe.*|help: .+|© \d{4} linkedin.*|linkedin corporation.*|"
+    r"view (message|profile|job)s?:? .*|reply to .+ on linkedin.*)$",
+    re.IGNORECASE
+)
+BLOCK_TAGS = {'p', 'div', 'br', 'li', 'tr', 'h1', 'h2', 'h3', 'h4', 'h5', 'h6', 'table', 'blockquote'}
+
+
+class _HTMLToText(HTMLParser):
+    """Minimal HTML-to-text converter: keeps text, drops scripts/styles/quotes."""
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.parts = []
+        self.skip_depth = 0
+
+    def handle_starttag(self, tag, attrs):
+        # Quoted replies in HTML mail live in <blockquote>; skip them outright
+        if tag in ('script', 'style', 'head', 'blockquote'):
+            self.skip_depth += 1
+        elif tag in BLOCK_TAGS:
+            self.parts.append('\n')
+
+    def handle_endtag(self, tag):
+        if tag in ('script', 'style', 'head', 'blockquote'):
+            self.skip_depth = max(0, self.skip_depth - 1)
+        elif tag in BLOCK_TAGS:
+            self.parts.append('\n')
+
+    def handle_data(self, data):
+        if not self.skip_depth:
+            self.parts.append(data)
+
+
+def html_to_text(html):
+    parser = _HTMLToText()
+    try:
+        parser.feed(html)
+        parser.close()
+    except Exception:
+        # Badly broken markup: fall back to stripping tags
+        return unescape(re.sub(r'<[^>]+>', ' ', html))
+    return ''.join(parser.parts)
+
+
+def decode_part(part):
+    """Decode one MIME part's payload to text, replacing undecodable bytes."""
+    payload = part.get_payload(decode=True)
+    if payload is None:
+        return ''
+    charset = part.get_content_charset() or 'utf-8'
+    try:
+        return payload.decode(charset, errors='replace')
+    except LookupError:
+        # Unknown charset name in the header
+        return payload.decode('utf-8', errors='replace')
+
+
+def find_text_part(mime_msg):
+    """Return (part, is_html) for the first text/plain part, else the first text/html one.
+
+    Attachments are skipped without decoding their payloads, and the walk
+    stops at the first text/plain part.
+    """
+    html_part = None
+    for part in mime_msg.walk():
+        if part.is_multipart() or part.get_content_disposition() == 'attachment':
+            continue
+        content_type = part.get_content_type()
+        if content_type == 'text/plain':
+            return part, False
+        if content_type == 'text/html' and html_part is None:
+            html_part = part
+    return html_part, html_part is not None
+
+
+def is_quote_header(lines, index):
+    """Whether lines[index] opens an Outlook-style quoted header block."""
+    return (QUOTE_HEADER_FROM.match(lines[index].strip()) is not None
+            and index + 1 < len(lines) and QUOTE_HEADER_NEXT.match(lines[index + 1].strip()) is not None)
+
+
+def clean_body(text):
+    """Strip quoted replies, signature tails and LinkedIn boilerplate, and squeeze whitespace.
+
+    Forwarded emails keep their content and the original From:/Date: lines;
+    the forwarding marker and the rest of its header block are removed. Of a
+    signature only the first SIGNATURE_KEEP_LINES non-empty lines are kept.
+    """
+    lines = []
+    raw_lines = text.replace('\r\n', '\n').split('\n')
+    in_forwarded_header = False
+    signature_lines_left = None
+    for index, line in enumerate(raw_lines):
+        stripped = line.strip()
+        if in_forwarded_header:
+            if FORWARDED_HEADER.match(stripped):
+                if FORWARDED_HEADER_KEEP.match(stripped):
+                    lines.append(re.sub(r'[ \t\xa0]+', ' ', stripped))
+                continue
+            in_forwarded_header = False
+        if FORWARDED_MARKER.match(stripped):
+            in_forwarded_header = True
+            continue
+        if REPLY_MARKERS.match(stripped) or is_quote_header(raw_lines, index):
+            break
+        if signature_lines_left is None and SIGNATURE_MARKERS.match(line.rstrip('\n')):
+            signature_lines_left = SIGNATURE_KEEP_LINES
+            continue
+        if stripped.startswith('>') or LINKEDIN_BOILERPLATE.match(stripped):
+            continue
+        if signature_lines_left is not None and stripped:
+            if signature_lines_left == 0:
+                break
+            signature_lines_left -= 1
+        lines.append(re.sub(r'[ \t\xa0]+', ' ', stripped))
+    return re.sub(r'\n{3,}', '\n\n', '\n'.join(lines)).strip()
+
+
+def truncate_to_tokens(text, max_tokens):
+    """Cap text at roughly max_tokens tokens, cutting at a word boundary."""
+    max_chars = max_tokens * 4
+    if len(text) <= max_chars:
+        return text
+    cut = text.rfind(' ', 0, max_chars)
+    return text[:cut if cut > 0 else max_chars] + ' [...]'
+
+
+def extract_body(mime_msg, max_tokens=BODY_TOKEN_BUDGET):
+    """Extract a compact plain-text body from a parsed email for the LLM prompt.
+
+    Prefers text/plain and falls back to converting text/html, then removes
+    quoted replies, signatures and LinkedIn footers and caps the result at
+    max_tokens. Raises on payloads that cannot be decoded at all.
+    """
+    part, is_html = find_text_part(mime_msg)
+    if part is None:
+        return ''
+    text = decode_part(part)
+    if is_html:
+        text = html_to_text(text)
+    return truncate_to_tokens(clean_body(text), max_tokens)
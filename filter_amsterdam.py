@@ -1,24 +1,21 @@
-import csv
+import os
+
+from csv_filters import column_mask, filter_csv
+
+INPUT_CSV = 'ai_companies2.csv'
+OUTPUT_CSV = 'ai_companies3.csv'
+# Distance from central Amsterdam that still counts as commutable (Amstelveen, Diemen, Zaandam, ...)
+AMSTERDAM_RADIUS_KM = float(os.getenv('AMSTERDAM_RADIUS_KM', '12'))
+
+def amsterdam_area():
+    # Located by postcode through the offline geo index, see geo_index
+    from geo_index import NearPlace
+    return NearPlace('Amsterdam', AMSTERDAM_RADIUS_KM)
 
 def filter_amsterdam_companies():
-    # Read the input file and write to output file
-    with open('ai_companies2.csv', 'r', encoding='utf-8') as infile, \
-         open('ai_companies3.csv', 'w', newline='', encoding='utf-8') as outfile:
-        
-        reader = csv.reader(infile)
-        writer = csv.writer(outfile)
-        
-        # Write header
-        header = next(reader)
-        writer.writerow(header)
-        
-        # Filter companies in Amsterdam
-        for row in reader:
-            if len(row) >= 5:  # Ensure row has enough columns
-                address = row[4].lower()
-                # Check if address contains 'amsterdam' and not part of another word
-                if 'amsterdam' in address and not any(x in address for x in ['amsterdamse', 'amsterdammer']):
-                    writer.writerow(row)
+    # Stream the input to the output, keeping companies whose address is in the Amsterdam area
+    kept, total = filter_csv(INPUT_CSV, OUTPUT_CSV, column_mask('address', amsterdam_area().mask))
+    print(f"{kept} of {total} companies are within {AMSTERDAM_RADIUS_KM:g} km of Amsterdam")
 
 if __name__ == "__main__":
-    filter_amsterdam_companies() 
\ No newline at end of file
+    filter_amsterdam_companies()
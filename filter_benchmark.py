@@ -0,0 +1,142 @@
+"""Benchmark of the streaming filters against the previous implementations.
+
+Generates a synthetic company list and times the old list-and-substring
+filters against csv_filters, reporting rows per second, rows kept and peak
+Python memory (tracemalloc, from a separate run so it doesn't skew timing).
+The Amsterdam cases keep different rows by design: the old substring test
+misses postcode-only addresses and 'Amsterdam' next to Amsterdamse, the
+interim postcode-range rule only knows 1000-1109, and the production
+geo-index area (filter_amsterdam.amsterdam_area) also keeps Amstelveen.
+
+    python filter_benchmark.py --rows 500000
+"""
+import argparse
+import csv
+import os
+import random
+import re
+import tempfile
+import time
+import tracemalloc
+
+from csv_filters import column_mask, column_predicate, filter_csv
+from filter_amsterdam import amsterdam_area
+
+CITIES = [
+    ('Amsterdam', '1017'), ('Amsterdam', '1101'), ('Utrecht', '3511'), ('Rotterdam', '3011'),
+    ('Amstelveen', '1181'), ('Den Haag', '2511'), ('Eindhoven', '5611'), ('Haarlem', '2011'),
+]
+STREETS = ['Herengracht', 'Amsterdamsestraatweg', 'Stationsplein', 'Keizersgracht', 'Amsterdamse Poort', 'Kerkstraat']
+
+
+def write_companies(path, rows, seed=42):
+    """Synthetic ai_companies CSV with address and rank columns."""
+    rng = random.Random(seed)
+    with open(path, 'w', encoding='utf-8', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(['Rank', 'Name', 'Category', 'Website', 'address', 'rank'])
+        for i in range(rows):
+            city, pc4 = rng.choice(CITIES)
+            address = f"{rng.choice(STREETS)} {rng.randint(1, 400)}, {pc4} {rng.choice('ABCDEFGH')}{rng.choice('JKLMNPRT')} {city}"
+            writer.writerow([i + 1, f"Company {i}", 'AI', f"company{i}.nl", address, rng.choice('0123')])
+
+
+def legacy_filter_amsterdam(input_path, output_path):
+    with open(input_path, 'r', encoding='utf-8') as infile, \
+         open(output_path, 'w', newline='', encoding='utf-8') as outfile:
+        reader = csv.reader(infile)
+        writer = csv.writer(outfile)
+        writer.writerow(next(reader))
+        for row in reader:
+            if len(row) >= 5:
+                address = row[4].lower()
+                if 'amsterdam' in address and not any(x in address for x in ['amsterdamse', 'amsterdammer']):
+                    writer.writerow(row)
+
+
+def legacy_is_amsterdam(address):
+    address = address.lower()
+    return 'amsterdam' in address and not any(x in address for x in ['amsterdamse', 'amsterdammer'])
+
+
+# The interim rule before the geo index: a postcode in 1000-1109 or 'Amsterdam' as a whole word
+LEGACY_POSTCODE_RE = re.compile(r'1(?<!\d1)(?:0\d\d|10\d) ?[A-Za-z]{2}\b')
+LEGACY_WORD_RE = re.compile(r'\bamsterdam\b')
+
+
+def postcode_range_is_amsterdam(address):
+    if LEGACY_POSTCODE_RE.search(address):
+        return True
+    lowered = address.lower()
+    return 'amsterdam' in lowered and LEGACY_WORD_RE.search(lowered) is not None
+
+
+def legacy_filter_companies(input_path, output_path):
+    with open(input_path, 'r', encoding='utf-8') as infile:
+        reader = csv.DictReader(infile)
+        filtered_rows = [row for row in reader if row['rank'] != '0']
+    with open(output_path, 'w', newline='', encoding='utf-8') as outfile:
+        writer = csv.DictWriter(outfile, fieldnames=reader.fieldnames)
+        writer.writeheader()
+        writer.writerows(filtered_rows)
+
+
+def legacy_both(input_path, output_path):
+    # The old chain: two separate scripts with an intermediate file
+    intermediate = f"{output_path}.step"
+    legacy_filter_amsterdam(input_path, intermediate)
+    legacy_filter_companies(intermediate, output_path)
+    os.remove(intermediate)
+
+
+def count_rows(path):
+    with open(path, 'r', encoding='utf-8', newline='') as f:
+        return sum(1 for _ in csv.reader(f)) - 1
+
+
+def measure(func, *args):
+    """Return (seconds, peak MiB) for one call, each from its own run."""
+    start = time.perf_counter()
+    func(*args)
+    elapsed = time.perf_counter() - start
+    tracemalloc.start()
+    func(*args)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return elapsed, peak / 2 ** 20
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rows', type=int, default=200000)
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as scratch_dir:
+        input_path = os.path.join(scratch_dir, 'companies.csv')
+        output_path = os.path.join(scratch_dir, 'out.csv')
+        write_companies(input_path, args.rows)
+        size_mb = os.path.getsize(input_path) / 2 ** 20
+        print(f"{args.rows} rows, {size_mb:.1f} MiB")
+
+        is_ranked = column_predicate('rank', lambda rank: rank != '0')
+        in_area = column_mask('address', amsterdam_area().mask)
+        cases = [
+            ('amsterdam, legacy', legacy_filter_amsterdam, ()),
+            # Same rows as legacy, to compare the streaming machinery on equal output
+            ('amsterdam, old rule streamed', filter_csv, (column_predicate('address', legacy_is_amsterdam),)),
+            ('amsterdam, postcode range', filter_csv, (column_predicate('address', postcode_range_is_amsterdam),)),
+            ('amsterdam area, streaming', filter_csv, (in_area,)),
+            ('rank, legacy', legacy_filter_companies, ()),
+            ('rank, streaming', filter_csv, (is_ranked,)),
+            ('both, legacy (2 passes)', legacy_both, ()),
+            ('both, streaming (1 pass)', filter_csv, (in_area, is_ranked)),
+        ]
+        print(f"{'filter':<30}{'seconds':>9}{'rows/s':>12}{'kept':>9}{'peak MiB':>10}")
+        for name, func, predicates in cases:
+            elapsed, peak = measure(func, input_path, output_path, *predicates)
+            kept = count_rows(output_path)
+            print(f"{name:<30}{elapsed:>9.2f}{args.rows / elapsed:>12,.0f}{kept:>9}{peak:>10.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,17 +1,16 @@
-import csv
+from csv_filters import column_predicate, filter_csv
+
+INPUT_CSV = 'ai_companies5.csv'
+OUTPUT_CSV = 'ai_companies6.csv'
+
+def is_ranked(rank):
+    # Companies ranked 0 were judged not worth applying to
+    return rank != '0'
 
 def filter_companies():
-    # Read the input CSV file
-    with open('ai_companies5.csv', 'r', encoding='utf-8') as infile:
-        reader = csv.DictReader(infile)
-        # Filter out rows where rank is 0
-        filtered_rows = [row for row in reader if row['rank'] != '0']
-    
-    # Write the filtered data to a new CSV file
-    with open('ai_companies6.csv', 'w', newline='', encoding='utf-8') as outfile:
-        writer = csv.DictWriter(outfile, fieldnames=reader.fieldnames)
-        writer.writeheader()
-        writer.writerows(filtered_rows)
+    # Stream the input to the output, dropping rows where rank is 0
+    kept, total = filter_csv(INPUT_CSV, OUTPUT_CSV, column_predicate('rank', is_ranked))
+    print(f"Kept {kept} of {total} companies")
 
 if __name__ == "__main__":
-    filter_companies() 
\ No newline at end of file
+    filter_companies()
@@ -1,98 +1,260 @@
-import pandas as pd
-import markdown
-from weasyprint import HTML
+import hashlib
+import json
 import os
 import re
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from functools import lru_cache
+from html import escape
+
+from metrics import flush as flush_metrics, span
+
+INPUT_CSV = 'ai_companies8.csv'
+TEMPLATE_PATH = 'cover_letter.md'
+OUTPUT_DIR = 'cover_letters'
+RENDER_WORKERS = int(os.getenv('RENDER_WORKERS', str(os.cpu_count() or 1)))  # PDF layout is CPU-bound
+# Template placeholder -> company column it is filled from
+SLOTS = {
+    '[Addressee]': 'dear_name',
+    '[Company Name]': 'Name',
+    '[Company Specific Detail]': 'personalized_content'
+}
+LETTER_FIELDS = list(SLOTS.values())  # Columns a letter is built from
+RENDER_VERSION = '2'  # Part of each letter's hash: bump when rendering changes so old PDFs are redone
+
+# Replace URLs with clickable links (showing cleaner text)
+URL_MAPPINGS = {
+    "https://github.com/McFunshine/ai-email-scraper": "github.com/McFunshine/ai-email-scraper",
+    "https://spencerpj.com": "spencerpj.com"
+}
+CONTACT_EMAIL = "spencerpj@gmail.com"  # Turned into a mailto link
+ASTERISK_HTML = '<span class="asterisk">*</span>'
+BOLD_RE = re.compile(r'\*\*(\S(?:.*?\S)?)\*\*')
+ITALIC_RE = re.compile(r'(?<!\*)\*(?!\s)([^*]+?)(?<!\s)\*(?!\*)')
+
+LETTER_CSS = """
+body {
+    font-family: Arial, sans-serif;
+    line-height: 1.6;
+    margin: 2cm;
+}
+p {
+    margin-bottom: 1em;
+}
+strong {
+    font-weight: bold;
+}
+em {
+    font-style: italic;
+}
+a {
+    color: #0000EE;
+    text-decoration: underline;
+}
+.asterisk {
+    color: #FF0000;  /* Bright red */
+}
+"""
 
 def sanitize_filename(name):
     # Replace spaces and dots with underscores
     return re.sub(r'[ .]', '_', name)
 
-def generate_cover_letter(template_path, company_data):
-    # Read the template
-    with open(template_path, 'r') as f:
-        template = f.read()
-    
-    # Replace placeholders
-    letter = template.replace('[Addressee]', company_data['dear_name'])
-    letter = template.replace('[Company Name]', company_data['Name'])
-    # Remove surrounding quotes from personalized content
-    personalized_content = company_data['personalized_content'].strip('"')
-    letter = letter.replace('[Company Specific Detail]', personalized_content)
-    
-    # Convert markdown to HTML
-    html = markdown.markdown(letter)
-    
-    # Add some basic styling
-    styled_html = f"""
+def read_template(template_path=TEMPLATE_PATH):
+    with open(template_path, 'r', encoding='utf-8') as f:
+        return f.read()
+
+class CoverLetterTemplate:
+    """A cover letter template compiled once for many letters.
+
+    Markdown conversion, the HTML shell and the link/mailto/asterisk rewrites
+    are applied to the static text when the template is compiled, with each
+    [Placeholder] replaced by a marker. Rendering a letter is then a single
+    join of the static pieces and the company's (escaped) slot values.
+    """
+
+    def __init__(self, template):
+        import markdown
+        
+        # Alphanumeric markers pass through markdown untouched
+        markers = {f"COVERLETTERSLOT{i}X": placeholder for i, placeholder in enumerate(SLOTS)}
+        letter = template
+        for marker, placeholder in markers.items():
+            letter = letter.replace(placeholder, marker)
+        
+        html = rewrite_static_html(markdown.markdown(letter))
+        styled_html = f"""
     <html>
         <head>
-            <style>
-                body {{
-                    font-family: Arial, sans-serif;
-                    line-height: 1.6;
-                    margin: 2cm;
-                }}
-                p {{
-                    margin-bottom: 1em;
-                }}
-                strong {{
-                    font-weight: bold;
-                }}
-                em {{
-                    font-style: italic;
-                }}
-                a {{
-                    color: #0000EE;
-                    text-decoration: underline;
-                }}
-                .asterisk {{
-                    color: #FF0000;  /* Bright red */
-                }}
-            </style>
+            <meta charset="utf-8">
         </head>
         <body>
             {html}
         </body>
     </html>
     """
+        # Alternating static HTML and slot names: [html, slot, html, slot, ..., html]
+        marker_re = re.compile('|'.join(re.escape(marker) for marker in markers))
+        self.parts = []
+        position = 0
+        for match in marker_re.finditer(styled_html):
+            self.parts.append(styled_html[position:match.start()])
+            self.parts.append(markers[match.group()])
+            position = match.end()
+        self.parts.append(styled_html[position:])
+
+    def render(self, company_data):
+        values = {placeholder: render_inline(slot_value(company_data, placeholder)) for placeholder in SLOTS}
+        return ''.join(part if i % 2 == 0 else values[part] for i, part in enumerate(self.parts))
+
+def rewrite_static_html(html):
+    """Links, mailto and red asterisks for the template's own text."""
+    for full_url, display_url in URL_MAPPINGS.items():
+        html = html.replace(full_url, f'<a href="{full_url}">{display_url}</a>')
+    html = html.replace(CONTACT_EMAIL, f'<a href="mailto:{CONTACT_EMAIL}">{CONTACT_EMAIL}</a>')
+    return html.replace('*', ASTERISK_HTML)
+
+def slot_value(company_data, placeholder):
+    value = str(company_data[SLOTS[placeholder]])
+    if placeholder == '[Company Specific Detail]':
+        # Remove surrounding quotes from personalized content
+        value = value.strip('"')
+    return value
+
+def render_inline(text):
+    """Escape a slot value and apply the inline markdown the agents produce (**bold**, *italic*)."""
+    text = escape(text, quote=False)
+    text = BOLD_RE.sub(r'<strong>\1</strong>', text)
+    text = ITALIC_RE.sub(r'<em>\1</em>', text)
+    return text.replace('*', ASTERISK_HTML)
+
+@lru_cache(maxsize=4)
+def compile_template(template):
+    return CoverLetterTemplate(template)
+
+def generate_cover_letter(template_path, company_data):
+    """HTML of one cover letter from the template file at template_path."""
+    return compile_template(read_template(template_path)).render(company_data)
+
+def letter_fields(company_data):
+    """The columns a letter is built from, as plain strings."""
+    return {field: str(company_data[field]) for field in LETTER_FIELDS}
+
+def letter_hash(template, company_data):
+    """Hash of everything that goes into a letter: template, stylesheet and the company's columns."""
+    digest = hashlib.sha256()
+    for part in (RENDER_VERSION, template, LETTER_CSS, json.dumps(letter_fields(company_data), sort_keys=True)):
+        digest.update(part.encode('utf-8'))
+        digest.update(b'\0')
+    return digest.hexdigest()
+
+def output_path_for(company_data, output_dir=OUTPUT_DIR):
+    return os.path.join(output_dir, f"cover_letter_{sanitize_filename(str(company_data['Name']))}.pdf")
+
+def is_up_to_date(output_path, digest):
+    """Whether the PDF exists and its sidecar records the same input hash."""
+    try:
+        with open(f"{output_path}.sha256", 'r', encoding='utf-8') as f:
+            return f.read().strip() == digest and os.path.exists(output_path)
+    except OSError:
+        return False
+
+# Per-process renderer state, set up once by init_renderer
+_template = None
+_stylesheet = None
+_font_config = None
+
+def init_renderer(template):
+    """Compile the template, stylesheet and font setup once per (worker) process."""
+    global _template, _stylesheet, _font_config
+    # Deferred so that importing this module (e.g. for sanitize_filename) stays cheap;
+    # weasyprint also needs the system Pango libraries to load at all
+    from weasyprint import CSS
+    from weasyprint.text.fonts import FontConfiguration
     
-    # Replace URLs with clickable links (showing cleaner text)
-    url_mappings = {
-        "https://github.com/McFunshine/ai-email-scraper": "github.com/McFunshine/ai-email-scraper",
-        "https://spencerpj.com": "spencerpj.com"
-    }
-    for full_url, display_url in url_mappings.items():
-        styled_html = styled_html.replace(full_url, f'<a href="{full_url}">{display_url}</a>')
+    _template = CoverLetterTemplate(template)
+    _font_config = FontConfiguration()
+    _stylesheet = CSS(string=LETTER_CSS, font_config=_font_config)
+
+def render_letter(fields, output_path, digest):
+    """Render one letter to PDF (atomically) and record its input hash next to it."""
+    from weasyprint import HTML
     
-    # Replace the email with a mailto link
-    email = "spencerpj@gmail.com"
-    styled_html = styled_html.replace(email, f'<a href="mailto:{email}">{email}</a>')
+    with span('letters.render', item=fields.get('Name')):
+        html_content = _template.render(fields)
+        temp_path = f"{output_path}.tmp"
+        HTML(string=html_content).write_pdf(temp_path, stylesheets=[_stylesheet], font_config=_font_config)
+        os.replace(temp_path, output_path)
+        with open(f"{output_path}.sha256", 'w', encoding='utf-8') as f:
+            f.write(digest)
+    # Pool workers exit without running atexit hooks, so don't leave the record buffered
+    flush_metrics()
+    return output_path
+
+def render_letters(companies, template_path=TEMPLATE_PATH, output_dir=OUTPUT_DIR, workers=RENDER_WORKERS, force=False):
+    """Render cover letters for many companies, skipping ones whose inputs haven't changed.
+
+    The template is read once and every worker process compiles the
+    stylesheet once; PDFs are laid out in parallel across `workers`
+    processes. Yields (company name, output path, status) with status
+    'rendered', 'unchanged' or 'failed: <error>', in completion order.
+    """
+    template = read_template(template_path)
+    os.makedirs(output_dir, exist_ok=True)
+    
+    jobs = []
+    for company_data in companies:
+        fields = letter_fields(company_data)
+        output_path = output_path_for(fields, output_dir)
+        digest = letter_hash(template, fields)
+        if not force and is_up_to_date(output_path, digest):
+            yield fields['Name'], output_path, 'unchanged'
+        else:
+            jobs.append((fields, output_path, digest))
+    if not jobs:
+        return
     
-    # Add styling to asterisks
-    styled_html = styled_html.replace('*', '<span class="asterisk">*</span>')
+    if workers <= 1 or len(jobs) == 1:
+        init_renderer(template)
+        for fields, output_path, digest in jobs:
+            try:
+                yield fields['Name'], render_letter(fields, output_path, digest), 'rendered'
+            except Exception as e:
+                yield fields['Name'], output_path, f"failed: {e}"
+        return
     
-    return styled_html
+    with ProcessPoolExecutor(max_workers=min(workers, len(jobs)), initializer=init_renderer,
+                             initargs=(template,)) as executor:
+        futures = {executor.submit(render_letter, *job): job for job in jobs}
+        for future in as_completed(futures):
+            fields, output_path, _ = futures[future]
+            try:
+                yield fields['Name'], future.result(), 'rendered'
+            except Exception as e:
+                yield fields['Name'], output_path, f"failed: {e}"
+
+def write_cover_letter(company_data, template_path=TEMPLATE_PATH, output_dir=OUTPUT_DIR):
+    """Render one company's cover letter to PDF (unless unchanged) and return the output path."""
+    for _, output_path, status in render_letters([company_data], template_path, output_dir, workers=1):
+        if status.startswith('failed'):
+            raise RuntimeError(f"{company_data['Name']}: {status}")
+        return output_path
 
 def main():
-    # Read the CSV file
-    df = pd.read_csv('ai_companies8.csv')
+    import pandas as pd
     
-    # Create output directory if it doesn't exist
-    os.makedirs('cover_letters', exist_ok=True)
+    # Read the CSV file
+    df = pd.read_csv(INPUT_CSV)
     
     # Generate a cover letter for each company
-    for _, row in df.iterrows():
-        company_name = row['Name']
-        filename = f"cover_letter_{sanitize_filename(company_name)}.pdf"
-        output_path = os.path.join('cover_letters', filename)
-        
-        # Generate the HTML content
-        html_content = generate_cover_letter('cover_letter.md', row)
-        
-        # Create PDF
-        HTML(string=html_content).write_pdf(output_path)
-        print(f"Generated: {filename}")
+    counts = {'rendered': 0, 'unchanged': 0, 'failed': 0}
+    for name, output_path, status in render_letters(row for _, row in df.iterrows()):
+        counts[status.split(':')[0]] += 1
+        if status == 'rendered':
+            print(f"Generated: {os.path.basename(output_path)}")
+        elif status != 'unchanged':
+            print(f"{name}: {status}")
+    
+    print(f"{counts['rendered']} letters rendered, {counts['unchanged']} unchanged, {counts['failed']} failed")
 
 if __name__ == "__main__":
-    main() 
\ No newline at end of file
+    main()
@@ -0,0 +1,227 @@
+"""Offline geo index from Dutch postcodes to approximate coordinates.
+
+The postcode (1234 AB) is parsed out of the addresses location_getter finds,
+and its four digits (PC4) are looked up in a bundled centroid table, falling
+back to the two-digit region (PC2) when the PC4 isn't listed. Lookups and
+radius/region queries run on whole NumPy arrays, so locating every company
+is one vectorized pass with no LLM or search calls:
+
+    index = load_geo_index()
+    located = index.locate(addresses)
+    near = located.within_km(*index.place_center('Amsterdam'), 12)
+    ring = index.in_region(located.pc4, ['Amstelveen', 'Diemen'])
+
+The bundled postcode_centroids.csv is approximate: hand-placed PC4 centroids
+for the Amsterdam region and one point per PC2 elsewhere. Set
+POSTCODE_CENTROIDS to a full table with the same columns (e.g. derived from
+the CBS PC4 statistics) for exact results everywhere.
+"""
+import csv
+import os
+import re
+from dataclasses import dataclass
+from functools import lru_cache
+
+import numpy as np
+
+CENTROIDS_CSV = os.getenv(
+    'POSTCODE_CENTROIDS', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'postcode_centroids.csv')
+)
+EARTH_RADIUS_KM = 6371.0
+PC4_COUNT = 10000
+
+# Four digits without a leading zero, an optional space and two letters
+POSTCODE_RE = re.compile(r'(?<!\d)([1-9]\d{3}) ?[A-Za-z]{2}\b')
+# The greedy prefix backtracks from the end, so one match() finds the last postcode
+LAST_POSTCODE_RE = re.compile(r'(?s:.*)' + POSTCODE_RE.pattern)
+
+# How precisely an address was located
+NOT_FOUND, PC2, PC4 = 0, 1, 2
+
+
+def parse_pc4(address):
+    """PC4 of the last postcode in an address (house numbers come first), or 0 if there is none."""
+    match = LAST_POSTCODE_RE.match(address or '')
+    return int(match[1]) if match else 0
+
+
+def parse_pc4s(addresses):
+    """parse_pc4 for many addresses at once: one NumPy pass over their joined bytes.
+
+    Non-ASCII text falls back to the per-address regex, since byte offsets
+    would no longer line up with characters.
+    """
+    addresses = [address or '' for address in addresses]
+    text = '\n'.join(addresses)
+    if not text.isascii():
+        return np.fromiter(map(parse_pc4, addresses), dtype=np.int32, count=len(addresses))
+
+    # Padding so the lookahead below never indexes past the end; '\n' is neither
+    # a digit, a letter nor a word character, like the separators
+    size = len(text)
+    data = np.frombuffer(text.encode('ascii') + b'\n' * 8, dtype=np.uint8)
+    digit = data - 48 < 10
+    letter = (data | 32) - 97 < 26
+    word = digit | letter | (data == 95)
+
+    # Candidate starts: a 1-9 digit that doesn't follow another digit
+    lead = digit[:size] & (data[:size] != 48)
+    lead[1:] &= ~digit[:size][:-1]
+    start = np.flatnonzero(lead)
+    found = digit[start + 1] & digit[start + 2] & digit[start + 3]
+    letters = start + 4 + (data[start + 4] == 32)
+    found &= letter[letters] & letter[letters + 1] & ~word[letters + 2]
+    start = start[found]
+    pc4 = (data[start[:, None] + np.arange(4)].astype(np.int32) - 48) @ np.array([1000, 100, 10, 1], dtype=np.int32)
+
+    # Matches are in text order, so the last one per address is the one before a change of address
+    lengths = np.fromiter(map(len, addresses), dtype=np.int64, count=len(addresses))
+    offsets = np.cumsum(lengths + 1) - (lengths + 1)
+    owner = np.searchsorted(offsets, start, side='right') - 1
+    last = np.append(owner[1:] != owner[:-1], True)[:len(owner)]
+    codes = np.zeros(len(addresses), dtype=np.int32)
+    codes[owner[last]] = pc4[last]
+    return codes
+
+
+def haversine_km(lat, lon, center_lat, center_lon):
+    """Great-circle distance from arrays of points to one point; NaN where a point is unknown."""
+    lat, lon = np.radians(lat), np.radians(lon)
+    center_lat, center_lon = np.radians(center_lat), np.radians(center_lon)
+    a = (np.sin((lat - center_lat) / 2) ** 2
+         + np.cos(lat) * np.cos(center_lat) * np.sin((lon - center_lon) / 2) ** 2)
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(a))
+
+
+@dataclass
+class Located:
+    """Coordinates for a batch of addresses; lat/lon are NaN where precision is NOT_FOUND."""
+    pc4: np.ndarray
+    lat: np.ndarray
+    lon: np.ndarray
+    precision: np.ndarray
+
+    def distance_km(self, center_lat, center_lon):
+        return haversine_km(self.lat, self.lon, center_lat, center_lon)
+
+    def within_km(self, center_lat, center_lon, km):
+        # NaN distances compare False, so unlocated addresses are never inside
+        with np.errstate(invalid='ignore'):
+            return self.distance_km(center_lat, center_lon) <= km
+
+
+class GeoIndex:
+    """Sorted PC4 centroid arrays plus a dense PC2 fallback, queried with NumPy."""
+
+    def __init__(self, codes, lat, lon, places):
+        codes = np.asarray(codes, dtype=np.int32)
+        lat, lon = np.asarray(lat, dtype=float), np.asarray(lon, dtype=float)
+        places = np.asarray(places, dtype=object)
+        is_pc4 = codes >= 1000
+        order = np.argsort(codes[is_pc4])
+        self.pc4_codes = codes[is_pc4][order]
+        self.pc4_lat = lat[is_pc4][order]
+        self.pc4_lon = lon[is_pc4][order]
+        self.pc4_places = places[is_pc4][order]
+
+        # PC2 indexed directly by code; 0 (no postcode) and unlisted regions stay NaN
+        self.pc2_lat = np.full(100, np.nan)
+        self.pc2_lon = np.full(100, np.nan)
+        self.pc2_lat[codes[~is_pc4]] = lat[~is_pc4]
+        self.pc2_lon[codes[~is_pc4]] = lon[~is_pc4]
+
+    @classmethod
+    def from_csv(cls, path=CENTROIDS_CSV):
+        """Read a postcode,lat,lon,place table; two-digit postcodes are PC2 fallbacks."""
+        with open(path, 'r', encoding='utf-8', newline='') as f:
+            rows = list(csv.DictReader(f))
+        return cls(
+            [int(row['postcode']) for row in rows],
+            [float(row['lat']) for row in rows],
+            [float(row['lon']) for row in rows],
+            [row['place'] for row in rows],
+        )
+
+    def locate_codes(self, pc4):
+        """Coordinates for an array of PC4 codes (0 for none), by PC4 where listed, else by PC2."""
+        pc4 = np.asarray(pc4, dtype=np.int32)
+        index = np.minimum(np.searchsorted(self.pc4_codes, pc4), len(self.pc4_codes) - 1)
+        exact = self.pc4_codes[index] == pc4
+        pc2 = pc4 // 100
+        lat = np.where(exact, self.pc4_lat[index], self.pc2_lat[pc2])
+        lon = np.where(exact, self.pc4_lon[index], self.pc2_lon[pc2])
+        precision = np.where(exact, PC4, np.where(np.isnan(lat), NOT_FOUND, PC2))
+        return Located(pc4, lat, lon, precision)
+
+    def locate(self, addresses):
+        return self.locate_codes(parse_pc4s(addresses))
+
+    def place_codes(self, places):
+        """PC4 codes of the named places (case-insensitive); raises KeyError for unknown names."""
+        wanted = {place.lower() for place in places}
+        lowered = np.array([place.lower() for place in self.pc4_places], dtype=object)
+        known = set(lowered)
+        missing = wanted - known
+        if missing:
+            raise KeyError(f"Unknown places: {', '.join(sorted(missing))}")
+        return self.pc4_codes[np.isin(lowered, list(wanted))]
+
+    def place_center(self, place):
+        """(lat, lon) of a place as the mean of its PC4 centroids."""
+        selected = np.isin(self.pc4_codes, self.place_codes([place]))
+        return float(self.pc4_lat[selected].mean()), float(self.pc4_lon[selected].mean())
+
+    def in_region(self, pc4, places):
+        """Mask of the PC4 codes that belong to any of the named places."""
+        return np.isin(pc4, self.place_codes(places))
+
+    def radius_table(self, center_lat, center_lon, km):
+        """Boolean array over every PC4 code 0-9999: is it within km of the center?"""
+        return self.locate_codes(np.arange(PC4_COUNT)).within_km(center_lat, center_lon, km)
+
+    def places_within_km(self, center_lat, center_lon, km):
+        with np.errstate(invalid='ignore'):
+            inside = haversine_km(self.pc4_lat, self.pc4_lon, center_lat, center_lon) <= km
+        return sorted(set(self.pc4_places[inside]))
+
+
+@lru_cache(maxsize=None)
+def load_geo_index(path=CENTROIDS_CSV):
+    return GeoIndex.from_csv(path)
+
+
+class NearPlace:
+    """Whether addresses lie within km of a place.
+
+    Addresses with a postcode are decided by its distance; for the rest, a
+    whole-word mention of any place within the radius (e.g. 'Diemen') counts.
+    Call it on one address, or use mask() for a vectorized pass over many.
+    """
+
+    def __init__(self, place, km, index=None):
+        index = index or load_geo_index()
+        center_lat, center_lon = index.place_center(place)
+        self.km = km
+        self.by_pc4 = index.radius_table(center_lat, center_lon, km)
+        # Set membership is cheaper than indexing a NumPy array for one address at a time
+        self.inside_pc4 = frozenset(np.flatnonzero(self.by_pc4).tolist())
+        names = sorted(index.places_within_km(center_lat, center_lon, km), key=len, reverse=True)
+        pattern = r'\b(?:' + '|'.join(map(re.escape, names)) + r')\b' if names else r'(?!)'
+        self.name_re = re.compile(pattern, re.IGNORECASE)
+
+    def mentions_place(self, address):
+        return self.name_re.search(address or '') is not None
+
+    def __call__(self, address):
+        pc4 = parse_pc4(address)
+        if pc4:
+            return pc4 in self.inside_pc4
+        return self.mentions_place(address)
+
+    def mask(self, addresses):
+        addresses = list(addresses)
+        pc4 = parse_pc4s(addresses)
+        inside = self.by_pc4[pc4]
+        for i in np.flatnonzero(pc4 == 0):
+            inside[i] = self.mentions_place(addresses[i])
+        return inside
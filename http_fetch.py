@@ -0,0 +1,193 @@
+import sqlite3
+import threading
+import time
+import zlib
+from urllib.parse import urlparse
+
+import requests
+from requests.adapters import HTTPAdapter
+
+HTTP_CACHE_FILE = 'http_cache.sqlite'  # Compressed page bodies plus ETag/Last-Modified validators
+FETCH_TIMEOUT = 10  # Seconds per request
+MAX_CONNECTIONS_PER_HOST = 2  # Concurrent requests to any single host
+POOL_SIZE = 20  # Keep-alive connections kept per host pool
+HEADERS = {
+    'User-Agent': 'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/122.0.0.0 Safari/537.36',
+    'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/avif,image/webp,image/apng,*/*;q=0.8',
+    'Accept-Language': 'en-US,en;q=0.9',
+    'Accept-Encoding': 'gzip, deflate',
+    'Connection': 'keep-alive',
+    'Upgrade-Insecure-Requests': '1'
+}
+
+_session = None
+_session_lock = threading.Lock()
+_host_limits = {}
+_url_locks = {}
+_limits_lock = threading.Lock()
+# Pages already downloaded or revalidated in this process: served without touching the network
+_fetched_this_run = {}
+_cache = None
+
+
+def get_session():
+    """Process-wide requests.Session with a keep-alive connection pool."""
+    global _session
+    with _session_lock:
+        if _session is None:
+            _session = requests.Session()
+            _session.headers.update(HEADERS)
+            adapter = HTTPAdapter(pool_connections=POOL_SIZE, pool_maxsize=POOL_SIZE)
+            _session.mount('http://', adapter)
+            _session.mount('https://', adapter)
+        return _session
+
+
+def host_limit(url):
+    """Semaphore capping concurrent requests to the URL's host."""
+    host = urlparse(url).netloc.lower()
+    with _limits_lock:
+        if host not in _host_limits:
+            _host_limits[host] = threading.BoundedSemaphore(MAX_CONNECTIONS_PER_HOST)
+        return _host_limits[host]
+
+
+def url_lock(url):
+    """Lock held while a URL is being fetched, so concurrent callers share one download."""
+    with _limits_lock:
+        if url not in _url_locks:
+            _url_locks[url] = threading.Lock()
+        return _url_locks[url]
+
+
+def normalize_url(url):
+    url = str(url or '').strip()
+    if url and not urlparse(url).scheme:
+        url = f"https://{url}"
+    return url
+
+
+class HTTPCache:
+    """On-disk page cache keyed by URL, with zlib-compressed bodies."""
+
+    def __init__(self, path=HTTP_CACHE_FILE):
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS pages (
+                url TEXT PRIMARY KEY,
+                etag TEXT,
+                last_modified TEXT,
+                content_type TEXT,
+                body BLOB NOT NULL,
+                fetched_at REAL NOT NULL
+            )
+        """)
+        self.conn.commit()
+
+    def get(self, url):
+        with self.lock:
+            row = self.conn.execute(
+                "SELECT etag, last_modified, content_type, body FROM pages WHERE url = ?", (url,)).fetchone()
+        if row is None:
+            return None
+        return {
+            'etag': row[0],
+            'last_modified': row[1],
+            'content_type': row[2],
+            'text': zlib.decompress(row[3]).decode('utf-8')
+        }
+
+    def set(self, url, text, etag=None, last_modified=None, content_type=None):
+        body = zlib.compress(text.encode('utf-8'), 6)
+        with self.lock:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO pages (url, etag, last_modified, content_type, body, fetched_at) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (url, etag, last_modified, content_type, body, time.time()))
+            self.conn.commit()
+
+    def touch(self, url):
+        with self.lock:
+            self.conn.execute("UPDATE pages SET fetched_at = ? WHERE url = ?", (time.time(), url))
+            self.conn.commit()
+
+
+def get_cache():
+    global _cache
+    with _session_lock:
+        if _cache is None:
+            _cache = HTTPCache()
+        return _cache
+
+
+def fetch_text(url, timeout=FETCH_TIMEOUT):
+    """Return the page's text (HTML) or None, reading through the shared cache.
+
+    Each URL is downloaded at most once per process. Pages cached by earlier
+    runs are revalidated with If-None-Match/If-Modified-Since, so an unchanged
+    page costs a 304 instead of a full download.
+    """
+    url = normalize_url(url)
+    if not url:
+        return None
+    if url in _fetched_this_run:
+        return _fetched_this_run[url]
+
+    with url_lock(url):
+        # Another thread may have finished this URL while we waited
+        if url in _fetched_this_run:
+            return _fetched_this_run[url]
+
+        cache = get_cache()
+        cached = cache.get(url)
+        headers = {}
+        if cached:
+            if cached['etag']:
+                headers['If-None-Match'] = cached['etag']
+            if cached['last_modified']:
+                headers['If-Modified-Since'] = cached['last_modified']
+
+        text = None
+        try:
+            with host_limit(url):
+                response = get_session().get(url, headers=headers, timeout=timeout)
+            if response.status_code == 304 and cached:
+                cache.touch(url)
+                text = cached['text']
+            elif response.status_code == 200:
+                content_type = response.headers.get('Content-Type', '')
+                if not content_type or 'html' in content_type or 'text' in content_type:
+                    if 'charset' not in content_type.lower():
+                        # requests would assume ISO-8859-1 for HTML without a declared charset
+                        response.encoding = response.apparent_encoding
+                    text = response.text
+                    cache.set(url, text, response.headers.get('ETag'),
+                              response.headers.get('Last-Modified'), content_type)
+        except requests.RequestException:
+            # Offline or unreachable: a stale cached copy is better than nothing
+            text = cached['text'] if cached else None
+
+        _fetched_this_run[url] = text
+        return text
+
+
+def is_accessible(url, timeout=5):
+    """Whether the site answers without a 403, probing with HEAD before falling back to GET."""
+    url = normalize_url(url)
+    if not url:
+        return False
+    if _fetched_this_run.get(url):
+        return True
+    session = get_session()
+    try:
+        with host_limit(url):
+            response = session.head(url, timeout=timeout, allow_redirects=True)
+            # Some servers don't implement HEAD, or block it while serving GET
+            if response.status_code in (403, 405, 501):
+                response = session.get(url, timeout=timeout, stream=True)
+                response.close()
+        return response.status_code != 403
+    except requests.RequestException:
+        return False
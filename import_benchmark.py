@@ -0,0 +1,81 @@
+"""Startup cost of each CLI command, measured with `python -X importtime`.
+
+Every measurement runs in a fresh interpreter that imports the command's
+module through cli.load_command, so it reports what a run pays before doing
+any work. Use via `python cli.py bench-imports [command ...]`.
+"""
+import json
+import os
+import re
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+REPO_DIR = os.path.dirname(os.path.abspath(__file__))
+IMPORTTIME_RE = re.compile(r'^import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)')
+
+
+def parse_importtime(stderr):
+    """Return (total microseconds, [(cumulative us, module)] for top-level imports)."""
+    top_level = []
+    for line in stderr.splitlines():
+        match = IMPORTTIME_RE.match(line)
+        # Nested imports are indented one extra space per level below the first
+        if match and len(match.group(3)) == 1:
+            top_level.append((int(match.group(2)), match.group(4)))
+    return sum(us for us, _ in top_level), top_level
+
+
+def measure_command(command):
+    """Import one command in a fresh interpreter. Returns (import ms, wall ms, heaviest imports)."""
+    code = f"import cli; cli.load_command({command!r})"
+    if command == 'cli':
+        code = "import cli"
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join(filter(None, [REPO_DIR, os.getenv('PYTHONPATH')])))
+    # Run from a scratch directory so module-level side effects can't touch the working files
+    with tempfile.TemporaryDirectory() as scratch_dir:
+        start = time.perf_counter()
+        result = subprocess.run(
+            [sys.executable, '-X', 'importtime', '-c', code],
+            cwd=scratch_dir, env=env, capture_output=True, text=True
+        )
+        wall_ms = (time.perf_counter() - start) * 1000
+    if result.returncode != 0:
+        error = result.stderr.strip().splitlines()[-1] if result.stderr.strip() else 'unknown error'
+        raise RuntimeError(f"importing {command} failed: {error}")
+    total_us, top_level = parse_importtime(result.stderr)
+    return total_us / 1000, wall_ms, sorted(top_level, reverse=True)
+
+
+def run_benchmark(commands, repeat=3, top=3, output=None):
+    """Print the median startup cost per command; returns a process exit code."""
+    results = []
+    failed = False
+    print(f"{'command':<14}{'imports ms':>12}{'wall ms':>10}  heaviest imports")
+    for command in ['cli'] + [c for c in commands if c != 'cli']:
+        try:
+            runs = [measure_command(command) for _ in range(max(1, repeat))]
+        except RuntimeError as e:
+            print(f"{command:<14}{'-':>12}{'-':>10}  {e}")
+            failed = True
+            continue
+        import_ms = statistics.median(run[0] for run in runs)
+        wall_ms = statistics.median(run[1] for run in runs)
+        heaviest = [(us / 1000, module) for us, module in runs[-1][2][:top]]
+        print(f"{command:<14}{import_ms:>12.0f}{wall_ms:>10.0f}  "
+              + ', '.join(f"{module} {ms:.0f}ms" for ms, module in heaviest))
+        results.append({
+            'command': command,
+            'import_ms': round(import_ms, 1),
+            'wall_ms': round(wall_ms, 1),
+            'heaviest': [{'module': module, 'ms': round(ms, 1)} for ms, module in heaviest],
+        })
+
+    if output:
+        timestamp = time.strftime('%Y-%m-%dT%H:%M:%S')
+        with open(output, 'a', encoding='utf-8') as f:
+            for record in results:
+                f.write(json.dumps(dict(record, timestamp=timestamp, python=sys.version.split()[0])) + '\n')
+    return 1 if failed else 0
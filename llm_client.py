@@ -0,0 +1,200 @@
+import os
+import random
+import threading
+import time
+from dataclasses import dataclass
+
+from dotenv import load_dotenv
+
+from metrics import add, add_llm_usage
+from rate_limiter import RateLimiter
+
+# Load environment variables
+load_dotenv()
+
+LLM_PROVIDER = os.getenv('LLM_PROVIDER', 'openai')  # openai, anthropic or local
+LLM_BASE_URL = os.getenv('LLM_BASE_URL')  # OpenAI-compatible stand-in server for the 'local' provider
+LLM_TIMEOUT = float(os.getenv('LLM_TIMEOUT', '60'))  # Seconds per request
+LLM_CONNECT_TIMEOUT = float(os.getenv('LLM_CONNECT_TIMEOUT', '10'))
+LLM_MAX_RETRIES = int(os.getenv('LLM_MAX_RETRIES', '5'))
+LLM_MAX_CONNECTIONS = int(os.getenv('LLM_MAX_CONNECTIONS', '20'))
+LLM_KEEPALIVE_SECONDS = 60
+RETRYABLE_STATUSES = {408, 409, 429, 500, 502, 503, 504}
+LLM_REQUESTS_PER_MINUTE = int(os.getenv('LLM_REQUESTS_PER_MINUTE', '500'))
+LLM_TOKENS_PER_MINUTE = int(os.getenv('LLM_TOKENS_PER_MINUTE', '10000'))
+
+# Shared by every LLM caller in the process (extraction workers and crews alike),
+# so all of them together stay under the API limits
+llm_rate_limiter = RateLimiter(LLM_REQUESTS_PER_MINUTE, LLM_TOKENS_PER_MINUTE)
+
+
+def estimate_tokens(text):
+    """Cheap token estimate (~4 characters per token) for rate limiting."""
+    return len(text) // 4 + 1
+
+
+@dataclass
+class LLMResponse:
+    text: str
+    input_tokens: int = 0
+    output_tokens: int = 0
+    latency: float = 0.0
+
+
+def build_http_client(timeout=LLM_TIMEOUT):
+    """Pooled keep-alive HTTP client shared by every request of a provider."""
+    import httpx
+    return httpx.Client(
+        timeout=httpx.Timeout(timeout, connect=LLM_CONNECT_TIMEOUT),
+        limits=httpx.Limits(
+            max_connections=LLM_MAX_CONNECTIONS,
+            max_keepalive_connections=LLM_MAX_CONNECTIONS,
+            keepalive_expiry=LLM_KEEPALIVE_SECONDS
+        )
+    )
+
+
+def is_retryable(error):
+    """Rate limits, server errors, timeouts and dropped connections are worth retrying."""
+    status = getattr(error, 'status_code', None)
+    if status is not None:
+        return int(status) in RETRYABLE_STATUSES
+    return type(error).__name__ in ('APIConnectionError', 'APITimeoutError')
+
+
+def get_retry_after(error):
+    """Seconds the server asked us to wait, if it sent a Retry-After header."""
+    response = getattr(error, 'response', None)
+    try:
+        return float(response.headers.get('retry-after'))
+    except (AttributeError, TypeError, ValueError):
+        return None
+
+
+class LLMProvider:
+    """Base class for chat-completion providers.
+
+    Subclasses build one long-lived client in __init__ and implement _complete.
+    complete() adds retry with exponential backoff on 429/5xx and records the
+    latency of every call.
+    """
+
+    def __init__(self, max_retries=LLM_MAX_RETRIES):
+        self.max_retries = max_retries
+        self.latencies = []
+        self.lock = threading.Lock()
+
+    def _complete(self, model, system, prompt):
+        raise NotImplementedError
+
+    def complete(self, model, system, prompt):
+        for attempt in range(self.max_retries + 1):
+            start = time.perf_counter()
+            try:
+                response = self._complete(model, system, prompt)
+            except Exception as e:
+                if attempt == self.max_retries or not is_retryable(e):
+                    raise
+                delay = get_retry_after(e) or min(60, 2 ** attempt) + random.random()
+                add('retries')
+                print(f"LLM request failed ({str(e)}), retrying in {delay:.1f}s")
+                time.sleep(delay)
+                continue
+            response.latency = time.perf_counter() - start
+            with self.lock:
+                self.latencies.append(response.latency)
+            add_llm_usage(model, response.input_tokens, response.output_tokens)
+            return response
+
+    def latency_stats(self):
+        """Count, mean, p50 and p95 of successful call latencies in seconds."""
+        with self.lock:
+            latencies = sorted(self.latencies)
+        if not latencies:
+            return {'calls': 0, 'mean': 0.0, 'p50': 0.0, 'p95': 0.0}
+        return {
+            'calls': len(latencies),
+            'mean': sum(latencies) / len(latencies),
+            'p50': latencies[int(0.50 * (len(latencies) - 1))],
+            'p95': latencies[int(0.95 * (len(latencies) - 1))]
+        }
+
+
+class OpenAIProvider(LLMProvider):
+    def __init__(self, api_key=None, base_url=None, **kwargs):
+        super().__init__(**kwargs)
+        import openai
+        api_key = api_key or os.getenv('OPENAI_API_KEY')
+        if not api_key:
+            raise ValueError("OpenAI API key not found in environment variables")
+        # Retries are handled in LLMProvider.complete so every provider behaves the same
+        self.client = openai.OpenAI(
+            api_key=api_key, base_url=base_url, max_retries=0, http_client=build_http_client())
+
+    def _complete(self, model, system, prompt):
+        response = self.client.chat.completions.create(
+            model=model,
+            messages=[
+                {"role": "system", "content": system},
+                {"role": "user", "content": prompt}
+            ]
+        )
+        usage = response.usage
+        return LLMResponse(
+            text=response.choices[0].message.content,
+            input_tokens=usage.prompt_tokens if usage else 0,
+            output_tokens=usage.completion_tokens if usage else 0
+        )
+
+
+class AnthropicProvider(LLMProvider):
+    def __init__(self, api_key=None, max_tokens=1024, **kwargs):
+        super().__init__(**kwargs)
+        try:
+            import anthropic
+        except ImportError:
+            raise ValueError("LLM_PROVIDER=anthropic needs the anthropic package installed")
+        api_key = api_key or os.getenv('ANTHROPIC_API_KEY')
+        if not api_key:
+            raise ValueError("Anthropic API key not found in environment variables")
+        self.max_tokens = max_tokens
+        self.client = anthropic.Anthropic(
+            api_key=api_key, max_retries=0, http_client=build_http_client())
+
+    def _complete(self, model, system, prompt):
+        response = self.client.messages.create(
+            model=model,
+            max_tokens=self.max_tokens,
+            system=system,
+            messages=[{"role": "user", "content": prompt}]
+        )
+        return LLMResponse(
+            text="".join(block.text for block in response.content if block.type == 'text'),
+            input_tokens=response.usage.input_tokens,
+            output_tokens=response.usage.output_tokens
+        )
+
+
+def create_provider(name=LLM_PROVIDER):
+    if name == 'openai':
+        return OpenAIProvider()
+    if name == 'anthropic':
+        return AnthropicProvider()
+    if name == 'local':
+        if not LLM_BASE_URL:
+            raise ValueError("LLM_PROVIDER=local needs LLM_BASE_URL pointing at the stand-in server")
+        return OpenAIProvider(api_key=os.getenv('OPENAI_API_KEY', 'local'), base_url=LLM_BASE_URL)
+    raise ValueError(f"Unknown LLM provider: {name}")
+
+
+_client = None
+_client_lock = threading.Lock()
+
+
+def get_llm_client():
+    """Return the process-wide LLM provider, creating it on first use."""
+    global _client
+    with _client_lock:
+        if _client is None:
+            _client = create_provider()
+        return _client
@@ -1,175 +1,195 @@
 import os
-import pandas as pd
-from crewai import Agent, Task, Crew, Process
-from crewai_tools import SerperDevTool, WebsiteSearchTool
 from dotenv import load_dotenv
-import time
-import requests
-from bs4 import BeautifulSoup
-from urllib.parse import urljoin
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from rate_limiter import RateLimiter
+from address_extractor import find_address
+from http_fetch import is_accessible
+from crew_runner import CrewRunner, result_text
+from metrics import CREW_VERBOSE, log, span
+from result_journal import ResultJournal, company_key
 
 # Load environment variables
 load_dotenv()
 
-# Initialize tools
-search_tool = SerperDevTool()
-website_tool = WebsiteSearchTool()
-
-# Create agents
-search_agent = Agent(
-    role="Web Search Specialist",
-    goal="Find company addresses through web searches",
-    backstory="""You are an expert at finding company information through web searches.
-    You are particularly good at finding office locations and addresses.""",
-    tools=[search_tool],
-    verbose=True
-)
-
-address_validator = Agent(
-    role="Address Validator",
-    goal="Validate and format company addresses",
-    backstory="""You are an expert at validating company addresses and formatting them in Dutch format.
-    You can determine if an address is correct for a specific company and format it properly.""",
-    verbose=True
-)
-
-reverse_validator = Agent(
-    role="Reverse Address Validator",
-    goal="Verify addresses by reverse searching",
-    backstory="""You are an expert at verifying addresses by searching for them and confirming
-    that they belong to the correct company. You are particularly good at identifying mismatches
-    between addresses and company names.""",
-    tools=[search_tool],
-    verbose=True
-)
-
-website_address_finder = Agent(
-    role="Website Address Finder",
-    goal="Find addresses on company websites",
-    backstory="""You are an expert at analyzing web pages to find company addresses.
-    You can identify addresses in various formats and contexts on web pages.""",
-    tools=[website_tool],
-    verbose=True
-)
-
-contact_page_finder = Agent(
-    role="Contact Page Finder",
-    goal="Find contact pages on company websites",
-    backstory="""You are an expert at navigating company websites to find contact pages.
-    You can identify contact links and analyze contact pages for address information.""",
-    tools=[website_tool],
-    verbose=True
-)
+INPUT_CSV = 'ai_companies.csv'
+OUTPUT_CSV = 'ai_companies2.csv'
+JOURNAL_FILE = 'ai_companies2.jsonl'  # One line per finished company, replayed on restart
+# The first rows were handled by an earlier manual run and are skipped, as they always were
+START_ROW = int(os.getenv('LOCATION_START_ROW', '21'))
+LOCATION_WORKERS = int(os.getenv('LOCATION_WORKERS', '4'))  # Companies processed concurrently
+CREW_RUNS_PER_MINUTE = int(os.getenv('CREW_RUNS_PER_MINUTE', '20'))  # Shared across all workers
+
+# Replaces the fixed sleep between companies; every crew kickoff takes a slot
+crew_rate_limiter = RateLimiter(requests_per_minute=CREW_RUNS_PER_MINUTE)
+
+def build_initial_crew():
+    """Web search crew: find an address, validate it, then confirm it by reverse search."""
+    # crewai and its tools take seconds to import, so they load with the first crew
+    from crewai import Agent, Task, Crew, Process
+    from cached_tools import CachedSerperDevTool
+    search_tool = CachedSerperDevTool()  # Search results cached on disk across runs and scripts
+
+    search_agent = Agent(
+        role="Web Search Specialist",
+        goal="Find company addresses through web searches",
+        backstory="""You are an expert at finding company information through web searches.
+        You are particularly good at finding office locations and addresses.""",
+        tools=[search_tool],
+        verbose=CREW_VERBOSE
+    )
+
+    address_validator = Agent(
+        role="Address Validator",
+        goal="Validate and format company addresses",
+        backstory="""You are an expert at validating company addresses and formatting them in Dutch format.
+        You can determine if an address is correct for a specific company and format it properly.""",
+        verbose=CREW_VERBOSE
+    )
+
+    reverse_validator = Agent(
+        role="Reverse Address Validator",
+        goal="Verify addresses by reverse searching",
+        backstory="""You are an expert at verifying addresses by searching for them and confirming
+        that they belong to the correct company. You are particularly good at identifying mismatches
+        between addresses and company names.""",
+        tools=[search_tool],
+        verbose=CREW_VERBOSE
+    )
+
+    # Create search task
+    search_task = Task(
+        description="""Search for the office address of {company_name} ({website}) in the Netherlands.
+        Look for terms like 'office', 'location', 'address', 'contact'.
+        Return any found address information.""",
+        agent=search_agent,
+        expected_output="""A string containing any found address information for the company.
+        If no address is found, return 'No address found in search results.'"""
+    )
+
+    # Create validation task
+    validation_task = Task(
+        description="""Validate if the found address is correct for {company_name}.
+        Format the address in Dutch format (street name number, postcode city).
+        If no address is found, return 'Address Not Found'.""",
+        agent=address_validator,
+        expected_output="""A string containing the validated and formatted address in Dutch format.
+        If no valid address is found, return 'Address Not Found'."""
+    )
+
+    # Create reverse validation task
+    reverse_validation_task = Task(
+        description="""Search for the company '{company_name}' at the address found in the previous step.
+        If the company name is not found in the search results for this address, return 'Address Not Found'.
+        If the company is found at this address, return the validated address.""",
+        agent=reverse_validator,
+        expected_output="""A string containing either the validated address or 'Address Not Found'
+        if the company cannot be confirmed at the given address."""
+    )
+
+    return Crew(
+        agents=[search_agent, address_validator, reverse_validator],
+        tasks=[search_task, validation_task, reverse_validation_task],
+        process=Process.sequential,
+        verbose=CREW_VERBOSE
+    )
+
+def build_website_crew():
+    """Website crew: read the company's own site, then its contact page."""
+    from crewai import Agent, Task, Crew, Process
+    from cached_tools import CachedScrapeWebsiteTool
+    website_tool = CachedScrapeWebsiteTool()  # Reads pages through the shared HTTP cache
+
+    website_address_finder = Agent(
+        role="Website Address Finder",
+        goal="Find addresses on company websites",
+        backstory="""You are an expert at analyzing web pages to find company addresses.
+        You can identify addresses in various formats and contexts on web pages.""",
+        tools=[website_tool],
+        verbose=CREW_VERBOSE
+    )
+
+    contact_page_finder = Agent(
+        role="Contact Page Finder",
+        goal="Find contact pages on company websites",
+        backstory="""You are an expert at navigating company websites to find contact pages.
+        You can identify contact links and analyze contact pages for address information.""",
+        tools=[website_tool],
+        verbose=CREW_VERBOSE
+    )
+
+    # Create website address search task
+    website_address_task = Task(
+        description="""Search the company website {website}
+        for any address information. Look for terms like 'office', 'location', 'address', 'contact'.
+        Return any found address information.""",
+        agent=website_address_finder,
+        expected_output="""A string containing any found address information from the website.
+        If no address is found, return 'No address found on website.'"""
+    )
+
+    # Create contact page search task
+    contact_page_task = Task(
+        description="""If no address was found on the main website, look for a contact page on {website}.
+        If a contact page is found, search it for address information.
+        Return any found address information.""",
+        agent=contact_page_finder,
+        expected_output="""A string containing any found address information from the contact page.
+        If no address is found, return 'No address found on contact page.'"""
+    )
+
+    return Crew(
+        agents=[website_address_finder, contact_page_finder],
+        tasks=[website_address_task, contact_page_task],
+        process=Process.sequential,
+        verbose=CREW_VERBOSE
+    )
+
+# Crews are built once per worker thread and reused for every company it handles
+initial_runner = CrewRunner(build_initial_crew, rate_limiter=crew_rate_limiter, name='location.search')
+website_runner = CrewRunner(build_website_crew, rate_limiter=crew_rate_limiter, name='location.website')
 
 # Function to format address in Dutch format
 def format_dutch_address(address):
     # This will be handled by the LLM in the address_validator agent
     return address
 
-# Function to check if website is accessible
+# Function to check if website is accessible (HEAD-first, through the shared fetch layer)
 def is_website_accessible(url):
-    try:
-        headers = {
-            'User-Agent': 'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/122.0.0.0 Safari/537.36',
-            'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/avif,image/webp,image/apng,*/*;q=0.8',
-            'Accept-Language': 'en-US,en;q=0.9',
-            'Accept-Encoding': 'gzip, deflate, br',
-            'Connection': 'keep-alive',
-            'Upgrade-Insecure-Requests': '1',
-            'Sec-Fetch-Dest': 'document',
-            'Sec-Fetch-Mode': 'navigate',
-            'Sec-Fetch-Site': 'none',
-            'Sec-Fetch-User': '?1'
-        }
-        response = requests.get(url, headers=headers, timeout=5)
-        return response.status_code != 403
-    except:
-        return False
+    return is_accessible(url)
+
+def is_not_found(result):
+    return "Address Not Found" in result or "No address found" in result
 
 # Function to process a single company
 def process_company(company_name, website):
+    with span('location', item=company_name) as current:
+        address = find_company_address(company_name, website)
+        if address == "API_LIMIT_REACHED" or str(address).startswith("Error:"):
+            current.error = str(address)[:200]
+        return address
+
+def find_company_address(company_name, website):
     try:
-        # Create search task
-        search_task = Task(
-            description=f"""Search for the office address of {company_name} ({website}) in the Netherlands.
-            Look for terms like 'office', 'location', 'address', 'contact'.
-            Return any found address information.""",
-            agent=search_agent,
-            expected_output="""A string containing any found address information for the company.
-            If no address is found, return 'No address found in search results.'"""
-        )
-
-        # Create validation task
-        validation_task = Task(
-            description=f"""Validate if the found address is correct for {company_name}.
-            Format the address in Dutch format (street name number, postcode city).
-            If no address is found, return 'Address Not Found'.""",
-            agent=address_validator,
-            expected_output="""A string containing the validated and formatted address in Dutch format.
-            If no valid address is found, return 'Address Not Found'."""
-        )
-
-        # Create reverse validation task
-        reverse_validation_task = Task(
-            description=f"""Search for the company '{company_name}' at the address found in the previous step.
-            If the company name is not found in the search results for this address, return 'Address Not Found'.
-            If the company is found at this address, return the validated address.""",
-            agent=reverse_validator,
-            expected_output="""A string containing either the validated address or 'Address Not Found'
-            if the company cannot be confirmed at the given address."""
-        )
-
-        # Create initial crew for web search
-        initial_crew = Crew(
-            agents=[search_agent, address_validator, reverse_validator],
-            tasks=[search_task, validation_task, reverse_validation_task],
-            process=Process.sequential,
-            verbose=True
-        )
-
-        # Execute initial crew
-        initial_result = initial_crew.kickoff()
+        # Cheap deterministic pass over the company's own pages; crews only run if it finds nothing
+        address = find_address(website)
+        if address:
+            log(f"Found address for {company_name} on its website: {address}", level=2)
+            return address
+        
+        inputs = {'company_name': str(company_name), 'website': str(website)}
+        initial_result = result_text(initial_runner.kickoff(inputs))
 
         # Only proceed with website search if no address was found
-        if "Address Not Found" in initial_result or "No address found" in initial_result:
+        if is_not_found(initial_result):
             # Check if website is accessible before proceeding
             if not is_website_accessible(website):
-                print(f"Website {website} is not accessible (403 Forbidden). Using web search results only.")
+                log(f"Website {website} is not accessible (403 Forbidden). Using web search results only.", level=2)
                 return initial_result
 
-            # Create website address search task
-            website_address_task = Task(
-                description=f"""Search the company website {website}
-                for any address information. Look for terms like 'office', 'location', 'address', 'contact'.
-                Return any found address information.""",
-                agent=website_address_finder,
-                expected_output="""A string containing any found address information from the website.
-                If no address is found, return 'No address found on website.'"""
-            )
-
-            # Create contact page search task
-            contact_page_task = Task(
-                description=f"""If no address was found on the main website, look for a contact page on {website}.
-                If a contact page is found, search it for address information.
-                Return any found address information.""",
-                agent=contact_page_finder,
-                expected_output="""A string containing any found address information from the contact page.
-                If no address is found, return 'No address found on contact page.'"""
-            )
-
-            # Create website search crew
-            website_crew = Crew(
-                agents=[website_address_finder, contact_page_finder],
-                tasks=[website_address_task, contact_page_task],
-                process=Process.sequential,
-                verbose=True
-            )
-
-            # Execute website crew
-            website_result = website_crew.kickoff()
+            website_result = result_text(website_runner.kickoff(inputs))
             
             # If website search found an address, use it; otherwise use the initial result
-            if "Address Not Found" not in website_result and "No address found" not in website_result:
+            if not is_not_found(website_result):
                 return website_result
 
         return initial_result
@@ -179,49 +199,63 @@ def process_company(company_name, website):
             return "API_LIMIT_REACHED"
         return f"Error: {str(e)}"
 
+def load_finished_addresses(journal):
+    """Addresses already found, keyed by company: the previous CSV output plus the journal."""
+    import pandas as pd
+    finished = {}
+    if os.path.exists(OUTPUT_CSV):
+        existing_df = pd.read_csv(OUTPUT_CSV)
+        for _, row in existing_df.iterrows():
+            if 'address' in existing_df.columns and pd.notna(row['address']):
+                finished[company_key(row['Name'], row['Website'])] = row['address']
+    for key, record in journal.load().items():
+        finished[key] = record['address']
+    return finished
+
 def main():
-    # Read the CSV file
-    df = pd.read_csv('ai_companies.csv')
-    
-    # Create a new dataframe starting from index 21
-    df_subset = df.iloc[21:].copy()
+    import pandas as pd
+    from cached_tools import search_cache_report
     
-    # Try to read existing results file
-    try:
-        existing_df = pd.read_csv('ai_companies2.csv')
-        # Get the last processed index
-        last_processed = existing_df.index[-1] if not existing_df.empty else -1
-        # Only process companies after the last processed one
-        df_subset = df.iloc[last_processed + 1:].copy()
-    except FileNotFoundError:
-        # If file doesn't exist, start from index 21
-        df_subset = df.iloc[21:].copy()
+    # Read the CSV file
+    df = pd.read_csv(INPUT_CSV)
+    keys = [company_key(row['Name'], row['Website']) for _, row in df.iterrows()]
     
-    # Add address column if it doesn't exist
-    if 'address' not in df_subset.columns:
-        df_subset['address'] = None
+    # Resume by company key, so reordering or extending the input is safe
+    journal = ResultJournal(JOURNAL_FILE)
+    finished = load_finished_addresses(journal)
+    todo = [(key, row) for key, (_, row) in list(zip(keys, df.iterrows()))[START_ROW:] if key not in finished]
+    print(f"Starting at row {START_ROW}: {len(keys[START_ROW:]) - len(todo)} companies already done, "
+          f"{len(todo)} to process with {LOCATION_WORKERS} workers")
     
-    # Process each company
-    for index, row in df_subset.iterrows():
-        print(f"\nProcessing {row['Name']}...")
-        address = process_company(row['Name'], row['Website'])
-        df_subset.at[index, 'address'] = address
-        
-        # Add a small delay to avoid rate limiting
-        time.sleep(2)
+    # Process companies concurrently; each result is journalled as soon as it completes
+    with ThreadPoolExecutor(max_workers=LOCATION_WORKERS) as executor:
+        futures = {
+            executor.submit(process_company, row['Name'], row['Website']): (key, row['Name'])
+            for key, row in todo
+        }
+        for future in as_completed(futures):
+            key, name = futures[future]
+            address = future.result()
+            if address == "API_LIMIT_REACHED" or str(address).startswith("Error:"):
+                # Not journalled, so the company is retried on the next run
+                log(f"\nFailed {name}: {address}")
+                continue
+            address = str(address)
+            journal.append(key, {'address': address})
+            finished[key] = address
+            log(f"\nFinished {name}: {address}")
+    journal.close()
     
-    # Append to existing file or create new one
-    try:
-        existing_df = pd.read_csv('ai_companies2.csv')
-        # Combine existing and new results
-        combined_df = pd.concat([existing_df, df_subset], ignore_index=True)
-        # Save combined results
-        combined_df.to_csv('ai_companies2.csv', index=False)
-    except FileNotFoundError:
-        # If file doesn't exist, save as new
-        df_subset.to_csv('ai_companies2.csv', index=False)
+    # Compact everything found so far into the output table, in input order
+    df['address'] = [finished.get(key) for key in keys]
+    # Written aside and moved into place: the resume logic reads this file back
+    df[df['address'].notna()].to_csv(f"{OUTPUT_CSV}.tmp", index=False)
+    os.replace(f"{OUTPUT_CSV}.tmp", OUTPUT_CSV)
+    # Everything written to the CSV is read back from there, so the journal only keeps the rest
+    journal.compact(drop={key for key in keys if key in finished})
     
-    print("\nProcessing complete. Results saved to ai_companies2.csv")
+    print(f"\nProcessing complete. Results saved to {OUTPUT_CSV}")
+    print(search_cache_report())
 
 if __name__ == "__main__":
     main() 
\ No newline at end of file
@@ -0,0 +1,295 @@
+"""Per-item wall time, token, search, cache and retry metrics for every stage.
+
+A unit of work (one email, one company, one PDF) is wrapped in a span:
+
+    with span('location', item=company_name):
+        ...
+
+Counters bumped while it runs (LLM tokens from llm_client, crew token usage
+from crew_runner, Serper calls and cache lookups from cached_tools, retries)
+go to the innermost open span of the current thread or task and to the spans
+around it. Each finished span, crew task and agent step is appended to
+METRICS_FILE as one JSON line (buffered, so the hot loop doesn't wait on
+disk). Set METRICS_FILE= to turn recording off.
+
+    python metrics.py report            # p50/p95 latency, tokens, cost per stage (latest run)
+    python metrics.py report --all      # every recorded run
+    python metrics.py export metrics.sqlite
+
+Console output is controlled separately with VERBOSITY: 0 prints only
+summaries, 1 (default) per-company progress, 2 per-email progress and the
+crewai agent logs.
+"""
+import argparse
+import atexit
+import contextvars
+import json
+import os
+import sqlite3
+import sys
+import threading
+import time
+import uuid
+from collections import defaultdict
+from contextlib import contextmanager
+
+METRICS_FILE = os.getenv('METRICS_FILE', 'metrics.jsonl')
+METRICS_FLUSH_EVERY = 100  # Records buffered before they are written out
+VERBOSITY = int(os.getenv('VERBOSITY', '1'))
+CREW_VERBOSE = VERBOSITY >= 2  # crewai's agent logs print every thought and tool call
+
+# USD per million (input, output) tokens; extend or override with LLM_PRICES='{"model": [in, out]}'
+MODEL_PRICES = {
+    'gpt-4': (30.0, 60.0),
+    'gpt-4-turbo': (10.0, 30.0),
+    'gpt-4o': (2.5, 10.0),
+    'gpt-4o-mini': (0.15, 0.6),
+    'gpt-3.5-turbo': (0.5, 1.5),
+    'claude-3-5-sonnet-latest': (3.0, 15.0),
+    'claude-3-5-haiku-latest': (0.8, 4.0),
+}
+MODEL_PRICES.update({model: tuple(prices) for model, prices in json.loads(os.getenv('LLM_PRICES', '{}')).items()})
+COUNTERS = ('llm_calls', 'input_tokens', 'output_tokens', 'cost_usd', 'search_calls',
+            'cache_hits', 'cache_misses', 'retries')
+
+_current_span = contextvars.ContextVar('metrics_span', default=None)
+
+
+def log(message, level=1):
+    """print() that respects VERBOSITY; level 2 is for per-item detail."""
+    if VERBOSITY >= level:
+        print(message)
+
+
+def run_id():
+    """Identifies this run; inherited by worker processes through the environment."""
+    if 'METRICS_RUN_ID' not in os.environ:
+        os.environ['METRICS_RUN_ID'] = f"{time.strftime('%Y%m%dT%H%M%S')}-{uuid.uuid4().hex[:6]}"
+    return os.environ['METRICS_RUN_ID']
+
+
+# Fixed on import, before any worker process is started
+run_id()
+
+
+def estimate_cost(model, input_tokens, output_tokens):
+    """USD cost of a call, 0 for models without a known price."""
+    model = (model or '').split('/')[-1]  # litellm-style 'openai/gpt-4o'
+    prices = MODEL_PRICES.get(model)
+    if prices is None:
+        return 0.0
+    return (input_tokens * prices[0] + output_tokens * prices[1]) / 1e6
+
+
+class MetricsWriter:
+    """Buffered, thread-safe JSONL appender."""
+
+    def __init__(self, path, flush_every=METRICS_FLUSH_EVERY):
+        self.path = path
+        self.flush_every = flush_every
+        self.buffer = []
+        self.lock = threading.Lock()
+
+    def write(self, record):
+        with self.lock:
+            self.buffer.append(record)
+            if len(self.buffer) >= self.flush_every:
+                self._flush()
+
+    def _flush(self):
+        if not self.buffer:
+            return
+        lines = ''.join(json.dumps(record, default=str) + '\n' for record in self.buffer)
+        self.buffer = []
+        with open(self.path, 'a', encoding='utf-8') as f:
+            f.write(lines)
+
+    def flush(self):
+        with self.lock:
+            self._flush()
+
+
+_writer = None
+_writer_lock = threading.Lock()
+
+
+def get_writer():
+    """Process-wide metrics writer, or None when METRICS_FILE is empty."""
+    global _writer
+    if not METRICS_FILE:
+        return None
+    with _writer_lock:
+        if _writer is None:
+            _writer = MetricsWriter(METRICS_FILE)
+            atexit.register(_writer.flush)
+        return _writer
+
+
+def flush():
+    """Write out buffered records now (worker processes don't run atexit hooks)."""
+    writer = get_writer()
+    if writer is not None:
+        writer.flush()
+
+
+def record(kind, stage, **fields):
+    writer = get_writer()
+    if writer is not None:
+        writer.write(dict(kind=kind, stage=stage, run=run_id(), pid=os.getpid(), time=time.time(), **fields))
+
+
+class Span:
+    def __init__(self, stage, item=None, parent=None):
+        self.stage = stage
+        self.item = item
+        self.parent = parent
+        self.start = time.perf_counter()
+        self.counters = dict.fromkeys(COUNTERS, 0)
+        self.model = None
+        self.error = None
+
+
+@contextmanager
+def span(stage, item=None):
+    """Time a unit of work and collect the counters bumped inside it into one record."""
+    current = Span(stage, None if item is None else str(item), _current_span.get())
+    token = _current_span.set(current)
+    try:
+        yield current
+    except Exception as e:
+        current.error = type(e).__name__
+        raise
+    finally:
+        _current_span.reset(token)
+        record('span', stage, item=current.item, parent=current.parent.stage if current.parent else None,
+               seconds=round(time.perf_counter() - current.start, 4), model=current.model,
+               error=current.error, **current.counters)
+
+
+def add(counter, amount=1):
+    """Bump a counter on the current span and every span it is nested in."""
+    current = _current_span.get()
+    while current is not None:
+        current.counters[counter] += amount
+        current = current.parent
+
+
+def add_llm_usage(model, input_tokens, output_tokens, calls=1):
+    """Count one (or several) LLM calls with their tokens and estimated cost."""
+    add('llm_calls', calls)
+    add('input_tokens', input_tokens)
+    add('output_tokens', output_tokens)
+    add('cost_usd', estimate_cost(model, input_tokens, output_tokens))
+    current = _current_span.get()
+    while current is not None:
+        current.model = current.model or model
+        current = current.parent
+
+
+def event(kind, **fields):
+    """Record a sub-step of the current span (a crew task, an agent step) under its stage and item."""
+    current = _current_span.get()
+    record(kind, current.stage if current else None, item=current.item if current else None, **fields)
+
+
+def load_records(path=METRICS_FILE):
+    records = []
+    if not os.path.exists(path):
+        return records
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            try:
+                records.append(json.loads(line))
+            except json.JSONDecodeError:
+                continue  # A line torn by a crash
+    return records
+
+
+def percentile(values, fraction):
+    values = sorted(values)
+    return values[int(fraction * (len(values) - 1))] if values else 0.0
+
+
+def summarize(records):
+    """Per-stage rows for the report: count, p50/p95/total seconds and summed counters."""
+    by_stage = defaultdict(list)
+    for entry in records:
+        # Crew tasks are grouped per agent, agent steps per tool
+        by_stage[(entry['kind'], entry['stage'] or '', entry.get('agent') or entry.get('tool') or '')].append(entry)
+    rows = []
+    # Each stage's spans first, then its crew tasks and agent steps
+    order = {'span': 0, 'task': 1, 'step': 2}
+    for (kind, stage, agent), entries in sorted(by_stage.items(), key=lambda group: (
+            group[0][1], order.get(group[0][0], 3), group[0][2])):
+        seconds = [entry['seconds'] for entry in entries]
+        row = {'kind': kind, 'stage': stage, 'agent': agent, 'count': len(entries),
+               'errors': sum(1 for entry in entries if entry.get('error')),
+               'p50': percentile(seconds, 0.50), 'p95': percentile(seconds, 0.95), 'total': sum(seconds)}
+        for counter in COUNTERS:
+            row[counter] = sum(entry.get(counter) or 0 for entry in entries)
+        rows.append(row)
+    return rows
+
+
+def print_report(path=METRICS_FILE, all_runs=False):
+    records = load_records(path)
+    if not records:
+        print(f"No metrics recorded in {path}")
+        return
+    if not all_runs:
+        latest = max(records, key=lambda entry: entry['time'])['run']
+        records = [entry for entry in records if entry['run'] == latest]
+        print(f"Run {latest}")
+    print(f"{'stage':<28}{'n':>6}{'err':>5}{'p50 s':>8}{'p95 s':>8}{'total s':>9}"
+          f"{'llm':>6}{'tok in':>9}{'tok out':>8}{'search':>7}{'cache':>7}{'retry':>6}{'cost $':>10}")
+    for row in summarize(records):
+        name = row['stage'] if row['kind'] == 'span' else f"  {row['kind']} {row['agent']}".rstrip()
+        lookups = row['cache_hits'] + row['cache_misses']
+        cache = f"{row['cache_hits'] / lookups:.0%}" if lookups else '-'
+        print(f"{name[:27]:<28}{row['count']:>6}{row['errors']:>5}{row['p50']:>8.2f}{row['p95']:>8.2f}"
+              f"{row['total']:>9.1f}{row['llm_calls']:>6}{row['input_tokens']:>9}{row['output_tokens']:>8}"
+              f"{row['search_calls']:>7}{cache:>7}{row['retries']:>6}{row['cost_usd']:>10.4f}")
+    top_level = [entry for entry in records if entry['kind'] == 'span' and not entry.get('parent')]
+    print(f"Total: {sum(entry['seconds'] for entry in top_level):.1f}s of work, "
+          f"${sum(entry.get('cost_usd') or 0 for entry in top_level):.3f} estimated LLM cost "
+          f"(nested stages are included in their parents)")
+
+
+def export_sqlite(db_path, path=METRICS_FILE):
+    """Copy the JSONL records into a `metrics` table for ad-hoc SQL. Returns the row count."""
+    records = load_records(path)
+    columns = ['kind', 'stage', 'item', 'parent', 'agent', 'tool', 'run', 'pid', 'time',
+               'seconds', 'model', 'error'] + list(COUNTERS)
+    conn = sqlite3.connect(db_path)
+    try:
+        conn.execute("DROP TABLE IF EXISTS metrics")
+        conn.execute(f"CREATE TABLE metrics ({', '.join(columns)})")
+        conn.executemany(
+            f"INSERT INTO metrics VALUES ({', '.join('?' * len(columns))})",
+            ([entry.get(column) for column in columns] for entry in records))
+        conn.execute("CREATE INDEX metrics_run_stage ON metrics (run, stage)")
+        conn.commit()
+    finally:
+        conn.close()
+    return len(records)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Report on recorded pipeline metrics")
+    parser.add_argument('--file', default=METRICS_FILE or 'metrics.jsonl', help='Metrics JSONL file')
+    subparsers = parser.add_subparsers(dest='command')
+    report = subparsers.add_parser('report', help='Latency, tokens and cost per stage')
+    report.add_argument('--all', action='store_true', help='Every recorded run instead of the latest')
+    export = subparsers.add_parser('export', help='Copy the metrics into a SQLite table')
+    export.add_argument('db', help='SQLite file to write')
+    args = parser.parse_args(argv)
+
+    if args.command == 'export':
+        count = export_sqlite(args.db, args.file)
+        print(f"Exported {count} records to {args.db}")
+    else:
+        print_report(args.file, all_runs=getattr(args, 'all', False))
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,466 @@
+"""Company pipeline as a dependency graph over one keyed SQLite table.
+
+Replaces the ai_companies.csv -> ai_companies2.csv -> ... -> ai_companies8.csv
+chain. Companies live in one table keyed by company_key(name, website); every
+stage reads the columns it needs and stores its outputs per company together
+with a hash of the inputs it saw. A run only computes rows whose inputs
+changed or that have no result yet, and stages whose dependencies are done
+run in parallel (location and career-page lookup don't depend on each other).
+
+    python pipeline.py import ai_companies.csv     # add/refresh companies
+    python pipeline.py import ai_companies8.csv    # reuse results and manual columns (rank, dear_name)
+    python pipeline.py run                          # or: run --stages location recruitment
+    python pipeline.py status
+    python pipeline.py export companies.csv --stage analysis
+"""
+import argparse
+import csv
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, as_completed, wait
+from dataclasses import dataclass, field
+from typing import Callable, Iterable, List, Optional, Tuple
+
+from result_journal import company_key
+
+PIPELINE_DB = 'companies.sqlite'
+COVER_LETTER_TEMPLATE = 'cover_letter.md'
+
+
+@dataclass
+class Stage:
+    """One step of the company pipeline.
+
+    run receives the rows that need computing and yields (key, outputs) pairs
+    as they finish. outputs maps the stage's output columns to values, or is
+    None to leave the row pending so it is retried on the next run.
+
+    A row is eligible for a stage once every stage in depends_on has an
+    up-to-date result for it and, if set, the `requires` column is truthy.
+    """
+    name: str
+    inputs: List[str]
+    outputs: List[str]
+    run: Callable[[List[dict]], Iterable[Tuple[str, Optional[dict]]]]
+    depends_on: List[str] = field(default_factory=list)
+    requires: Optional[str] = None
+    # Bump to recompute every row after changing the stage's logic
+    version: str = '1'
+    # Extra input shared by all rows, e.g. a hash of the cover letter template
+    extra_inputs: Optional[Callable[[], str]] = None
+    # Cheap and local: also evaluated while importing CSVs, so imported results further down can be reused
+    offline: bool = False
+
+
+def run_concurrently(rows, func, workers):
+    """Yield (row, func(row)) as calls finish; an exception counts as no result."""
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        futures = {executor.submit(func, row): row for row in rows}
+        for future in as_completed(futures):
+            try:
+                yield futures[future], future.result()
+            except Exception as e:
+                print(f"{futures[future]['Name']}: {e}")
+                yield futures[future], None
+
+
+def run_location(rows):
+    from location_getter import LOCATION_WORKERS, process_company
+    results = run_concurrently(rows, lambda row: process_company(row['Name'], row['Website']), LOCATION_WORKERS)
+    for row, address in results:
+        address = str(address)
+        if address == "API_LIMIT_REACHED" or address.startswith("Error:"):
+            yield row['_key'], None
+        else:
+            yield row['_key'], {'address': address}
+
+
+def run_recruitment(rows):
+    from recruitment_email import RECRUITMENT_WORKERS, process_company
+    results = run_concurrently(rows, lambda row: process_company(row['Name'], row['Website']), RECRUITMENT_WORKERS)
+    for row, result in results:
+        if result is None or result['recruitment_page'] is None:
+            yield row['_key'], None
+        else:
+            yield row['_key'], {'recruitment_page': result['recruitment_page']}
+
+
+def run_amsterdam(rows):
+    from filter_amsterdam import amsterdam_area
+    # One vectorized pass over every address that needs (re)computing
+    inside = amsterdam_area().mask(row['address'] for row in rows)
+    for row, in_amsterdam in zip(rows, inside):
+        yield row['_key'], {'in_amsterdam': bool(in_amsterdam)}
+
+
+def run_rank(rows):
+    from filter_companies import is_ranked
+    for row in rows:
+        # Ranks are filled in by hand (see `import`); unranked companies wait
+        if row.get('rank') in (None, ''):
+            yield row['_key'], None
+        else:
+            yield row['_key'], {'rank_ok': is_ranked(row['rank'])}
+
+
+def run_analysis(rows):
+    from company_analyzer import ANALYSIS_WORKERS, analyze_company
+    results = run_concurrently(
+        rows, lambda row: analyze_company(row['Name'], row['Website'], row['Category']), ANALYSIS_WORKERS)
+    for row, content in results:
+        yield row['_key'], {'personalized_content': content} if content else None
+
+
+def run_letters(rows):
+    from generate_cover_letters import OUTPUT_DIR, letter_fields, output_path_for, render_letters
+    # The addressee is filled in by hand (see `import`)
+    ready = []
+    # Results come back by output path, which is derived from the company name
+    keys = {}
+    for row in rows:
+        if not row.get('dear_name'):
+            yield row['_key'], None
+            continue
+        output_path = output_path_for(letter_fields(row), OUTPUT_DIR)
+        if output_path in keys:
+            # Two companies with the same name would overwrite each other's PDF
+            print(f"{row['Name']}: skipped, {output_path} is already used by another company with this name")
+            yield row['_key'], None
+            continue
+        keys[output_path] = row['_key']
+        ready.append(row)
+    for name, output_path, status in render_letters(ready, COVER_LETTER_TEMPLATE, OUTPUT_DIR):
+        if status.startswith('failed'):
+            print(f"{name}: {status}")
+            yield keys[output_path], None
+        else:
+            yield keys[output_path], {'cover_letter': output_path}
+
+
+def template_hash():
+    with open(COVER_LETTER_TEMPLATE, 'rb') as f:
+        return hashlib.sha256(f.read()).hexdigest()
+
+
+def amsterdam_area_hash():
+    # Changing the radius or the centroid table recomputes the Amsterdam stage
+    from filter_amsterdam import AMSTERDAM_RADIUS_KM
+    from geo_index import CENTROIDS_CSV
+    with open(CENTROIDS_CSV, 'rb') as f:
+        return hashlib.sha256(f.read() + str(AMSTERDAM_RADIUS_KM).encode()).hexdigest()
+
+
+STAGES = [
+    Stage('location', ['Name', 'Website'], ['address'], run_location),
+    Stage('recruitment', ['Name'], ['recruitment_page'], run_recruitment),
+    Stage('amsterdam', ['address'], ['in_amsterdam'], run_amsterdam,
+          depends_on=['location'], version='3', extra_inputs=amsterdam_area_hash, offline=True),
+    Stage('rank', ['rank'], ['rank_ok'], run_rank,
+          depends_on=['amsterdam'], requires='in_amsterdam', offline=True),
+    Stage('analysis', ['Name', 'Website', 'Category'], ['personalized_content'], run_analysis,
+          depends_on=['rank'], requires='rank_ok'),
+    Stage('letters', ['Name', 'dear_name', 'personalized_content'], ['cover_letter'], run_letters,
+          depends_on=['analysis'], extra_inputs=template_hash),
+]
+
+
+def topological_order(stages):
+    by_name = {stage.name: stage for stage in stages}
+    order, visiting, done = [], set(), set()
+
+    def visit(stage):
+        if stage.name in done:
+            return
+        if stage.name in visiting:
+            raise ValueError(f"Stage dependency cycle through {stage.name}")
+        visiting.add(stage.name)
+        for dependency in stage.depends_on:
+            if dependency not in by_name:
+                raise ValueError(f"Stage {stage.name} depends on unknown stage {dependency}")
+            visit(by_name[dependency])
+        visiting.discard(stage.name)
+        done.add(stage.name)
+        order.append(stage)
+
+    for stage in stages:
+        visit(stage)
+    return order
+
+
+def upstream_stages(stages):
+    """Map each stage name to every stage it depends on, directly or through other stages."""
+    upstream = {}
+    for stage in topological_order(stages):
+        upstream[stage.name] = set(stage.depends_on).union(*(upstream[d] for d in stage.depends_on))
+    return upstream
+
+
+def input_hash(stage, row, extra=''):
+    values = [stage.version, extra] + [row.get(column) for column in stage.inputs]
+    return hashlib.sha256(json.dumps(values, sort_keys=True, default=str).encode('utf-8')).hexdigest()
+
+
+class CompanyTable:
+    """Companies plus per-stage results in SQLite.
+
+    companies holds the imported columns of each company (name, website,
+    category, and hand-filled columns like rank or dear_name); results holds
+    one row per (stage, company) with the outputs and the hash of the inputs
+    they were computed from. Safe to share between stage threads.
+    """
+
+    def __init__(self, path=PIPELINE_DB):
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS companies (
+                id INTEGER PRIMARY KEY,
+                key TEXT NOT NULL UNIQUE,
+                fields TEXT NOT NULL
+            )
+        """)
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS results (
+                stage TEXT NOT NULL,
+                key TEXT NOT NULL,
+                input_hash TEXT NOT NULL,
+                outputs TEXT NOT NULL,
+                updated_at REAL NOT NULL,
+                PRIMARY KEY (stage, key)
+            )
+        """)
+        self.conn.commit()
+
+    def upsert_companies(self, companies):
+        """Insert or update companies from (key, fields) pairs; non-empty new values win. Returns how many were new."""
+        new = 0
+        with self.lock:
+            for key, fields in companies:
+                row = self.conn.execute("SELECT fields FROM companies WHERE key = ?", (key,)).fetchone()
+                if row is None:
+                    self.conn.execute("INSERT INTO companies (key, fields) VALUES (?, ?)", (key, json.dumps(fields)))
+                    new += 1
+                else:
+                    merged = dict(json.loads(row[0]), **fields)
+                    self.conn.execute("UPDATE companies SET fields = ? WHERE key = ?", (json.dumps(merged), key))
+            self.conn.commit()
+        return new
+
+    def save_result(self, stage, key, input_hash, outputs):
+        with self.lock:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO results (stage, key, input_hash, outputs, updated_at) VALUES (?, ?, ?, ?, ?)",
+                (stage, key, input_hash, json.dumps(outputs), time.time()))
+            self.conn.commit()
+
+    def load(self):
+        """Return ([(key, fields)] in import order, {stage: {key: (input_hash, outputs)}})."""
+        with self.lock:
+            companies = [(key, json.loads(fields))
+                         for key, fields in self.conn.execute("SELECT key, fields FROM companies ORDER BY id")]
+            results = {}
+            for stage, key, stored_hash, outputs in self.conn.execute(
+                    "SELECT stage, key, input_hash, outputs FROM results"):
+                results.setdefault(stage, {})[key] = (stored_hash, json.loads(outputs))
+        return companies, results
+
+    def close(self):
+        with self.lock:
+            self.conn.close()
+
+
+def resolve(table, stages):
+    """Work out every company's current columns and what each stage still has to do.
+
+    Walks the stages in dependency order, merging each up-to-date result into
+    its company row. A stored result whose input hash no longer matches is
+    ignored, so everything downstream of a changed value is recomputed too.
+
+    Returns (rows, valid, pending): rows are dicts of columns plus '_key';
+    valid maps stage -> keys with an up-to-date result; pending maps stage ->
+    [(row copy, input hash)] still to compute.
+    """
+    companies, results = table.load()
+    rows = [dict(fields, _key=key) for key, fields in companies]
+    valid, pending = {}, {}
+    for stage in topological_order(stages):
+        extra = stage.extra_inputs() if stage.extra_inputs else ''
+        stored = results.get(stage.name, {})
+        valid[stage.name], pending[stage.name] = set(), []
+        for row in rows:
+            if not all(row['_key'] in valid.get(dependency, ()) for dependency in stage.depends_on):
+                continue
+            if stage.requires and not row.get(stage.requires):
+                continue
+            current_hash = input_hash(stage, row, extra)
+            result = stored.get(row['_key'])
+            if result is not None and result[0] == current_hash:
+                row.update(result[1])
+                valid[stage.name].add(row['_key'])
+            else:
+                pending[stage.name].append((dict(row), current_hash))
+    return rows, valid, pending
+
+
+def run_stage(table, stage, stages):
+    """Compute one stage's pending rows, saving each result as soon as it arrives."""
+    _, valid, pending = resolve(table, stages)
+    todo = pending[stage.name]
+    print(f"[{stage.name}] {len(todo)} to compute, {len(valid[stage.name])} up to date")
+    if not todo:
+        return 0
+    hashes = {row['_key']: current_hash for row, current_hash in todo}
+    start = time.perf_counter()
+    computed = 0
+    for key, outputs in stage.run([row for row, _ in todo]):
+        if outputs is not None:
+            table.save_result(stage.name, key, hashes[key], outputs)
+            computed += 1
+    print(f"[{stage.name}] computed {computed}, {len(todo) - computed} left pending "
+          f"({time.perf_counter() - start:.1f}s)")
+    return computed
+
+
+def run_pipeline(table, stages=STAGES, selected=None):
+    """Run the selected stages (default: all), each as soon as its dependencies have finished.
+
+    Stages that don't depend on each other run in parallel. A stage waits
+    for every selected stage upstream of it, also when the dependency runs
+    through a stage that isn't selected (letters waits for amsterdam through
+    analysis). A stage that fails is reported and its dependents are
+    skipped. Returns the names of failed stages.
+    """
+    selected = set(selected or [stage.name for stage in stages])
+    upstream = upstream_stages(stages)
+    remaining = [stage for stage in topological_order(stages) if stage.name in selected]
+    finished, failed = set(), set()
+    with ThreadPoolExecutor(max_workers=max(1, len(remaining))) as executor:
+        running = {}
+        while remaining or running:
+            for stage in list(remaining):
+                # Unselected stages in between are taken as they are in the table
+                dependencies = upstream[stage.name] & selected
+                if any(d in failed for d in dependencies):
+                    print(f"[{stage.name}] skipped: depends on a failed stage")
+                    failed.add(stage.name)
+                    remaining.remove(stage)
+                elif all(d in finished for d in dependencies):
+                    running[executor.submit(run_stage, table, stage, stages)] = stage
+                    remaining.remove(stage)
+            if not running:
+                continue
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                stage = running.pop(future)
+                try:
+                    future.result()
+                    finished.add(stage.name)
+                except Exception as e:
+                    print(f"[{stage.name}] failed: {e}")
+                    failed.add(stage.name)
+    return failed
+
+
+def import_csv(table, filename, stages=STAGES):
+    """Add or refresh companies from a CSV with Name and Website columns.
+
+    Columns that are stage outputs (address, recruitment_page,
+    personalized_content, ...) are taken as that stage's result for the row,
+    so data from the old ai_companiesN.csv files isn't computed again. All
+    other columns (Rank, Category, rank, dear_name, ...) are stored on the
+    company. Returns (new companies, imported results).
+    """
+    output_columns = {column for stage in stages for column in stage.outputs}
+    companies, imported = [], {}
+    with open(filename, 'r', encoding='utf-8', newline='') as f:
+        for row in csv.DictReader(f):
+            key = company_key(row.get('Name'), row.get('Website'))
+            companies.append((key, {c: v for c, v in row.items()
+                                    if c and c not in output_columns and v not in (None, '')}))
+            imported[key] = {c: v for c, v in row.items() if c in output_columns and v not in (None, '')}
+    new = table.upsert_companies(companies)
+
+    seeded = 0
+    for stage in topological_order(stages):
+        _, _, pending = resolve(table, stages)
+        todo = pending[stage.name]
+        if stage.offline:
+            hashes = {row['_key']: current_hash for row, current_hash in todo}
+            for key, outputs in stage.run([row for row, _ in todo]):
+                if outputs is not None:
+                    table.save_result(stage.name, key, hashes[key], outputs)
+            continue
+        for row, current_hash in todo:
+            values = imported.get(row['_key'], {})
+            if all(column in values for column in stage.outputs):
+                table.save_result(stage.name, row['_key'], current_hash,
+                                  {column: values[column] for column in stage.outputs})
+                seeded += 1
+    return new, seeded
+
+
+def export_csv(table, filename, stage=None, stages=STAGES):
+    """Write the company table to CSV, optionally only rows with an up-to-date result for `stage`."""
+    rows, valid, _ = resolve(table, stages)
+    if stage:
+        rows = [row for row in rows if row['_key'] in valid[stage]]
+    columns = []
+    for row in rows:
+        columns.extend(column for column in row if column != '_key' and column not in columns)
+    temp_filename = f"{filename}.tmp"
+    with open(temp_filename, 'w', encoding='utf-8', newline='') as f:
+        writer = csv.DictWriter(f, fieldnames=columns)
+        writer.writeheader()
+        writer.writerows({c: v for c, v in row.items() if c != '_key'} for row in rows)
+    os.replace(temp_filename, filename)
+    return len(rows)
+
+
+def print_status(table, stages=STAGES):
+    rows, valid, pending = resolve(table, stages)
+    print(f"{len(rows)} companies")
+    for stage in topological_order(stages):
+        print(f"{stage.name:<12} {len(valid[stage.name]):>6} up to date {len(pending[stage.name]):>6} pending")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Incremental company pipeline")
+    parser.add_argument('--db', default=PIPELINE_DB, help='Company table (SQLite)')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    import_parser = subparsers.add_parser('import', help='Add or refresh companies from CSV files')
+    import_parser.add_argument('files', nargs='+')
+    run_parser = subparsers.add_parser('run', help='Compute everything that is missing or out of date')
+    run_parser.add_argument('--stages', nargs='+', choices=[stage.name for stage in STAGES],
+                            help='Only run these stages (default: all)')
+    subparsers.add_parser('status', help='Show up-to-date and pending rows per stage')
+    export_parser = subparsers.add_parser('export', help='Write the company table to CSV')
+    export_parser.add_argument('file')
+    export_parser.add_argument('--stage', choices=[stage.name for stage in STAGES],
+                               help='Only companies with an up-to-date result for this stage')
+    args = parser.parse_args(argv)
+
+    table = CompanyTable(args.db)
+    try:
+        if args.command == 'import':
+            for filename in args.files:
+                new, seeded = import_csv(table, filename)
+                print(f"{filename}: {new} new companies, {seeded} stage results imported")
+        elif args.command == 'run':
+            return 1 if run_pipeline(table, selected=args.stages) else 0
+        elif args.command == 'status':
+            print_status(table)
+        elif args.command == 'export':
+            count = export_csv(table, args.file, args.stage)
+            print(f"Wrote {count} companies to {args.file}")
+    finally:
+        table.close()
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -1,15 +1,20 @@
 import os
 import json
 import base64
-import csv
-from datetime import datetime, timedelta
-from email.utils import parsedate_to_datetime
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+from email.utils import parseaddr, parsedate_to_datetime
 from dotenv import load_dotenv
-from google.oauth2.credentials import Credentials
-from google_auth_oauthlib.flow import InstalledAppFlow
-from googleapiclient.discovery import build
+from googleapiclient.errors import HttpError
 from email import message_from_bytes
-import openai  # or anthropic, or other API of your choice
+from llm_client import estimate_tokens, get_llm_client, llm_rate_limiter  # openai, anthropic or a local stand-in, see LLM_PROVIDER
+from sqlite_cache import SQLiteCache, make_cache_key
+from email_body import extract_body
+from contact_store import ContactStore, LINKEDIN_INMAIL, normalize_email, parse_sender
+from metrics import add, log, span
 
 # Load environment variables
 load_dotenv()
@@ -17,22 +22,56 @@ load_dotenv()
 # Gmail API setup
 SCOPES = ['https://www.googleapis.com/auth/gmail.readonly']
 RECRUITER_LABEL = 'money/jobs/job agents'  # Label containing LinkedIn job emails
-TEST_EMAIL_LIMIT =150
+TEST_EMAIL_LIMIT = None  # Set to e.g. 150 to cap test runs; None syncs the whole label
 MAX_EMAIL_AGE_YEARS = 4  # Maximum age of emails to process
+LIST_PAGE_SIZE = 500  # Message IDs per messages.list page (Gmail maximum)
+BATCH_SIZE = 50  # Messages per Gmail HTTP batch request (Gmail allows up to 100)
+BATCH_MAX_RETRIES = 3  # Retries for messages that fail inside a batch
+RETRYABLE_STATUSES = {429, 500, 502, 503, 504}
+EXTRACTION_WORKERS = int(os.getenv('EXTRACTION_WORKERS', '4'))  # Concurrent LLM extraction calls
+EXTRACTION_OUTPUT_TOKENS = 150  # Rough size of one extracted JSON object
+EXTRACTION_BATCH_TOKENS = int(os.getenv('EXTRACTION_BATCH_TOKENS', '3000'))  # Prompt budget per batched request, 0 disables batching
+EXTRACTION_BATCH_MAX_EMAILS = 10
+BODY_TOKEN_BUDGET = int(os.getenv('BODY_TOKEN_BUDGET', '1500'))  # Max email body tokens sent to the LLM
+EXTRACTION_MODEL = os.getenv('EXTRACTION_MODEL', 'gpt-4')
+EXTRACTION_SYSTEM_PROMPT = "You extract structured data from recruiter emails accurately."
+LLM_CACHE_FILE = 'llm_cache.sqlite'  # Extraction results keyed by model + prompt + email content
+LLM_CACHE_TTL_DAYS = 90
+LLM_CACHE_MAX_ENTRIES = 50000
+CONTACTS_DB = 'recruiter_contacts.sqlite'  # Indexed contact store, the source of truth
+CONTACTS_CSV = 'recruiter_contacts.csv'  # Exported from the store after every run
+SYNC_STATE_FILE = 'sync_state.json'  # Incremental sync checkpoint (historyId + processed IDs)
+
+def get_email_cutoff(tz=None):
+    """Return the oldest date an email may have to still be processed."""
+    return datetime.now(tz) - timedelta(days=MAX_EMAIL_AGE_YEARS * 365)
+
+def build_age_query():
+    """Gmail search filter that only lists messages newer than the age cutoff."""
+    cutoff_date = get_email_cutoff(timezone.utc)
+    return f"after:{int(cutoff_date.timestamp())}"
 
 def is_email_recent(date_str):
     try:
         # Parse the email date string to datetime
         email_date = parsedate_to_datetime(date_str)
-        # Calculate the cutoff date (4 years ago from now)
-        cutoff_date = datetime.now(email_date.tzinfo) - timedelta(days=MAX_EMAIL_AGE_YEARS * 365)
         # Return True if email is newer than cutoff date
-        return email_date > cutoff_date
+        return email_date > get_email_cutoff(email_date.tzinfo)
     except Exception as e:
         print(f"Warning: Could not parse date '{date_str}': {str(e)}")
         return False  # Skip emails with invalid dates
 
+def is_internal_date_recent(internal_date):
+    """Check Gmail's internalDate (epoch milliseconds) against the age cutoff."""
+    received = datetime.fromtimestamp(int(internal_date) / 1000, timezone.utc)
+    return received > get_email_cutoff(timezone.utc)
+
 def authenticate_gmail():
+    # The Google client libraries are only needed once we actually talk to Gmail
+    from google.oauth2.credentials import Credentials
+    from google_auth_oauthlib.flow import InstalledAppFlow
+    from googleapiclient.discovery import build
+    
     creds = None
     # The file token.json stores the user's access and refresh tokens
     if os.path.exists('token.json'):
@@ -54,109 +93,338 @@ def authenticate_gmail():
     
     return build('gmail', 'v1', credentials=creds)
 
-def get_recruiter_emails(service, label_name=RECRUITER_LABEL, max_results=TEST_EMAIL_LIMIT):
-    try:
-        # Get label ID for the recruiter folder
-        print(f"Searching for label: {label_name}")
-        results = service.users().labels().list(userId='me').execute()
-        labels = results.get('labels', [])
+def fetch_raw_messages(service, message_ids, batch_size=BATCH_SIZE, max_retries=BATCH_MAX_RETRIES):
+    """Fetch raw messages with Gmail HTTP batch requests.
+
+    Returns a dict mapping message ID to the API response. Messages that fail
+    inside a batch with a retryable status (rate limits, server errors) are
+    collected and retried in follow-up batches with exponential backoff.
+    """
+    fetched = {}
+    pending = list(message_ids)
+    
+    for attempt in range(max_retries + 1):
+        if not pending:
+            break
+        if attempt:
+            delay = 2 ** (attempt - 1)
+            print(f"Retrying {len(pending)} failed messages in {delay}s (attempt {attempt}/{max_retries})")
+            time.sleep(delay)
         
-        label_id = None
-        for label in labels:
-            if label['name'] == label_name:
-                label_id = label['id']
-                break
+        failed = []
         
-        if not label_id:
-            print(f"Error: Label '{label_name}' not found")
-            return []
+        def handle_response(request_id, response, exception):
+            if exception is None:
+                fetched[request_id] = response
+                return
+            status = getattr(getattr(exception, 'resp', None), 'status', None)
+            if status is None or int(status) in RETRYABLE_STATUSES:
+                failed.append(request_id)
+            else:
+                print(f"Error fetching message {request_id}: {str(exception)}")
         
-        print(f"Found label ID: {label_id}")
-        print(f"Fetching up to {max_results} emails...")
+        for start in range(0, len(pending), batch_size):
+            chunk = pending[start:start + batch_size]
+            log(f"Fetching messages {start + 1}-{start + len(chunk)} of {len(pending)} in one batch", level=2)
+            batch = service.new_batch_http_request(callback=handle_response)
+            for message_id in chunk:
+                batch.add(
+                    service.users().messages().get(userId='me', id=message_id, format='raw'),
+                    request_id=message_id)
+            try:
+                batch.execute()
+            except Exception as e:
+                # The whole batch failed, so every message without a response gets retried
+                print(f"Warning: batch request failed: {str(e)}")
+                failed.extend(message_id for message_id in chunk if message_id not in fetched)
         
-        # Get messages with that label
-        results = service.users().messages().list(
-            userId='me', labelIds=[label_id], maxResults=max_results).execute()
-        messages = results.get('messages', [])
+        pending = list(dict.fromkeys(failed))
+    
+    if pending:
+        print(f"Warning: could not fetch {len(pending)} messages after {max_retries} retries")
+    return fetched
+
+def parse_raw_message(msg, index):
+    """Decode a raw Gmail message into an email dict, or None if it is too old."""
+    # Gmail's receive time is available without decoding anything
+    if msg.get('internalDate') and not is_internal_date_recent(msg['internalDate']):
+        log(f"Skipping email {index} - older than {MAX_EMAIL_AGE_YEARS} years", level=2)
+        return None
+    
+    # Convert from Base64
+    msg_bytes = base64.urlsafe_b64decode(msg['raw'])
+    mime_msg = message_from_bytes(msg_bytes)
+    
+    # Extract date, from, subject and body
+    date = None
+    sender = None
+    subject = None
+    body = ""
+    
+    # Basic extraction of headers
+    if mime_msg['Date']:
+        date = mime_msg['Date']
+        # Skip if email is too old
+        if not is_email_recent(date):
+            log(f"Skipping email {index} - older than {MAX_EMAIL_AGE_YEARS} years", level=2)
+            return None
+    if mime_msg['From']:
+        sender = mime_msg['From']
+    if mime_msg['Subject']:
+        subject = mime_msg['Subject']
         
-        if not messages:
-            print("No messages found in the label")
-            return []
-            
-        print(f"Found {len(messages)} messages")
+    # Extract a trimmed body; attachments are never decoded
+    try:
+        body = extract_body(mime_msg, max_tokens=BODY_TOKEN_BUDGET)
+    except Exception as e:
+        print(f"Warning: Could not decode body for email {index}: {str(e)}")
+        body = ""
+    
+    return {
+        'message_id': msg['id'],
+        'date': date,
+        'sender': sender,
+        'subject': subject,
+        'body': body
+    }
+
+def fetch_raw_messages_sequentially(service, message_ids):
+    """Fetch raw messages one request at a time (used when batching is disabled)."""
+    fetched = {}
+    for message_id in message_ids:
+        try:
+            fetched[message_id] = service.users().messages().get(
+                userId='me', id=message_id, format='raw').execute()
+        except Exception as e:
+            print(f"Error fetching message {message_id}: {str(e)}")
+    return fetched
+
+def get_label_id(service, label_name):
+    """Look up the Gmail label ID for a label name, or None if it doesn't exist."""
+    results = service.users().labels().list(userId='me').execute()
+    for label in results.get('labels', []):
+        if label['name'] == label_name:
+            return label['id']
+    return None
+
+def iter_message_ids(service, label_id, max_results=None, page_size=LIST_PAGE_SIZE, query=None):
+    """Yield pages of message IDs under a label, following nextPageToken lazily.
+
+    An optional Gmail search query (e.g. from build_age_query) filters the
+    listing server-side, so excluded messages are never downloaded.
+    """
+    page_token = None
+    seen = 0
+    while True:
+        request_args = {'userId': 'me', 'labelIds': [label_id], 'maxResults': page_size}
+        if query:
+            request_args['q'] = query
+        if page_token:
+            request_args['pageToken'] = page_token
+        results = service.users().messages().list(**request_args).execute()
         
-        emails = []
-        for i, message in enumerate(messages, 1):
-            print(f"Processing email {i}/{len(messages)}")
-            try:
-                msg = service.users().messages().get(
-                    userId='me', id=message['id'], format='raw').execute()
-                
-                # Convert from Base64
-                msg_bytes = base64.urlsafe_b64decode(msg['raw'])
-                mime_msg = message_from_bytes(msg_bytes)
-                
-                # Extract date, from, subject and body
-                date = None
-                sender = None
-                subject = None
-                body = ""
-                
-                # Basic extraction of headers
-                if mime_msg['Date']:
-                    date = mime_msg['Date']
-                    # Skip if email is too old
-                    if not is_email_recent(date):
-                        print(f"Skipping email {i} - older than {MAX_EMAIL_AGE_YEARS} years")
-                        continue
-                if mime_msg['From']:
-                    sender = mime_msg['From']
-                if mime_msg['Subject']:
-                    subject = mime_msg['Subject']
-                    
-                # Extract body (simplified)
-                if mime_msg.is_multipart():
-                    for part in mime_msg.walk():
-                        content_type = part.get_content_type()
-                        if content_type == "text/plain":
-                            try:
-                                body = part.get_payload(decode=True).decode()
-                            except Exception as e:
-                                print(f"Warning: Could not decode body for email {i}: {str(e)}")
-                                body = ""
-                            break
-                else:
-                    try:
-                        body = mime_msg.get_payload(decode=True).decode()
-                    except Exception as e:
-                        print(f"Warning: Could not decode body for email {i}: {str(e)}")
-                        body = ""
-                
-                emails.append({
-                    'message_id': message['id'],
-                    'date': date,
-                    'sender': sender,
-                    'subject': subject,
-                    'body': body
-                })
-            except Exception as e:
-                print(f"Error processing email {i}: {str(e)}")
-                continue
+        message_ids = [message['id'] for message in results.get('messages', [])]
+        if max_results is not None:
+            message_ids = message_ids[:max_results - seen]
+        if message_ids:
+            yield message_ids
+        seen += len(message_ids)
+        
+        page_token = results.get('nextPageToken')
+        if not page_token or (max_results is not None and seen >= max_results):
+            return
+
+def load_sync_state(filename=SYNC_STATE_FILE):
+    """Load the incremental sync checkpoint, or an empty one if there is none."""
+    state = {'history_id': None, 'processed_ids': set()}
+    if not os.path.exists(filename):
+        print("No sync checkpoint found, a full sync will be done")
+        return state
+    
+    try:
+        with open(filename, 'r', encoding='utf-8') as f:
+            saved = json.load(f)
+        state['history_id'] = saved.get('history_id')
+        state['processed_ids'] = set(saved.get('processed_ids', []))
+        print(f"Loaded sync checkpoint at historyId {state['history_id']} ({len(state['processed_ids'])} processed messages)")
+    except Exception as e:
+        print(f"Error loading sync checkpoint, doing a full sync: {str(e)}")
+    return state
+
+def save_sync_state(state, filename=SYNC_STATE_FILE):
+    """Persist the sync checkpoint atomically so a crash never leaves a torn file."""
+    temp_filename = f"{filename}.tmp"
+    with open(temp_filename, 'w', encoding='utf-8') as f:
+        json.dump({
+            'history_id': state['history_id'],
+            'processed_ids': sorted(state['processed_ids'])
+        }, f)
+    os.replace(temp_filename, filename)
+
+def get_current_history_id(service):
+    """Return the mailbox's current historyId, the starting point for the next incremental sync."""
+    return service.users().getProfile(userId='me').execute()['historyId']
+
+def iter_history_message_ids(service, label_id, start_history_id):
+    """Yield pages of message IDs added to a label since start_history_id.
+
+    Raises HttpError (status 404) when the history ID is too old for Gmail to
+    serve, in which case the caller has to fall back to a full sync.
+    """
+    page_token = None
+    while True:
+        request_args = {
+            'userId': 'me',
+            'startHistoryId': start_history_id,
+            'labelId': label_id,
+            'historyTypes': ['messageAdded', 'labelAdded'],
+            'maxResults': LIST_PAGE_SIZE
+        }
+        if page_token:
+            request_args['pageToken'] = page_token
+        results = service.users().history().list(**request_args).execute()
+        
+        message_ids = []
+        for record in results.get('history', []):
+            for added in record.get('messagesAdded', []):
+                message_ids.append(added['message']['id'])
+            for added in record.get('labelsAdded', []):
+                if label_id in added.get('labelIds', []):
+                    message_ids.append(added['message']['id'])
+        if message_ids:
+            yield list(dict.fromkeys(message_ids))
         
+        page_token = results.get('nextPageToken')
+        if not page_token:
+            return
+
+def is_history_expired(error):
+    """Check whether an HttpError means the stored historyId is no longer valid."""
+    return isinstance(error, HttpError) and int(error.resp.status) == 404
+
+def iter_incremental_message_ids(service, label_id, start_history_id):
+    """Pages of message IDs added since start_history_id, or of the whole label once the history expires.
+
+    Gmail can answer 404 on any history page, not just the first, so the
+    fallback to a full listing happens wherever the expiry shows up. Pages
+    already yielded are listed again; the caller skips IDs it has seen.
+    """
+    try:
+        yield from iter_history_message_ids(service, label_id, start_history_id)
+    except HttpError as e:
+        if not is_history_expired(e):
+            raise
+        print(f"History {start_history_id} has expired, falling back to a full sync")
+        yield from iter_message_ids(service, label_id, query=build_age_query())
+
+def iter_recruiter_emails(service, label_name=RECRUITER_LABEL, max_results=TEST_EMAIL_LIMIT, batch_size=BATCH_SIZE, sync_state=None):
+    """Yield parsed recruiter emails as they arrive, walking every page of the label.
+
+    Messages are downloaded one batch at a time, so callers can start working on
+    the first emails while later pages are still being listed and fetched.
+
+    When a sync_state (see load_sync_state) is given, only messages added since
+    its historyId are fetched, falling back to a full label scan if the history
+    has expired. Messages in sync_state['processed_ids'] are never downloaded.
+    Once every email has been yielded, sync_state['next_history_id'] is set to
+    the ID the caller should store, but only if nothing was missed: when a
+    message could not be fetched or parsed, or a full listing was cut off at
+    max_results, the checkpoint must stay put so the next run sees them.
+    """
+    # Get label ID for the recruiter folder
+    print(f"Searching for label: {label_name}")
+    label_id = get_label_id(service, label_name)
+    if not label_id:
+        print(f"Error: Label '{label_name}' not found")
+        return
+    
+    print(f"Found label ID: {label_id}")
+    if max_results is not None:
+        print(f"Fetching up to {max_results} emails...")
+    
+    processed_ids = set()
+    pages = None
+    next_history_id = None
+    if sync_state is not None:
+        processed_ids = sync_state['processed_ids']
+        # Taken before listing, so messages arriving mid-sync are picked up next run
+        next_history_id = get_current_history_id(service)
+        if sync_state['history_id']:
+            print(f"Incremental sync since historyId {sync_state['history_id']}")
+            pages = iter_incremental_message_ids(service, label_id, sync_state['history_id'])
+    listing_limit = None
+    if pages is None:
+        # Emails older than the cutoff are filtered out by Gmail before listing
+        listing_limit = max_results
+        pages = iter_message_ids(service, label_id, max_results=max_results, query=build_age_query())
+    
+    index = 0
+    listed = 0
+    listed_ids = set()
+    unfetched = 0
+    unparsed = 0
+    for page in pages:
+        listed += len(page)
+        new_ids = [message_id for message_id in page if message_id not in processed_ids and message_id not in listed_ids]
+        listed_ids.update(new_ids)
+        log(f"Listed {len(page)} more messages ({len(page) - len(new_ids)} already processed)", level=2)
+        chunk_size = batch_size or len(new_ids)
+        for start in range(0, len(new_ids), chunk_size):
+            chunk = new_ids[start:start + chunk_size]
+            if batch_size:
+                raw_messages = fetch_raw_messages(service, chunk, batch_size=batch_size)
+            else:
+                raw_messages = fetch_raw_messages_sequentially(service, chunk)
+            
+            for message_id in chunk:
+                index += 1
+                if message_id not in raw_messages:
+                    unfetched += 1
+                    continue
+                try:
+                    email_data = parse_raw_message(raw_messages[message_id], index)
+                except Exception as e:
+                    print(f"Error processing email {index}: {str(e)}")
+                    unparsed += 1
+                    continue
+                if email_data:
+                    yield email_data
+    
+    if sync_state is None:
+        return
+    if unfetched or unparsed:
+        print(f"{unfetched} messages could not be fetched and {unparsed} could not be parsed; "
+              f"keeping the sync checkpoint so they are retried next run")
+    elif listing_limit is not None and listed >= listing_limit:
+        print(f"Listing stopped at {listing_limit} messages; keeping the sync checkpoint so the rest are synced next run")
+    else:
+        sync_state['next_history_id'] = next_history_id
+
+def get_recruiter_emails(service, label_name=RECRUITER_LABEL, max_results=TEST_EMAIL_LIMIT, batch_size=BATCH_SIZE):
+    """Fetch all recent recruiter emails into a list (see iter_recruiter_emails)."""
+    try:
+        emails = list(iter_recruiter_emails(service, label_name, max_results, batch_size))
         print(f"Found {len(emails)} recent emails (less than {MAX_EMAIL_AGE_YEARS} years old)")
         return emails
     except Exception as e:
         print(f"Error in get_recruiter_emails: {str(e)}")
         return []
 
-def extract_recruiter_info(email_data):
-    try:
-        # Use OpenAI API key from environment variables
-        client = openai.OpenAI(api_key=os.getenv('OPENAI_API_KEY'))
-        if not os.getenv('OPENAI_API_KEY'):
-            raise ValueError("OpenAI API key not found in environment variables")
-        
-        prompt = f"""
+_llm_cache = None
+_llm_cache_lock = threading.Lock()
+
+def get_llm_cache():
+    """Extraction cache, opened on first use: reruns over already-seen emails are answered from disk."""
+    global _llm_cache
+    with _llm_cache_lock:
+        if _llm_cache is None:
+            _llm_cache = SQLiteCache(LLM_CACHE_FILE, ttl_seconds=LLM_CACHE_TTL_DAYS * 86400,
+                                     max_entries=LLM_CACHE_MAX_ENTRIES)
+        return _llm_cache
+
+def build_extraction_prompt(email_data):
+    """Single-email extraction prompt; also the cache key for that email's result."""
+    return f"""
         Extract the following information from this recruiter email:
         - Full name of recruiter
         - Email address
@@ -180,114 +448,300 @@ def extract_recruiter_info(email_data):
         
         {email_data['body']}
         """
+
+def build_batch_extraction_prompt(batch):
+    """Prompt that asks for one JSON object per email, keyed by message ID."""
+    emails_text = "\n".join(f"""
+        ### Email {email_data['message_id']}
+        From: {email_data['sender']}
+        Date: {email_data['date']}
+        Subject: {email_data['subject']}
         
-        response = client.chat.completions.create(
-            model="gpt-4",
-            messages=[
-                {"role": "system", "content": "You extract structured data from recruiter emails accurately."},
-                {"role": "user", "content": prompt}
-            ]
-        )
-        
-        # Extract and parse the JSON response
-        try:
-            extracted_json = json.loads(response.choices[0].message.content.strip())
-            return extracted_json
-        except json.JSONDecodeError as e:
-            print(f"Failed to parse JSON for email: {email_data['subject']}")
-            print(f"Error: {str(e)}")
-            return {
-                "name": "",
-                "email": email_data['sender'],
-                "company": "",
-                "last_contact": email_data['date'],
-                "job_type": ""
-            }
-    except Exception as e:
-        print(f"Error in extract_recruiter_info: {str(e)}")
-        return {
+        {email_data['body']}
+        """ for email_data in batch)
+    
+    return f"""
+        Extract the following information from each of the {len(batch)} recruiter emails below:
+        - Full name of recruiter
+        - Email address
+        - Company
+        - Date of contact (use the email date if not mentioned in body)
+        - Job type/role mentioned
+
+        Format the output as a valid JSON array with one object per email, using these exact fields
+        and copying the message ID from the email's heading:
+        [
+          {{
+            "message_id": "",
             "name": "",
-            "email": email_data['sender'],
+            "email": "",
             "company": "",
-            "last_contact": email_data['date'],
+            "last_contact": "YYYY-MM-DD",
             "job_type": ""
-        }
+          }}
+        ]
+        {emails_text}
+        """
 
-def load_existing_contacts(filename='recruiter_contacts.csv'):
-    """Load existing contacts from CSV file."""
-    existing_contacts = {
-        'regular': set(),  # Set of regular email addresses
-        'linkedin': {}     # Dict of LinkedIn contacts {name: email}
+def fallback_recruiter_info(email_data):
+    """Placeholder contact used when extraction fails."""
+    return {
+        "name": "",
+        "email": email_data['sender'],
+        "company": "",
+        "last_contact": email_data['date'],
+        "job_type": ""
     }
+
+def is_fallback_recruiter_info(info, email_data):
+    """Whether extraction failed for this email and returned the placeholder."""
+    return info == fallback_recruiter_info(email_data)
+
+def is_valid_recruiter_info(info):
+    return isinstance(info, dict) and all(
+        isinstance(info.get(field), str) for field in ('name', 'email', 'company', 'last_contact', 'job_type'))
+
+def get_cached_recruiter_info(email_data):
+    """Return (cache_key, cached result or None) for an email."""
+    cache_key = make_cache_key(EXTRACTION_MODEL, EXTRACTION_SYSTEM_PROMPT, build_extraction_prompt(email_data))
+    cached = get_llm_cache().get(cache_key)
+    add('cache_misses' if cached is None else 'cache_hits')
+    return cache_key, cached
+
+def extract_recruiter_info(email_data, cache_key=None):
+    """Extract one email with its own LLM request.
+
+    Pass the cache_key from get_cached_recruiter_info when the cache has
+    already been checked (and missed) for this email, so the lookup isn't
+    repeated or counted twice.
+    """
+    with span('extraction', item=email_data.get('message_id')):
+        try:
+            if cache_key is None:
+                cache_key, cached = get_cached_recruiter_info(email_data)
+                if cached is not None:
+                    return cached
+            prompt = build_extraction_prompt(email_data)
+        
+            # One pooled client per process (see llm_client), shared by all workers
+            client = get_llm_client()
+            llm_rate_limiter.acquire(estimate_tokens(prompt) + EXTRACTION_OUTPUT_TOKENS)
+            response = client.complete(EXTRACTION_MODEL, EXTRACTION_SYSTEM_PROMPT, prompt)
+        
+            # Extract and parse the JSON response
+            try:
+                extracted_json = json.loads(response.text.strip())
+            except json.JSONDecodeError as e:
+                print(f"Failed to parse JSON for email: {email_data['subject']}")
+                print(f"Error: {str(e)}")
+                return fallback_recruiter_info(email_data)
+            if not is_valid_recruiter_info(extracted_json):
+                print(f"Extraction for email {email_data['subject']} is missing fields, using the fallback")
+                return fallback_recruiter_info(email_data)
+            # Only valid results are cached, so failures get retried next run
+            get_llm_cache().set(cache_key, extracted_json)
+            return extracted_json
+        except Exception as e:
+            print(f"Error in extract_recruiter_info: {str(e)}")
+            return fallback_recruiter_info(email_data)
+
+def extract_recruiter_info_batch(batch):
+    """Extract several emails with one LLM request.
+
+    Returns results in the same order as the batch. Cached emails never reach
+    the prompt, and any email whose entry is missing or malformed in the
+    response falls back to a single-email extract_recruiter_info call.
+    """
+    with span('extraction.batch', item=f"{len(batch)} emails"):
+        results = {}
+        uncached = []
+        cache_keys = {}
+        for email_data in batch:
+            cache_key, cached = get_cached_recruiter_info(email_data)
+            if cached is not None:
+                results[email_data['message_id']] = cached
+            else:
+                cache_keys[email_data['message_id']] = cache_key
+                uncached.append(email_data)
     
-    if not os.path.exists(filename):
-        print("No existing contacts file found")
-        return existing_contacts
+        if len(uncached) > 1:
+            try:
+                prompt = build_batch_extraction_prompt(uncached)
+                llm_rate_limiter.acquire(estimate_tokens(prompt) + EXTRACTION_OUTPUT_TOKENS * len(uncached))
+                response = get_llm_client().complete(EXTRACTION_MODEL, EXTRACTION_SYSTEM_PROMPT, prompt)
+                extracted = json.loads(response.text.strip())
+                for info in extracted if isinstance(extracted, list) else []:
+                    message_id = info.pop('message_id', None) if isinstance(info, dict) else None
+                    if message_id in cache_keys and is_valid_recruiter_info(info):
+                        get_llm_cache().set(cache_keys[message_id], info)
+                        results[message_id] = info
+            except Exception as e:
+                print(f"Batched extraction of {len(uncached)} emails failed, falling back to single requests: {str(e)}")
+    
+        for email_data in uncached:
+            if email_data['message_id'] not in results:
+                # The batch already looked this email up in the cache
+                results[email_data['message_id']] = extract_recruiter_info(
+                    email_data, cache_key=cache_keys[email_data['message_id']])
+        return [results[email_data['message_id']] for email_data in batch]
+
+def iter_extraction_batches(emails, token_budget=EXTRACTION_BATCH_TOKENS, max_emails=EXTRACTION_BATCH_MAX_EMAILS):
+    """Greedily pack a stream of emails into batches that fit the prompt token budget.
+
+    An email that is bigger than the budget on its own goes out as a batch of one.
+    """
+    batch = []
+    batch_tokens = 0
+    for email_data in emails:
+        tokens = estimate_tokens(build_extraction_prompt(email_data))
+        if batch and (batch_tokens + tokens > token_budget or len(batch) >= max_emails):
+            yield batch
+            batch = []
+            batch_tokens = 0
+        batch.append(email_data)
+        batch_tokens += tokens
+    if batch:
+        yield batch
+
+def iter_new_emails(emails, existing_contacts, sync_state):
+    """Yield only emails from senders that aren't known contacts yet.
+
+    Emails from known senders are marked processed here; the others are
+    marked by store_extracted_contacts once their extraction succeeded.
+    """
+    for i, email in enumerate(emails, 1):
+        log(f"\nProcessing email {i}\nSubject: {email['subject']}\nFrom: {email['sender']}", level=2)
         
-    try:
-        with open(filename, 'r', encoding='utf-8') as csvfile:
-            reader = csv.DictReader(csvfile)
-            for row in reader:
-                email = row['email'].lower().strip()
-                name = row['name'].lower().strip()
-                
-                if not email:  # Skip rows with no email
-                    continue
-                    
-                if email == 'inmail-hit-reply@linkedin.com':
-                    existing_contacts['linkedin'][name] = email
-                else:
-                    existing_contacts['regular'].add(email)
-                    
-        print(f"Loaded {len(existing_contacts['regular'])} regular contacts and {len(existing_contacts['linkedin'])} LinkedIn contacts from CSV")
-        print("Regular contacts:", existing_contacts['regular'])
-        return existing_contacts
-    except Exception as e:
-        print(f"Error loading existing contacts: {str(e)}")
-        return existing_contacts
+        # Check for duplicate email before calling ChatGPT
+        if is_duplicate_email(email['sender'], existing_contacts):
+            log(f"Skipping duplicate email: {email['sender']}", level=2)
+            sync_state['processed_ids'].add(email['message_id'])
+            continue
+        yield email
+
+def iter_extracted_recruiter_info(emails, workers=EXTRACTION_WORKERS, batch_tokens=EXTRACTION_BATCH_TOKENS):
+    """Run recruiter extraction over emails on a thread pool.
+
+    Emails are packed into multi-email requests (see iter_extraction_batches);
+    a batch_tokens of 0 sends one request per email. Yields (email, info) pairs
+    in the same order as the input, so the CSV output is deterministic. At most
+    2 * workers requests are in flight, which keeps the input stream lazy.
+    """
+    if batch_tokens:
+        batches = iter_extraction_batches(emails, token_budget=batch_tokens)
+    else:
+        batches = ([email_data] for email_data in emails)
+    
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        in_flight = deque()
+        for batch in batches:
+            in_flight.append((batch, executor.submit(extract_recruiter_info_batch, batch)))
+            if len(in_flight) >= workers * 2:
+                batch, future = in_flight.popleft()
+                yield from zip(batch, future.result())
+        while in_flight:
+            batch, future = in_flight.popleft()
+            yield from zip(batch, future.result())
+
+def load_existing_contacts(filename=CONTACTS_CSV, store_path=CONTACTS_DB):
+    """Open the contact store, importing the legacy CSV the first time."""
+    existing_contacts = ContactStore(store_path)
+    
+    if not len(existing_contacts):
+        if os.path.exists(filename):
+            try:
+                imported = existing_contacts.import_csv(filename)
+                print(f"Imported {imported} contacts from {filename}")
+            except Exception as e:
+                print(f"Error importing existing contacts: {str(e)}")
+        else:
+            print("No existing contacts file found")
+    
+    counts = existing_contacts.counts()
+    print(f"Loaded {counts['regular']} regular contacts and {counts['linkedin']} LinkedIn contacts")
+    return existing_contacts
 
 def is_duplicate_contact(contact_data, existing_contacts):
     """Check if a contact is a duplicate based on our rules."""
-    email = contact_data['email'].lower()
-    name = contact_data['name'].lower()
+    email = normalize_email(contact_data['email'])
     
     # Special handling for LinkedIn InMail
-    if email == 'inmail-hit-reply@linkedin.com':
+    if email == LINKEDIN_INMAIL:
         # Only consider it a duplicate if both name and email match
-        return name in existing_contacts['linkedin']
+        return existing_contacts.has_linkedin_contact(contact_data['name'] or '')
     else:
         # For all other emails, check if email exists
-        return email in existing_contacts['regular']
+        return existing_contacts.has_email(email)
+
+def with_contact_email(info, email_data):
+    """Make sure a contact has an address to be stored under, or return None.
 
-def is_duplicate_email(email, existing_contacts):
-    """Check if an email is a duplicate based on our rules."""
-    email = email.lower().strip()
+    The store is keyed by email address. When the extraction found none, the
+    sender's address is used, as fallback_recruiter_info does.
+    """
+    if normalize_email(info['email']):
+        return info
+    if not normalize_email(email_data['sender']):
+        return None
+    return dict(info, email=parseaddr(email_data['sender'])[1])
+
+def is_duplicate_email(sender, existing_contacts):
+    """Check if an email's From header belongs to a known contact, before any LLM call."""
+    name, email = parse_sender(sender)
     
     # Special handling for LinkedIn InMail
-    if email == 'inmail-hit-reply@linkedin.com':
-        # For LinkedIn InMail, we need the name too, so return False here
-        return False
+    if email == LINKEDIN_INMAIL:
+        # All InMails share one address, so the sender name from the header decides
+        is_duplicate = bool(name) and existing_contacts.has_linkedin_contact(name)
+        if is_duplicate:
+            log(f"Found duplicate LinkedIn contact: {name}", level=2)
+        return is_duplicate
     else:
         # For all other emails, check if email exists
-        is_duplicate = email in existing_contacts['regular']
+        is_duplicate = existing_contacts.has_email(email)
         if is_duplicate:
-            print(f"Found duplicate email: {email}")
+            log(f"Found duplicate email: {email}", level=2)
         return is_duplicate
 
-def save_to_csv(recruiter_data, filename='recruiter_contacts.csv'):
-    # Append new contacts to existing file
-    file_exists = os.path.exists(filename)
-    with open(filename, 'a', newline='', encoding='utf-8') as csvfile:
-        fieldnames = ['name', 'email', 'company', 'last_contact', 'job_type']
-        writer = csv.DictWriter(csvfile, fieldnames=fieldnames)
+def save_to_csv(existing_contacts, filename=CONTACTS_CSV):
+    """Export the whole contact store to CSV. Returns the number of rows written."""
+    return existing_contacts.export_csv(filename)
+
+def store_extracted_contacts(extracted, existing_contacts, sync_state):
+    """Store new contacts from (email, info) pairs and mark their emails processed.
+
+    Emails whose extraction failed are left unprocessed, so the next run
+    extracts them again. Returns (new contacts, number of failed emails).
+    """
+    recruiter_data = []
+    failed = 0
+    for email, info in extracted:
+        if is_fallback_recruiter_info(info, email):
+            print(f"Extraction failed for '{email['subject']}' from {email['sender']}; it is retried next run")
+            failed += 1
+            continue
+        sync_state['processed_ids'].add(email['message_id'])
         
-        if not file_exists:
-            writer.writeheader()
+        contact = with_contact_email(info, email)
+        if contact is None:
+            print(f"No email address for {info['name'] or 'the sender'} of '{email['subject']}', contact not stored")
+            continue
+        info = contact
         
-        for contact in recruiter_data:
-            writer.writerow(contact)
-    
-    return len(recruiter_data)
+        # Emails extracted concurrently can resolve to the same contact, and for
+        # LinkedIn InMail we need the name+email that only the extraction gives us
+        if is_duplicate_contact(info, existing_contacts):
+            log(f"Skipping duplicate contact: {info['name']} <{info['email']}>", level=2)
+            continue
+        
+        # Stored right away; the unique indexes keep concurrent runs from adding it twice
+        if not existing_contacts.upsert(info):
+            print(f"Contact was added by another run meanwhile: {info['name']} <{info['email']}>")
+            continue
+        recruiter_data.append(info)
+        
+        log(f"Extracted data: {json.dumps(info, indent=2)}", level=2)
+    return recruiter_data, failed
 
 def main():
     try:
@@ -297,53 +751,46 @@ def main():
         print("Authenticating with Gmail...")
         service = authenticate_gmail()
         
-        # Load existing contacts from CSV
+        # Open the contact store (imports recruiter_contacts.csv on first use)
         existing_contacts = load_existing_contacts()
         
-        # Get emails from the money-jobs-job-agents label
-        emails = get_recruiter_emails(service)
+        # Load the incremental sync checkpoint
+        sync_state = load_sync_state()
         
-        if not emails:
-            print("No emails found to process")
-            return
-            
-        print(f"\nProcessing {len(emails)} emails...")
+        # Stream emails from the money-jobs-job-agents label; later pages are
+        # fetched while earlier emails are already being deduplicated/extracted
+        emails = iter_recruiter_emails(service, sync_state=sync_state)
         
-        # Process each email
-        recruiter_data = []
-        for i, email in enumerate(emails, 1):
-            print(f"\nProcessing email {i}/{len(emails)}")
-            print(f"Subject: {email['subject']}")
-            print(f"From: {email['sender']}")
-            
-            # Check for duplicate email before calling ChatGPT
-            if is_duplicate_email(email['sender'], existing_contacts):
-                print(f"Skipping duplicate email: {email['sender']}")
-                continue
-                
-            info = extract_recruiter_info(email)
-            
-            # For LinkedIn InMail, we need to check name+email after getting the info
-            if info['email'].lower() == 'inmail-hit-reply@linkedin.com':
-                if is_duplicate_contact(info, existing_contacts):
-                    print(f"Skipping duplicate LinkedIn contact: {info['name']}")
-                    continue
-            
-            recruiter_data.append(info)
-            # Update our tracking of processed contacts
-            email = info['email'].lower().strip()
-            name = info['name'].lower().strip()
-            if email == 'inmail-hit-reply@linkedin.com':
-                existing_contacts['linkedin'][name] = email
-            else:
-                existing_contacts['regular'].add(email)
-            
-            print(f"Extracted data: {json.dumps(info, indent=2)}")
+        # Drop duplicates before any LLM call, then extract the rest concurrently
+        already_processed = len(sync_state['processed_ids'])
+        new_emails = iter_new_emails(emails, existing_contacts, sync_state)
+        
+        recruiter_data, failed = store_extracted_contacts(
+            iter_extracted_recruiter_info(new_emails), existing_contacts, sync_state)
+        
+        processed = len(sync_state['processed_ids']) - already_processed
+        if not processed:
+            print("No new emails found to process")
+        else:
+            # Contacts are already in the store; refresh the CSV export
+            print(f"\nProcessed {processed} emails. Exporting contacts to CSV...")
+            exported_count = save_to_csv(existing_contacts)
+            print(f"Successfully added {len(recruiter_data)} new contacts ({exported_count} in {CONTACTS_CSV})")
+        
+        # Only advance the checkpoint once the results are safely on disk, and only
+        # if every message was synced and extracted; processed IDs are kept either way
+        if failed:
+            print(f"{failed} emails could not be extracted; keeping the sync checkpoint so they are retried next run")
+        elif sync_state.get('next_history_id'):
+            sync_state['history_id'] = sync_state.pop('next_history_id')
+            print(f"Saved sync checkpoint at historyId {sync_state['history_id']}")
+        save_sync_state(sync_state)
         
-        # Save results
-        print("\nSaving results to CSV...")
-        new_contacts_count = save_to_csv(recruiter_data)
-        print(f"Successfully added {new_contacts_count} new contacts to recruiter_contacts.csv")
+        cache_stats = get_llm_cache().stats()
+        print(f"LLM cache: {cache_stats['hits']} hits, {cache_stats['misses']} misses ({cache_stats['entries']} entries)")
+        if cache_stats['misses']:
+            latency = get_llm_client().latency_stats()
+            print(f"LLM latency over {latency['calls']} calls: mean {latency['mean']:.2f}s, p50 {latency['p50']:.2f}s, p95 {latency['p95']:.2f}s")
         
     except Exception as e:
         print(f"Error in main: {str(e)}")
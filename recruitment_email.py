@@ -1,37 +1,115 @@
+import asyncio
 import os
-import pandas as pd
-from crewai import Agent, Task, Crew, Process
-from crewai_tools import SerperDevTool
 from dotenv import load_dotenv
-import time
 import html
-from typing import Dict
+from typing import Dict, List, Tuple
+from crew_runner import CrewRunner, result_text
+from metrics import CREW_VERBOSE, log, span
+from rate_limiter import RateLimiter
+from result_journal import ResultJournal, company_key
 
 # Load environment variables
 load_dotenv()
 
-# Initialize tools
-search_tool = SerperDevTool()
-
-# Create the search agent
-search_agent = Agent(
-    role="Recruitment Information Specialist",
-    goal="Find company recruitment contact information",
-    backstory="""You are an expert at finding company recruitment and career information.
-    You are particularly good at identifying recruitment pages and contact information.""",
-    tools=[search_tool],
-    verbose=True
-)
-
-# Create the result analyzer agent
-result_analyzer = Agent(
-    role="Search Result Analyzer",
-    goal="Analyze search results and identify the best career page",
-    backstory="""You are an expert at analyzing search results and identifying the most relevant career pages.
-    You can distinguish between official company career pages and third-party job boards.
-    You prioritize direct company career pages over job board listings.""",
-    verbose=True
-)
+INPUT_CSV = 'ai_companies3.csv'
+OUTPUT_CSV = 'ai_companies4.csv'
+JOURNAL_FILE = 'ai_companies4.jsonl'  # One line per finished company, replayed on restart
+JOURNAL_SYNC_EVERY = 20  # fsync the journal after this many results...
+JOURNAL_SYNC_SECONDS = 5  # ...or this long after the last fsync, whichever comes first
+RECRUITMENT_WORKERS = int(os.getenv('RECRUITMENT_WORKERS', '4'))  # Crew runs in flight at once
+CREW_RUNS_PER_MINUTE = int(os.getenv('CREW_RUNS_PER_MINUTE', '20'))  # Replaces the fixed sleep between companies
+
+crew_rate_limiter = RateLimiter(requests_per_minute=CREW_RUNS_PER_MINUTE)
+
+def build_recruitment_crew():
+    """Search crew for one company; {company_name} and {search_name} are filled in per run."""
+    # crewai and its tools take seconds to import, so they load with the first crew
+    from crewai import Agent, Task, Crew, Process
+    from cached_tools import CachedSerperDevTool
+    search_tool = CachedSerperDevTool()  # Search results cached on disk across runs and scripts
+
+    # Create the search agent
+    search_agent = Agent(
+        role="Recruitment Information Specialist",
+        goal="Find company recruitment contact information",
+        backstory="""You are an expert at finding company recruitment and career information.
+        You are particularly good at identifying recruitment pages and contact information.""",
+        tools=[search_tool],
+        verbose=CREW_VERBOSE
+    )
+
+    # Create the result analyzer agent
+    result_analyzer = Agent(
+        role="Search Result Analyzer",
+        goal="Analyze search results and identify the best career page",
+        backstory="""You are an expert at analyzing search results and identifying the most relevant career pages.
+        You can distinguish between official company career pages and third-party job boards.
+        You prioritize direct company career pages over job board listings.""",
+        verbose=CREW_VERBOSE
+    )
+
+    # Create search task
+    search_task = Task(
+        description="Use the SerperDevTool to search for '{search_name} careers jobs recruitment'. Return the top 5 results.",
+        agent=search_agent,
+        expected_output="A list of search results."
+    )
+
+    # Create analysis task
+    analysis_task = Task(
+        description="""Analyze the search results for {company_name} and identify the best career page URL.
+        Prioritize:
+        1. Official company career pages
+        2. Direct recruitment pages
+        3. Company's LinkedIn career page
+        Avoid:
+        - Third-party job boards (Indeed, ZipRecruiter, etc.)
+        - Unrelated results
+        
+        If no appropriate career page is found, return the word "Unknown".
+        Otherwise, return only the URL of the best career page found.""",
+        agent=result_analyzer,
+        expected_output="Either a single URL string of the best career page found, or the word 'Unknown' if no appropriate page is found."
+    )
+
+    # Create crew for search and analysis
+    return Crew(
+        agents=[search_agent, result_analyzer],
+        tasks=[search_task, analysis_task],
+        process=Process.sequential,
+        verbose=CREW_VERBOSE
+    )
+
+# Built once per worker thread and reused for every company
+recruitment_runner = CrewRunner(build_recruitment_crew, rate_limiter=crew_rate_limiter, name='recruitment.crew')
+
+def crew_inputs(company_name: str) -> Dict[str, str]:
+    return {'company_name': str(company_name), 'search_name': html.escape(str(company_name))}
+
+def to_result(career_page_url: str) -> Dict[str, str]:
+    """Convert a crew answer to the result dictionary."""
+    career_page_url = career_page_url.strip()
+    return {
+        "recruitment_page": career_page_url,
+        "search_status": "SUCCESS" if career_page_url != "Unknown" else "FAILED",
+        "confidence_score": 8 if career_page_url != "Unknown" else 0,
+        "notes": f"Career page: {career_page_url}"
+    }
+
+def error_result(e: Exception) -> Dict[str, str]:
+    if "API rate limit" in str(e):
+        return {
+            "recruitment_page": None,
+            "search_status": "FAILED",
+            "confidence_score": 0,
+            "notes": f"API rate limit reached: {str(e)}"
+        }
+    return {
+        "recruitment_page": None,
+        "search_status": "FAILED",
+        "confidence_score": 0,
+        "notes": f"Error: {str(e)}"
+    }
 
 def process_company(company_name: str, website: str) -> Dict[str, str]:
     """
@@ -44,88 +122,87 @@ def process_company(company_name: str, website: str) -> Dict[str, str]:
     Returns:
         Dict[str, str]: Dictionary containing found information
     """
-    try:
-        # Create search task
-        search_task = Task(
-            description=f"Use the SerperDevTool to search for '{html.escape(company_name)} careers jobs recruitment'. Return the top 5 results.",
-            agent=search_agent,
-            expected_output="A list of search results."
-        )
-
-        # Create analysis task
-        analysis_task = Task(
-            description=f"""Analyze the search results for {company_name} and identify the best career page URL.
-            Prioritize:
-            1. Official company career pages
-            2. Direct recruitment pages
-            3. Company's LinkedIn career page
-            Avoid:
-            - Third-party job boards (Indeed, ZipRecruiter, etc.)
-            - Unrelated results
-            
-            If no appropriate career page is found, return the word "Unknown".
-            Otherwise, return only the URL of the best career page found.""",
-            agent=result_analyzer,
-            expected_output="Either a single URL string of the best career page found, or the word 'Unknown' if no appropriate page is found."
-        )
-
-        # Create crew for search and analysis
-        search_crew = Crew(
-            agents=[search_agent, result_analyzer],
-            tasks=[search_task, analysis_task],
-            process=Process.sequential,
-            verbose=True
-        )
-
-        # Execute search crew
-        career_page_url = search_crew.kickoff()
-        
-        # Add a small delay to avoid rate limiting
-        time.sleep(2)
+    with span('recruitment', item=company_name) as current:
+        try:
+            return to_result(result_text(recruitment_runner.kickoff(crew_inputs(company_name))))
+        except Exception as e:
+            current.error = type(e).__name__
+            return error_result(e)
+
+async def process_companies(companies: List[Tuple[str, str, str]], journal: ResultJournal,
+                            finished: Dict[str, dict]) -> int:
+    """
+    Run the prebuilt crew for several companies concurrently, journalling each result as it finishes.
+    
+    Args:
+        companies (List[Tuple[str, str, str]]): (key, name, website) of each company to process
+        journal (ResultJournal): Journal that successful results are appended to
+        finished (Dict[str, dict]): Updated in place with every journalled record
         
-        # Convert results to dictionary format
-        return {
-            "recruitment_page": career_page_url,
-            "search_status": "SUCCESS" if career_page_url != "Unknown" else "FAILED",
-            "confidence_score": 8 if career_page_url != "Unknown" else 0,
-            "notes": f"Career page: {career_page_url}"
-        }
+    Returns:
+        int: Number of companies that failed and will be retried on the next run
+    """
+    semaphore = asyncio.Semaphore(RECRUITMENT_WORKERS)
 
-    except Exception as e:
-        if "API rate limit" in str(e):
-            return {
-                "recruitment_page": None,
-                "search_status": "FAILED",
-                "confidence_score": 0,
-                "notes": f"API rate limit reached: {str(e)}"
-            }
-        return {
-            "recruitment_page": None,
-            "search_status": "FAILED",
-            "confidence_score": 0,
-            "notes": f"Error: {str(e)}"
-        }
+    async def run(key, name, website):
+        async with semaphore:
+            return key, name, await asyncio.to_thread(process_company, name, website)
+
+    failed = 0
+    for next_result in asyncio.as_completed([run(*company) for company in companies]):
+        key, name, result = await next_result
+        if result['recruitment_page'] is None:
+            # Not journalled, so the company is retried on the next run
+            log(f"\nFailed {name}: {result['notes']}")
+            failed += 1
+            continue
+        record = {'recruitment_page': result['recruitment_page']}
+        journal.append(key, record)
+        finished[key] = record
+        log(f"\nFinished {name}: {result['recruitment_page']}")
+    return failed
+
+def load_finished_pages(journal: ResultJournal) -> Dict[str, dict]:
+    """Career pages already found, keyed by company: the previous CSV output plus the journal."""
+    import pandas as pd
+    finished = {}
+    if os.path.exists(OUTPUT_CSV):
+        existing_df = pd.read_csv(OUTPUT_CSV)
+        if 'recruitment_page' in existing_df.columns:
+            for _, row in existing_df.iterrows():
+                if pd.notna(row['recruitment_page']):
+                    finished[company_key(row['Name'], row['Website'])] = {'recruitment_page': row['recruitment_page']}
+    finished.update(journal.load())
+    return finished
 
 def main():
+    import pandas as pd
+    from cached_tools import search_cache_report
+    
     # Read the CSV file
-    df = pd.read_csv('ai_companies3.csv')
+    df = pd.read_csv(INPUT_CSV)
+    keys = [company_key(row['Name'], row['Website']) for _, row in df.iterrows()]
     
-    # Add recruitment_page column if it doesn't exist
-    if 'recruitment_page' not in df.columns:
-        df['recruitment_page'] = None
+    # Skip companies finished by an earlier (possibly crashed) run: the previous output
+    # CSV, including one written before the journal existed, plus the journal
+    journal = ResultJournal(JOURNAL_FILE, sync_every=JOURNAL_SYNC_EVERY, sync_interval=JOURNAL_SYNC_SECONDS)
+    finished = load_finished_pages(journal)
+    todo = [(key, row['Name'], row['Website'])
+            for key, (_, row) in zip(keys, df.iterrows()) if key not in finished]
+    print(f"{len(df) - len(todo)} companies already done, {len(todo)} to process with {RECRUITMENT_WORKERS} workers")
     
-    # Process each company
-    for index, row in df.iterrows():
-        print(f"\nProcessing {row['Name']}...")
-        result = process_company(row['Name'], row['Website'])
-        
-        # Update dataframe with just the recruitment page
-        df.at[index, 'recruitment_page'] = result['recruitment_page']
-        
-        # Save progress after each company
-        df.to_csv('ai_companies4.csv', index=False)
+    # Each result costs one journal line instead of a rewrite of the whole CSV
+    failed = asyncio.run(process_companies(todo, journal, finished))
+    journal.close()
+    
+    # Compact the journal into the output table, in input order
+    df['recruitment_page'] = [finished.get(key, {}).get('recruitment_page') for key in keys]
+    df.to_csv(f"{OUTPUT_CSV}.tmp", index=False)
+    os.replace(f"{OUTPUT_CSV}.tmp", OUTPUT_CSV)
+    journal.compact()
     
-    print("\nProcessing complete. Results saved to ai_companies4.csv")
+    print(f"\nProcessing complete. Results saved to {OUTPUT_CSV}" + (f" ({failed} failed, rerun to retry)" if failed else ""))
+    print(search_cache_report())
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,124 @@
+import json
+import os
+import re
+import threading
+import time
+
+
+def company_key(name, website=''):
+    """Stable key for a company: lowercased name plus bare website domain.
+
+    Used instead of row positions so results survive reordered or extended
+    input files.
+    """
+    name = re.sub(r'\s+', ' ', str(name or '')).strip().lower()
+    domain = re.sub(r'^(https?://)?(www\.)?', '', str(website or '').strip().lower()).split('/')[0]
+    return f"{name}|{domain}"
+
+
+def ends_without_newline(path):
+    """True if the file exists, is not empty and its last byte isn't a newline.
+
+    Checked in binary mode: a torn line can end halfway through a multibyte
+    UTF-8 character, which a text-mode read would fail to decode.
+    """
+    try:
+        with open(path, 'rb') as f:
+            if f.seek(0, os.SEEK_END) == 0:
+                return False
+            f.seek(-1, os.SEEK_END)
+            return f.read(1) != b'\n'
+    except FileNotFoundError:
+        return False
+
+
+class ResultJournal:
+    """Append-only JSONL journal of per-company results.
+
+    Every append is flushed to the OS before returning. By default it is also
+    fsynced, so a crash loses at most the record being written; with
+    sync_every/sync_interval the fsync is batched and a power loss can cost
+    up to that many records, which are simply redone on the next run.
+    load() replays the journal (later records win) and ignores a torn last
+    line. Safe to share between threads.
+    """
+
+    def __init__(self, path, sync_every=1, sync_interval=None):
+        self.path = path
+        self.sync_every = sync_every
+        self.sync_interval = sync_interval
+        self.lock = threading.Lock()
+        self.file = None
+        self.unsynced = 0
+        self.last_sync = time.monotonic()
+
+    def load(self):
+        """Return {key: record} for everything journalled so far."""
+        records = {}
+        if not os.path.exists(self.path):
+            return records
+        # A torn line may end inside a multibyte character; it is skipped either way
+        with open(self.path, 'r', encoding='utf-8', errors='replace') as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except json.JSONDecodeError:
+                    # Partially written line from a crash
+                    continue
+                records[entry['key']] = entry['record']
+        return records
+
+    def append(self, key, record):
+        line = json.dumps({'key': key, 'record': record}, ensure_ascii=False)
+        with self.lock:
+            if self.file is None:
+                torn = ends_without_newline(self.path)
+                self.file = open(self.path, 'a', encoding='utf-8')
+                # Terminate a torn last line so it doesn't swallow this record
+                if torn:
+                    self.file.write('\n')
+            self.file.write(line + '\n')
+            self.file.flush()
+            self.unsynced += 1
+            if self.unsynced >= self.sync_every or (
+                    self.sync_interval is not None and time.monotonic() - self.last_sync >= self.sync_interval):
+                self._sync()
+
+    def _sync(self):
+        os.fsync(self.file.fileno())
+        self.unsynced = 0
+        self.last_sync = time.monotonic()
+
+    def sync(self):
+        """fsync any records appended since the last sync."""
+        with self.lock:
+            if self.file is not None and self.unsynced:
+                self._sync()
+
+    def compact(self, drop=()):
+        """Rewrite the journal with only the latest record per key. Returns the record count.
+
+        Keys in `drop` are left out, e.g. the ones an output file now holds.
+        """
+        temp_path = f"{self.path}.tmp"
+        with self.lock:
+            if self.file is not None:
+                self._sync()
+                self.file.close()
+                self.file = None
+            records = {key: record for key, record in self.load().items() if key not in drop}
+            with open(temp_path, 'w', encoding='utf-8') as f:
+                for key, record in records.items():
+                    f.write(json.dumps({'key': key, 'record': record}, ensure_ascii=False) + '\n')
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(temp_path, self.path)
+        return len(records)
+
+    def close(self):
+        with self.lock:
+            if self.file is not None:
+                if self.unsynced:
+                    self._sync()
+                self.file.close()
+                self.file = None
@@ -0,0 +1,95 @@
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+
+
+def make_cache_key(*parts):
+    """Build a content-addressed key from any JSON-serialisable parts."""
+    payload = json.dumps(parts, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+class SQLiteCache:
+    """Single-file key/value cache with TTL, LRU eviction and hit/miss counters.
+
+    Values are stored as JSON. Entries older than ttl_seconds are treated as
+    misses, and once the cache holds more than max_entries the least recently
+    used entries are evicted. Safe to share between threads.
+    """
+
+    def __init__(self, path, ttl_seconds=None, max_entries=None):
+        self.path = path
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS cache (
+                key TEXT PRIMARY KEY,
+                value TEXT NOT NULL,
+                created_at REAL NOT NULL,
+                accessed_at REAL NOT NULL
+            )
+        """)
+        self.conn.execute("CREATE INDEX IF NOT EXISTS cache_accessed_at ON cache (accessed_at)")
+        self.conn.commit()
+
+    def get(self, key, default=None):
+        """Return the cached value for key, or default on a miss or expired entry."""
+        now = time.time()
+        with self.lock:
+            row = self.conn.execute(
+                "SELECT value, created_at FROM cache WHERE key = ?", (key,)).fetchone()
+            if row is None or (self.ttl_seconds and now - row[1] > self.ttl_seconds):
+                if row is not None:
+                    self.conn.execute("DELETE FROM cache WHERE key = ?", (key,))
+                    self.conn.commit()
+                self.misses += 1
+                return default
+            self.conn.execute("UPDATE cache SET accessed_at = ? WHERE key = ?", (now, key))
+            self.conn.commit()
+            self.hits += 1
+            return json.loads(row[0])
+
+    def set(self, key, value):
+        """Store a value, evicting the least recently used entries if over capacity."""
+        now = time.time()
+        with self.lock:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO cache (key, value, created_at, accessed_at) VALUES (?, ?, ?, ?)",
+                (key, json.dumps(value), now, now))
+            if self.max_entries:
+                self.conn.execute("""
+                    DELETE FROM cache WHERE key IN (
+                        SELECT key FROM cache ORDER BY accessed_at DESC LIMIT -1 OFFSET ?
+                    )
+                """, (self.max_entries,))
+            self.conn.commit()
+
+    def clear(self):
+        with self.lock:
+            self.conn.execute("DELETE FROM cache")
+            self.conn.commit()
+
+    def __len__(self):
+        with self.lock:
+            return self.conn.execute("SELECT COUNT(*) FROM cache").fetchone()[0]
+
+    def stats(self):
+        """Return hit/miss counters for this process plus the current entry count."""
+        lookups = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / lookups if lookups else 0.0,
+            'entries': len(self)
+        }
+
+    def close(self):
+        with self.lock:
+            self.conn.close()
@@ -0,0 +1,243 @@
+"""Offline stand-ins for Gmail and HTTP services, shared by benchmark.py and the tests.
+
+FakeGmailService serves synthetic recruiter emails through the slice of the
+Gmail API recruiter_app uses. StubServer is a local HTTP server that answers
+through a function, optionally after a script of error statuses:
+
+    with StubServer(lambda method, path, payload: (200, {'organic': []})) as server:
+        server.script = [429, (503, {'Retry-After': '1'})]  # Then the function answers
+        requests.post(f"{server.url}/search", json={'q': 'acme'})
+"""
+import base64
+import json
+import random
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from email.utils import format_datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+BENCH_LABEL = 'bench/recruiters'
+
+FIRST_NAMES = ['Anna', 'Daan', 'Sophie', 'Lucas', 'Emma', 'Milan', 'Julia', 'Sem', 'Tess', 'Noah', 'Fleur', 'Bram']
+LAST_NAMES = ['de Vries', 'Jansen', 'Bakker', 'Visser', 'Smit', 'Meijer', 'de Boer', 'Mulder', 'Bos', 'Vos']
+AGENCIES = ['talentbridge', 'hiredutch', 'techrecruit', 'amsterdamjobs', 'datapeople', 'nextrole', 'codehunters']
+ROLES = ['Machine Learning Engineer', 'Data Scientist', 'Backend Developer', 'MLOps Engineer', 'AI Researcher']
+CATEGORIES = ['Computer Vision', 'NLP', 'Healthcare AI', 'Fintech', 'Robotics', 'MLOps']
+LINKEDIN_INMAIL = 'inmail-hit-reply@linkedin.com'
+
+
+# Synthetic Gmail
+
+def synthetic_sender(index, distinct_senders):
+    """(name, address) of the recruiter behind message `index`; every sender writes several emails."""
+    sender = index % distinct_senders
+    name = f"{FIRST_NAMES[sender % len(FIRST_NAMES)]} {LAST_NAMES[sender // len(FIRST_NAMES) % len(LAST_NAMES)]} {sender}"
+    if sender % 10 == 0:
+        return name, LINKEDIN_INMAIL
+    return name, f"recruiter{sender}@{AGENCIES[sender % len(AGENCIES)]}.nl"
+
+
+def synthetic_mime(index, distinct_senders, now):
+    """A recruiter email as raw MIME bytes: text and HTML alternatives, sometimes a CV attachment."""
+    rng = random.Random(index)
+    name, address = synthetic_sender(index, distinct_senders)
+    role = rng.choice(ROLES)
+    # A few messages are older than the pipeline's age cutoff
+    age_days = rng.randint(1, 365) if index % 50 else 365 * 6
+    sent = now - timedelta(days=age_days, seconds=rng.randint(0, 86400))
+    text = (f"Hi,\n\nI came across your profile and have a {role} opening at one of my clients in Amsterdam.\n"
+            f"The team works on {rng.choice(CATEGORIES)}. Would you be open to a call this week?\n\n"
+            f"Kind regards,\n{name}\n{address}\n")
+    html = "<html><body>" + "".join(f"<p>{line}</p>" for line in text.split("\n") if line) + "</body></html>"
+    boundary = f"b{index}"
+    parts = [
+        f"--{boundary}\r\nContent-Type: multipart/alternative; boundary=\"{boundary}a\"\r\n\r\n"
+        f"--{boundary}a\r\nContent-Type: text/plain; charset=utf-8\r\n\r\n{text}\r\n"
+        f"--{boundary}a\r\nContent-Type: text/html; charset=utf-8\r\n\r\n{html}\r\n"
+        f"--{boundary}a--\r\n"
+    ]
+    if index % 7 == 0:
+        attachment = base64.b64encode(rng.randbytes(3000)).decode()
+        parts.append(f"--{boundary}\r\nContent-Type: application/pdf; name=\"cv.pdf\"\r\n"
+                     f"Content-Disposition: attachment; filename=\"cv.pdf\"\r\n"
+                     f"Content-Transfer-Encoding: base64\r\n\r\n{attachment}\r\n")
+    message = (f"From: {name} <{address}>\r\nTo: me@example.com\r\nSubject: {role} opportunity\r\n"
+               f"Date: {format_datetime(sent)}\r\nMessage-ID: <{index}@bench>\r\nMIME-Version: 1.0\r\n"
+               f"Content-Type: multipart/mixed; boundary=\"{boundary}\"\r\n\r\n"
+               + "".join(parts) + f"--{boundary}--\r\n")
+    return message.encode('utf-8'), int(sent.timestamp() * 1000)
+
+
+class FakeHttpError(Exception):
+    """Looks like googleapiclient's HttpError to the batch callback (resp.status)."""
+
+    def __init__(self, status):
+        super().__init__(f"HTTP {status}")
+        self.resp = type('Response', (), {'status': status})()
+
+
+class FakeRequest:
+    def __init__(self, func):
+        self.func = func
+
+    def execute(self):
+        return self.func()
+
+
+class FakeBatch:
+    def __init__(self, service, callback):
+        self.service = service
+        self.callback = callback
+        self.requests = []
+
+    def add(self, request, request_id):
+        self.requests.append((request, request_id))
+
+    def execute(self):
+        self.service.wait()
+        for request, request_id in self.requests:
+            if self.service.rng.random() < self.service.error_rate:
+                self.callback(request_id, None, FakeHttpError(429))
+            else:
+                self.callback(request_id, request.execute(), None)
+
+
+class FakeGmailService:
+    """The slice of the Gmail API recruiter_app uses, over `count` synthetic messages.
+
+    Messages are generated on request (deterministically by index), so 100k
+    of them don't sit in memory. Every list call and batch execute waits
+    `latency` seconds; error_rate of the messages in a batch fail with 429.
+    """
+
+    def __init__(self, count, label_name=BENCH_LABEL, latency=0.0, error_rate=0.0, seed=42):
+        self.count = count
+        self.label_name = label_name
+        self.latency = latency
+        self.error_rate = error_rate
+        self.rng = random.Random(seed)
+        self.distinct_senders = max(1, count // 3)
+        self.now = datetime.now(timezone.utc)
+
+    def wait(self):
+        if self.latency:
+            time.sleep(self.latency)
+
+    def users(self):
+        return self
+
+    def labels(self):
+        return self
+
+    def messages(self):
+        return self
+
+    def history(self):
+        return self
+
+    def getProfile(self, userId):
+        return FakeRequest(lambda: {'historyId': '1000'})
+
+    def new_batch_http_request(self, callback):
+        return FakeBatch(self, callback)
+
+    def list(self, userId, labelIds=None, maxResults=100, pageToken=None, **kwargs):
+        if 'startHistoryId' in kwargs:
+            return FakeRequest(lambda: {'history': []})
+        if labelIds is None:
+            # labels().list
+            return FakeRequest(lambda: {'labels': [{'id': 'Label_1', 'name': self.label_name}]})
+
+        def page():
+            self.wait()
+            start = int(pageToken or 0)
+            end = min(self.count, start + maxResults)
+            result = {'messages': [{'id': f"m{index:07d}"} for index in range(start, end)]}
+            if end < self.count:
+                result['nextPageToken'] = str(end)
+            return result
+        return FakeRequest(page)
+
+    def get(self, userId, id, format='raw'):
+        def message():
+            raw, internal_date = synthetic_mime(int(id[1:]), self.distinct_senders, self.now)
+            return {'id': id, 'internalDate': str(internal_date), 'raw': base64.urlsafe_b64encode(raw).decode()}
+        return FakeRequest(message)
+
+
+# Stub HTTP server
+
+class StubRequestHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, *args):
+        pass
+
+    def answer(self, method):
+        length = int(self.headers.get('Content-Length', 0))
+        body = self.rfile.read(length) if length else b''
+        status, content, headers = self.server.stub.respond(method, self.path, json.loads(body) if body else {})
+        if isinstance(content, (dict, list)):
+            data, content_type = json.dumps(content).encode('utf-8'), 'application/json'
+        else:
+            data, content_type = str(content).encode('utf-8'), 'text/html; charset=utf-8'
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(data)))
+        for name, value in headers.items():
+            self.send_header(name, value)
+        self.end_headers()
+        if method != 'HEAD':
+            self.wfile.write(data)
+
+    def do_GET(self):
+        self.answer('GET')
+
+    def do_HEAD(self):
+        self.answer('HEAD')
+
+    def do_POST(self):
+        self.answer('POST')
+
+
+class StubServer:
+    """Local HTTP server on a free port that answers every request with handler(method, path, payload).
+
+    handler returns (status, content) or (status, content, headers); dict and
+    list content is sent as JSON, anything else as HTML. Entries in `script`
+    (a status, or (status, headers)) are answered first, one per request,
+    with a JSON error body. Every request is recorded in `requests` as
+    (method, path, payload).
+    """
+
+    def __init__(self, handler):
+        self.handler = handler
+        self.script = []
+        self.requests = []
+        self.lock = threading.Lock()
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), StubRequestHandler)
+        self.server.daemon_threads = True
+        self.server.stub = self
+        self.url = f"http://127.0.0.1:{self.server.server_address[1]}"
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def respond(self, method, path, payload):
+        with self.lock:
+            self.requests.append((method, path, payload))
+            scripted = self.script.pop(0) if self.script else None
+        if scripted is not None:
+            status, headers = scripted if isinstance(scripted, tuple) else (scripted, {})
+            return status, {'error': {'message': f"stub status {status}", 'type': 'stub'}}, headers
+        status, content, *headers = self.handler(method, path, payload)
+        return status, content, headers[0] if headers else {}
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
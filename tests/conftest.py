@@ -0,0 +1,38 @@
+import os
+import sys
+
+import pytest
+
+# The modules live at the repository root, not in a package
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import metrics  # noqa: E402
+
+
+@pytest.fixture(autouse=True)
+def metrics_file(tmp_path, monkeypatch):
+    """Record spans into the test's tmp_path instead of the repo's metrics.jsonl."""
+    path = str(tmp_path / 'metrics.jsonl')
+    monkeypatch.setenv('METRICS_FILE', path)
+    monkeypatch.setattr(metrics, 'METRICS_FILE', path)
+    monkeypatch.setattr(metrics, '_writer', None)
+    yield path
+    metrics.flush()
+
+
+@pytest.fixture
+def stub_server():
+    """Start StubServers with a given handler; they are closed after the test.
+
+        server = stub_server(lambda method, path, payload: (200, {'ok': True}))
+    """
+    from stubs import StubServer
+    servers = []
+
+    def start(handler):
+        server = StubServer(handler)
+        servers.append(server)
+        return server
+    yield start
+    for server in servers:
+        server.close()
@@ -0,0 +1,44 @@
+import pytest
+
+from address_extractor import find_address, find_address_in_html
+
+
+@pytest.mark.parametrize('text, expected', [
+    ("© 2024 Acme BV Herengracht 500 1017 CB Amsterdam. All rights reserved",
+     "Herengracht 500, 1017 CB Amsterdam"),
+    ("Call us at Keizersgracht 62-64, 1015 CS Amsterdam", "Keizersgracht 62-64, 1015 CS Amsterdam"),
+    ("Rozengracht 207, 1016 LZ Amsterdam Nederland", "Rozengracht 207, 1016 LZ Amsterdam"),
+    ("Acme B.V.<br>Jan van Galenstraat 56<br>1051 KM Amsterdam<br>The Netherlands",
+     "Jan van Galenstraat 56, 1051 KM Amsterdam"),
+    ("Bezoekadres Gustav Mahlerlaan 10 1082 PP Amsterdam", "Gustav Mahlerlaan 10, 1082 PP Amsterdam"),
+    ("H.J.E. Wenckebachweg 123, 1096 AM Amsterdam", "H.J.E. Wenckebachweg 123, 1096 AM Amsterdam"),
+    ("Stationsplein 1 2011 LR Den Haag, Netherlands", "Stationsplein 1, 2011 LR Den Haag"),
+])
+def test_footer_addresses(text, expected):
+    assert find_address_in_html(f"<html><body><footer>{text}</footer></body></html>") == expected
+
+
+def test_schema_org_address_is_preferred():
+    html = ('<script type="application/ld+json">{"@type": "Organization", "address": {"@type": "PostalAddress", '
+            '"streetAddress": "Herengracht 500", "postalCode": "1017CB", "addressLocality": "Amsterdam, Netherlands"}}'
+            '</script><p>Keizersgracht 62, 1015 CS Amsterdam</p>')
+    assert find_address_in_html(html) == "Herengracht 500, 1017 CB Amsterdam"
+
+
+def test_contact_page_is_checked_after_homepage():
+    pages = {
+        'https://acme.nl': '<a href="/over-ons">Over ons</a><p>We build AI.</p>',
+        'https://acme.nl/over-ons': '<p>Acme BV, Rozengracht 207, 1016 LZ Amsterdam</p>',
+    }
+    fetched = []
+
+    def fetch(url):
+        fetched.append(url)
+        return pages.get(url)
+
+    assert find_address('acme.nl', fetch=fetch) == "Rozengracht 207, 1016 LZ Amsterdam"
+    assert fetched == ['https://acme.nl', 'https://acme.nl/over-ons']
+
+
+def test_no_address():
+    assert find_address_in_html("<p>Call us on 020 123 4567</p>") is None
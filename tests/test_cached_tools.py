@@ -0,0 +1,70 @@
+from types import SimpleNamespace
+
+import pytest
+
+import cached_tools
+import sqlite_cache
+from cached_tools import CachedSerperDevTool
+from sqlite_cache import SQLiteCache
+
+
+@pytest.fixture
+def search_backend(stub_server, monkeypatch):
+    """Serper-compatible /search endpoint whose result titles count the requests so far."""
+    def handle(method, path, payload):
+        return 200, {'organic': [{'title': f"{payload['q']} {len(server.requests)}",
+                                  'link': 'https://example.nl', 'position': 1}]}
+    server = stub_server(handle)
+    monkeypatch.setenv('SERPER_API_KEY', 'test')
+    return server
+
+
+def queries(server):
+    return [payload['q'] for _, _, payload in server.requests]
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1_000_000.0]
+    monkeypatch.setattr(sqlite_cache, 'time', SimpleNamespace(time=lambda: now[0]))
+    return now
+
+
+@pytest.fixture
+def search_cache(tmp_path, monkeypatch, clock):
+    cache = SQLiteCache(str(tmp_path / 'search_cache.sqlite'), ttl_seconds=3600)
+    monkeypatch.setattr(cached_tools, '_search_cache', cache)
+    return cache
+
+
+def search(server, query):
+    tool = CachedSerperDevTool(base_url=server.url)
+    return tool._run(search_query=query)
+
+
+def test_repeated_query_is_served_from_cache(search_backend, search_cache):
+    first = search(search_backend, 'Acme AI careers')
+    # Case and whitespace differences share the cache entry
+    second = search(search_backend, '  acme ai   CAREERS ')
+    assert queries(search_backend) == ['Acme AI careers']
+    assert first['organic'] == second['organic']
+    assert (search_cache.hits, search_cache.misses) == (1, 1)
+
+
+def test_expired_entry_is_fetched_again(search_backend, search_cache, clock):
+    search(search_backend, 'Acme AI careers')
+    clock[0] += 3600 + 1
+    refreshed = search(search_backend, 'Acme AI careers')
+    assert len(search_backend.requests) == 2
+    assert refreshed['organic'][0]['title'] == 'Acme AI careers 2'
+
+
+def test_errors_are_not_cached(search_backend, search_cache):
+    search_backend.script = [500]
+    with pytest.raises(Exception):
+        search(search_backend, 'Acme AI careers')
+    assert len(search_cache) == 0
+
+    result = search(search_backend, 'Acme AI careers')
+    assert len(search_backend.requests) == 2
+    assert result['organic'][0]['title'] == 'Acme AI careers 2'
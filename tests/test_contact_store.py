@@ -0,0 +1,37 @@
+import sqlite3
+
+from contact_store import ContactStore, normalize_date
+
+
+def test_normalize_date_handles_iso_and_rfc_2822():
+    assert normalize_date('2025-02-03') == '2025-02-03'
+    assert normalize_date('Mon, 3 Feb 2025 10:12:00 +0100') == '2025-02-03'
+    # Converted to UTC before the date is taken
+    assert normalize_date('Mon, 3 Feb 2025 00:30:00 +0200') == '2025-02-02'
+    assert normalize_date('2025-02-03T23:30:00-02:00') == '2025-02-04'
+    assert normalize_date('') == ''
+    assert normalize_date('sometime last year') == 'sometime last year'
+
+
+def test_upsert_keeps_the_latest_contact_across_date_formats(tmp_path):
+    store = ContactStore(str(tmp_path / 'contacts.sqlite'))
+    store.upsert({'name': 'Anna', 'email': 'anna@talentbridge.nl', 'last_contact': '2025-03-10'})
+    # Lexically 'Mon, ...' > '2025-...', but it is the older date
+    store.upsert({'name': 'Anna', 'email': 'anna@talentbridge.nl', 'last_contact': 'Mon, 3 Feb 2025 10:12:00 +0100'})
+    store.upsert({'name': 'Anna', 'email': 'anna@talentbridge.nl', 'last_contact': 'Tue, 1 Apr 2025 09:00:00 +0200'})
+
+    rows = store.conn.execute("SELECT last_contact FROM contacts").fetchall()
+    assert rows == [('2025-04-01',)]
+
+
+def test_stored_rfc_2822_dates_are_normalised_on_open(tmp_path):
+    path = str(tmp_path / 'contacts.sqlite')
+    ContactStore(path).close()
+    conn = sqlite3.connect(path)
+    conn.execute("INSERT INTO contacts (name, email, last_contact, name_key, email_key) "
+                 "VALUES ('Bram', 'bram@talentbridge.nl', 'Mon, 3 Feb 2025 10:12:00 +0100', 'bram', 'bram@talentbridge.nl')")
+    conn.commit()
+    conn.close()
+
+    store = ContactStore(path)
+    assert store.conn.execute("SELECT last_contact FROM contacts").fetchall() == [('2025-02-03',)]
@@ -0,0 +1,48 @@
+from types import SimpleNamespace
+
+import company_analyzer
+from crew_runner import limit_llm_calls
+
+
+class CountingLimiter:
+    def __init__(self):
+        self.acquired = []
+
+    def acquire(self, tokens=0):
+        self.acquired.append(tokens)
+
+
+class FakeLLM:
+    def __init__(self):
+        self.calls = []
+
+    def call(self, messages, tools=None, callbacks=None, available_functions=None):
+        self.calls.append(messages)
+        return 'ok'
+
+
+def test_crew_llm_calls_go_through_the_limiter():
+    shared = FakeLLM()
+    crew = SimpleNamespace(agents=[SimpleNamespace(llm=shared), SimpleNamespace(llm=shared),
+                                   SimpleNamespace(llm=FakeLLM()), SimpleNamespace(llm=None)])
+    limiter = CountingLimiter()
+    limit_llm_calls(crew, limiter)
+
+    assert crew.agents[0].llm.call([{'role': 'user', 'content': 'x' * 400}], tools=None) == 'ok'
+    crew.agents[2].llm.call('hello')
+    # An LLM shared by two agents is wrapped once, so each call takes one slot
+    assert len(limiter.acquired) == 2
+    assert limiter.acquired[0] > 100
+    assert len(shared.calls) == 1
+
+
+def test_failed_company_does_not_lose_the_batch(monkeypatch):
+    def kickoff(inputs):
+        if inputs['company_name'] == 'Globex':
+            raise RuntimeError('search quota exceeded')
+        return SimpleNamespace(raw=f"I like {inputs['company_name']}'s AI work.")
+    monkeypatch.setattr(company_analyzer.analysis_runner, 'kickoff', kickoff)
+
+    rows = [('Acme', 'acme.nl', 'NLP'), ('Globex', 'globex.nl', 'Robotics'), ('Initech', 'initech.nl', 'MLOps')]
+    assert company_analyzer.analyze_companies(rows) == [
+        "I like Acme's AI work.", None, "I like Initech's AI work."]
@@ -0,0 +1,61 @@
+import csv
+import random
+
+import pytest
+
+import csv_filters
+from csv_filters import column_mask, column_predicate, filter_csv
+from geo_index import POSTCODE_RE, parse_pc4, parse_pc4s
+
+
+def regex_pc4(address):
+    matches = POSTCODE_RE.findall(address or '')
+    return int(matches[-1]) if matches else 0
+
+
+def test_parse_pc4s_matches_the_regex():
+    rng = random.Random(7)
+    alphabet = '0123456789 abZ_,-\n'
+    addresses = [''.join(rng.choice(alphabet) for _ in range(rng.randint(0, 14))) for _ in range(5000)]
+    addresses += ['', None, '1017 AB', '1017AB', '01017 AB', '10170 AB', '1017 ABC', '1017 AB_',
+                  'Herengracht 12, 1017 AB Amsterdam', '1017 AB Amsterdam, 3511 AA Utrecht', 'x\n1011 ab']
+    assert parse_pc4s(addresses).tolist() == [regex_pc4(address) for address in addresses]
+    assert parse_pc4(addresses[-2]) == 3511
+
+
+def test_parse_pc4s_falls_back_for_non_ascii():
+    addresses = ['Café Oost, 1091 GR', 'Straße 4', '1017 AB']
+    assert parse_pc4s(addresses).tolist() == [1091, 0, 1017]
+    assert parse_pc4s([]).tolist() == []
+
+
+def write_csv(path, rows, line_end='\n'):
+    with open(path, 'w', encoding='utf-8', newline='') as f:
+        csv.writer(f, lineterminator=line_end).writerows(rows)
+
+
+@pytest.mark.parametrize('line_end', ['\n', '\r\n'])
+def test_filter_csv_copies_kept_lines(tmp_path, monkeypatch, line_end):
+    monkeypatch.setattr(csv_filters, 'CHUNK_ROWS', 2)
+    source, target = tmp_path / 'in.csv', tmp_path / 'out.csv'
+    rows = [['Name', 'address', 'rank'], ['Acme', 'Dam 1, 1012 JS', '2'], ['Globex', 'Coolsingel 40, 3011 AD', '1'],
+            ['Initech', 'Weesp', '0'], ['Hooli', 'Kerkstraat 3, 1017 GB', '3'], ['Short']]
+    write_csv(source, rows, line_end)
+    lines = source.read_text(encoding='utf-8').splitlines(keepends=True)
+
+    in_amsterdam = column_mask('address', lambda values: [value.startswith('Dam') or '1017' in value for value in values])
+    is_ranked = column_predicate('rank', lambda rank: rank not in ('', '0'))
+    assert filter_csv(source, target, in_amsterdam, is_ranked) == (2, 5)
+    assert target.read_text(encoding='utf-8') == ''.join([lines[0], lines[1], lines[4]])
+
+
+def test_filter_csv_handles_records_spanning_lines(tmp_path, monkeypatch):
+    monkeypatch.setattr(csv_filters, 'CHUNK_ROWS', 2)
+    source, target = tmp_path / 'in.csv', tmp_path / 'out.csv'
+    rows = [['Name', 'address'], ['Acme', 'Dam 1\n1012 JS'], ['Globex', '3011 AD'], ['Hooli', '1017 GB']]
+    write_csv(source, rows)
+
+    kept, read = filter_csv(source, target, column_predicate('address', lambda address: '10' in address))
+    assert (kept, read) == (2, 3)
+    with open(target, encoding='utf-8', newline='') as f:
+        assert list(csv.reader(f)) == [rows[0], rows[1], rows[3]]
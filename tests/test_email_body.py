@@ -0,0 +1,56 @@
+from email_body import clean_body
+
+
+def test_from_line_in_body_is_kept():
+    body = ("Hi,\n\n"
+            "From: our Amsterdam office we are hiring a Machine Learning Engineer.\n"
+            "The role is hybrid, three days a week on site.\n\n"
+            "Best,\nAnna")
+    cleaned = clean_body(body)
+    assert "From: our Amsterdam office we are hiring" in cleaned
+    assert "three days a week on site" in cleaned
+
+
+def test_forwarded_email_keeps_forwarded_content():
+    body = ("---------- Forwarded message ---------\n"
+            "From: Anna de Vries <anna@talentbridge.nl>\n"
+            "Date: Mon, 3 Feb 2025 10:12:00 +0100\n"
+            "Subject: Data Scientist opportunity\n"
+            "To: me@example.com\n\n"
+            "Hi,\n\nI have a Data Scientist opening at a client in Amsterdam.\n")
+    cleaned = clean_body(body)
+    assert "Data Scientist opening at a client in Amsterdam" in cleaned
+    # The original sender is the recruiter, not the person who forwarded the email
+    assert "From: Anna de Vries <anna@talentbridge.nl>" in cleaned
+    assert "Date: Mon, 3 Feb 2025 10:12:00 +0100" in cleaned
+    assert "me@example.com" not in cleaned
+    assert "Forwarded message" not in cleaned
+
+
+def test_outlook_quote_header_ends_body():
+    body = ("Thanks, Thursday works for me.\n\n"
+            "From: Anna de Vries <anna@talentbridge.nl>\n"
+            "Sent: Monday, 3 February 2025 10:12\n"
+            "To: me@example.com\n"
+            "Subject: RE: Data Scientist opportunity\n\n"
+            "Earlier message")
+    assert clean_body(body) == "Thanks, Thursday works for me."
+
+
+def test_reply_marker_and_quoted_lines_are_dropped():
+    body = "New role below.\n> quoted line\nOn Mon, 3 Feb 2025 Anna wrote:\nOld text"
+    assert clean_body(body) == "New role below."
+
+
+def test_signature_keeps_the_recruiters_details():
+    body = ("Hi,\n\nI have a Data Scientist opening.\n\n"
+            "-- \n"
+            "Anna de Vries\n"
+            "Senior Recruiter\n"
+            "Talentbridge BV\n"
+            "+31 20 123 4567\n"
+            "This email and any attachments are confidential.\n"
+            "If you received it in error, please delete it.")
+    cleaned = clean_body(body)
+    assert "Anna de Vries\nSenior Recruiter\nTalentbridge BV\n+31 20 123 4567" in cleaned
+    assert "confidential" not in cleaned
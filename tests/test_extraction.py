@@ -0,0 +1,143 @@
+import json
+import re
+import threading
+import time
+
+import pytest
+
+import recruiter_app
+from contact_store import ContactStore
+from llm_client import LLMResponse
+from sqlite_cache import SQLiteCache
+
+
+class ScriptedClient:
+    """LLM client answering each complete() call with the next scripted text."""
+
+    def __init__(self, *texts):
+        self.texts = list(texts)
+        self.prompts = []
+
+    def complete(self, model, system, prompt):
+        self.prompts.append(prompt)
+        return LLMResponse(text=self.texts.pop(0))
+
+
+class SlowClient:
+    """LLM client that takes longer for earlier emails, so answers finish out of order."""
+
+    def __init__(self, count):
+        self.count = count
+        self.calls = []
+        self.running = 0
+        self.max_running = 0
+        self.lock = threading.Lock()
+
+    def complete(self, model, system, prompt):
+        index = int(re.search(r'Recruiter(\d+)', prompt).group(1))
+        with self.lock:
+            self.calls.append(index)
+            self.running += 1
+            self.max_running = max(self.max_running, self.running)
+        time.sleep(0.01 * (self.count - index))
+        with self.lock:
+            self.running -= 1
+        return LLMResponse(text=json.dumps(contact(f"Recruiter{index}", f"r{index}@talentbridge.nl")))
+
+
+def email(message_id, sender):
+    return {'message_id': message_id, 'date': 'Mon, 3 Feb 2025 10:12:00 +0100', 'sender': sender,
+            'subject': 'Data Scientist opportunity', 'body': 'I have a Data Scientist opening.'}
+
+
+def contact(name, address, **extra):
+    return dict(name=name, email=address, company='Talentbridge', last_contact='2025-02-03',
+                job_type='Data Scientist', **extra)
+
+
+@pytest.fixture
+def llm_cache(tmp_path, monkeypatch):
+    cache = SQLiteCache(str(tmp_path / 'llm_cache.sqlite'))
+    monkeypatch.setattr(recruiter_app, '_llm_cache', cache)
+    return cache
+
+
+@pytest.fixture
+def client(monkeypatch):
+    scripted = ScriptedClient()
+    monkeypatch.setattr(recruiter_app, 'get_llm_client', lambda: scripted)
+    return scripted
+
+
+def test_batch_fallback_looks_up_the_cache_once(llm_cache, client):
+    batch = [email('m1', 'Anna <anna@talentbridge.nl>'), email('m2', 'Bram <bram@talentbridge.nl>')]
+    # The batch answer misses m2, which is then extracted on its own
+    client.texts = [json.dumps([contact('Anna', 'anna@talentbridge.nl', message_id='m1')]),
+                    json.dumps(contact('Bram', 'bram@talentbridge.nl'))]
+
+    results = recruiter_app.extract_recruiter_info_batch(batch)
+
+    assert [result['name'] for result in results] == ['Anna', 'Bram']
+    assert len(client.prompts) == 2
+    assert (llm_cache.hits, llm_cache.misses) == (0, 2)
+    assert len(llm_cache) == 2
+
+
+def test_invalid_extraction_is_not_cached(llm_cache, client):
+    client.texts = [json.dumps({'name': 'Anna'})]
+    info = recruiter_app.extract_recruiter_info(email('m1', 'Anna <anna@talentbridge.nl>'))
+
+    assert info == recruiter_app.fallback_recruiter_info(email('m1', 'Anna <anna@talentbridge.nl>'))
+    assert len(llm_cache) == 0
+
+
+def test_single_extraction_is_served_from_cache(llm_cache, client):
+    client.texts = [json.dumps(contact('Anna', 'anna@talentbridge.nl'))]
+    first = recruiter_app.extract_recruiter_info(email('m1', 'Anna <anna@talentbridge.nl>'))
+    second = recruiter_app.extract_recruiter_info(email('m1', 'Anna <anna@talentbridge.nl>'))
+
+    assert first == second
+    assert len(client.prompts) == 1
+    assert (llm_cache.hits, llm_cache.misses) == (1, 1)
+
+
+def test_concurrent_extraction_keeps_input_order(llm_cache, monkeypatch):
+    emails = [email(f"m{index}", f"Recruiter{index} <r{index}@talentbridge.nl>") for index in range(12)]
+    slow = SlowClient(len(emails))
+    monkeypatch.setattr(recruiter_app, 'get_llm_client', lambda: slow)
+
+    results = list(recruiter_app.iter_extracted_recruiter_info(emails, workers=4, batch_tokens=0))
+
+    assert [email_data['message_id'] for email_data, _ in results] == [f"m{index}" for index in range(12)]
+    assert [info['name'] for _, info in results] == [f"Recruiter{index}" for index in range(12)]
+    assert sorted(slow.calls) == list(range(12))  # One request per email, none repeated
+    assert slow.max_running > 1
+
+
+def test_contact_without_email_uses_the_sender():
+    info = contact('Anna', '')
+    stored = recruiter_app.with_contact_email(info, email('m1', 'Anna de Vries <Anna@Talentbridge.nl>'))
+    assert stored == dict(info, email='Anna@Talentbridge.nl')
+    assert recruiter_app.with_contact_email(contact('Anna', 'anna@talentbridge.nl'), email('m1', '')) is not None
+    assert recruiter_app.with_contact_email(info, email('m1', 'undisclosed-recipients:;')) is None
+
+
+def test_failed_extraction_is_not_marked_processed(tmp_path):
+    store = ContactStore(str(tmp_path / 'contacts.sqlite'))
+    store.upsert(contact('Known', 'known@talentbridge.nl'))
+    sync_state = {'history_id': None, 'processed_ids': set()}
+    emails = [email('m1', 'Known <known@talentbridge.nl>'), email('m2', 'Anna <anna@talentbridge.nl>'),
+              email('m3', 'Bram <bram@talentbridge.nl>')]
+
+    new_emails = list(recruiter_app.iter_new_emails(emails, store, sync_state))
+    assert [email_data['message_id'] for email_data in new_emails] == ['m2', 'm3']
+    assert sync_state['processed_ids'] == {'m1'}  # Known sender, nothing to extract
+
+    extracted = [(new_emails[0], contact('Anna', 'anna@talentbridge.nl')),
+                 (new_emails[1], recruiter_app.fallback_recruiter_info(new_emails[1]))]
+    added, failed = recruiter_app.store_extracted_contacts(extracted, store, sync_state)
+    assert [info['name'] for info in added] == ['Anna']
+    assert failed == 1
+    # m3 is extracted again next run, and its placeholder contact isn't stored
+    assert sync_state['processed_ids'] == {'m1', 'm2'}
+    assert not store.has_email('bram@talentbridge.nl')
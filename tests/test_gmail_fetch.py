@@ -0,0 +1,86 @@
+import pytest
+
+import recruiter_app
+from stubs import FakeGmailService, FakeHttpError
+
+
+class CountingService(FakeGmailService):
+    """Fake Gmail that records list calls and batch sizes, and fails chosen messages a number of times."""
+
+    def __init__(self, count, failures=None, status=429, **kwargs):
+        super().__init__(count, **kwargs)
+        self.failures = dict(failures or {})  # message ID -> times it fails before succeeding
+        self.status = status
+        self.list_calls = []
+        self.batch_sizes = []
+
+    def list(self, userId, labelIds=None, maxResults=100, pageToken=None, **kwargs):
+        if labelIds is not None:
+            self.list_calls.append((maxResults, pageToken))
+        return super().list(userId, labelIds=labelIds, maxResults=maxResults, pageToken=pageToken, **kwargs)
+
+    def new_batch_http_request(self, callback):
+        def handle(request_id, response, exception):
+            if self.failures.get(request_id, 0) > 0:
+                self.failures[request_id] -= 1
+                callback(request_id, None, FakeHttpError(self.status))
+            else:
+                callback(request_id, response, exception)
+        batch = super().new_batch_http_request(handle)
+        execute = batch.execute
+
+        def counted_execute():
+            self.batch_sizes.append(len(batch.requests))
+            execute()
+        batch.execute = counted_execute
+        return batch
+
+
+@pytest.fixture
+def sleeps(monkeypatch):
+    delays = []
+    monkeypatch.setattr(recruiter_app.time, 'sleep', delays.append)
+    return delays
+
+
+def test_message_ids_follow_page_tokens():
+    service = CountingService(1200)
+    pages = list(recruiter_app.iter_message_ids(service, 'Label_1', page_size=500))
+    assert [len(page) for page in pages] == [500, 500, 200]
+    assert [token for _, token in service.list_calls] == [None, '500', '1000']
+    assert len({message_id for page in pages for message_id in page}) == 1200
+
+
+def test_message_ids_stop_at_max_results():
+    service = CountingService(1200)
+    pages = list(recruiter_app.iter_message_ids(service, 'Label_1', max_results=700, page_size=500))
+    assert [len(page) for page in pages] == [500, 200]
+    assert len(service.list_calls) == 2
+
+
+def test_batch_partial_failure_is_retried(sleeps):
+    ids = [f"m{index:07d}" for index in range(120)]
+    service = CountingService(120, failures={'m0000003': 1, 'm0000077': 1})
+    fetched = recruiter_app.fetch_raw_messages(service, ids, batch_size=50)
+    assert set(fetched) == set(ids)
+    # Three batches, then one retry batch with only the two failed messages
+    assert service.batch_sizes == [50, 50, 20, 2]
+    assert sleeps == [1]
+
+
+def test_rate_limited_messages_back_off_exponentially(sleeps):
+    ids = [f"m{index:07d}" for index in range(10)]
+    service = CountingService(10, failures={'m0000004': 10})
+    fetched = recruiter_app.fetch_raw_messages(service, ids, batch_size=50, max_retries=3)
+    assert 'm0000004' not in fetched
+    assert len(fetched) == 9
+    assert sleeps == [1, 2, 4]
+
+
+def test_non_retryable_errors_are_not_retried(sleeps):
+    ids = [f"m{index:07d}" for index in range(10)]
+    service = CountingService(10, failures={'m0000004': 1}, status=404)
+    fetched = recruiter_app.fetch_raw_messages(service, ids, batch_size=50)
+    assert len(fetched) == 9
+    assert service.batch_sizes == [10]
+    assert sleeps == []
@@ -0,0 +1,98 @@
+import httplib2
+import pytest
+from googleapiclient.errors import HttpError
+
+import recruiter_app
+from stubs import BENCH_LABEL, FakeGmailService, FakeHttpError, FakeRequest
+
+
+class SyncService(FakeGmailService):
+    """Fake Gmail with a history listing, an optional expiry on one history page, and broken or failing messages."""
+
+    def __init__(self, count, history_pages=(), expire_on_page=None, failing_ids=(), broken_ids=()):
+        super().__init__(count)
+        self.history_pages = list(history_pages)
+        self.expire_on_page = expire_on_page
+        self.failing_ids = set(failing_ids)
+        self.broken_ids = set(broken_ids)  # Fetched, but without a raw body to parse
+
+    def get(self, userId, id, format='raw'):
+        if id in self.broken_ids:
+            return FakeRequest(lambda: {'id': id})
+        return super().get(userId, id, format=format)
+
+    def list(self, userId, labelIds=None, maxResults=100, pageToken=None, **kwargs):
+        if 'startHistoryId' not in kwargs:
+            return super().list(userId, labelIds=labelIds, maxResults=maxResults, pageToken=pageToken, **kwargs)
+
+        def page():
+            number = int(pageToken or 0)
+            if number == self.expire_on_page:
+                raise HttpError(httplib2.Response({'status': 404}), b'{}')
+            result = {'history': [{'messagesAdded': [
+                {'message': {'id': message_id}} for message_id in self.history_pages[number]]}]}
+            if number + 1 < len(self.history_pages):
+                result['nextPageToken'] = str(number + 1)
+            return result
+        return FakeRequest(page)
+
+    def new_batch_http_request(self, callback):
+        def handle(request_id, response, exception):
+            if request_id in self.failing_ids:
+                callback(request_id, None, FakeHttpError(500))
+            else:
+                callback(request_id, response, exception)
+        return super().new_batch_http_request(handle)
+
+
+@pytest.fixture(autouse=True)
+def no_backoff(monkeypatch):
+    monkeypatch.setattr(recruiter_app.time, 'sleep', lambda seconds: None)
+
+
+def sync(service, history_id=None, max_results=None):
+    state = {'history_id': history_id, 'processed_ids': set()}
+    emails = list(recruiter_app.iter_recruiter_emails(
+        service, label_name=BENCH_LABEL, max_results=max_results, sync_state=state))
+    return [email['message_id'] for email in emails], state
+
+
+def test_complete_sync_advances_checkpoint():
+    ids, state = sync(SyncService(120))
+    assert len(ids) == 120 - 3  # Every 50th synthetic message is too old
+    assert state['next_history_id'] == '1000'
+
+
+def test_unfetched_message_keeps_checkpoint():
+    ids, state = sync(SyncService(20, failing_ids={'m0000007'}))
+    assert 'm0000007' not in ids
+    assert 'next_history_id' not in state
+
+
+def test_unparseable_message_keeps_checkpoint():
+    ids, state = sync(SyncService(20, broken_ids={'m0000007'}))
+    assert 'm0000007' not in ids
+    assert len(ids) == 20 - 1 - 1  # m0000000 is too old
+    assert 'next_history_id' not in state
+
+
+def test_listing_cut_off_by_max_results_keeps_checkpoint():
+    _, state = sync(SyncService(30), max_results=10)
+    assert 'next_history_id' not in state
+
+    _, state = sync(SyncService(5), max_results=10)
+    assert state['next_history_id'] == '1000'
+
+
+def test_history_expiring_on_later_page_falls_back_to_full_sync():
+    service = SyncService(5, history_pages=[['m0000001', 'm0000002'], ['m0000003']], expire_on_page=1)
+    ids, state = sync(service, history_id='900')
+    assert sorted(ids) == ['m0000001', 'm0000002', 'm0000003', 'm0000004']
+    assert state['next_history_id'] == '1000'
+
+
+def test_incremental_sync_lists_only_history():
+    service = SyncService(50, history_pages=[['m0000001'], ['m0000002', 'm0000001']])
+    ids, state = sync(service, history_id='900')
+    assert ids == ['m0000001', 'm0000002']
+    assert state['next_history_id'] == '1000'
@@ -0,0 +1,100 @@
+import threading
+import time
+
+import pytest
+
+from pipeline import CompanyTable, Stage, import_csv, run_pipeline, topological_order, upstream_stages
+from result_journal import company_key
+
+
+class Recorder:
+    """Stage run functions that log when they start and finish."""
+
+    def __init__(self):
+        self.events = []
+        self.lock = threading.Lock()
+
+    def stage(self, name, column, value, delay=0.0, fail=False):
+        def run(rows):
+            with self.lock:
+                self.events.append(('start', name, len(rows)))
+            time.sleep(delay)
+            if fail:
+                raise RuntimeError(f"{name} broke")
+            for row in rows:
+                yield row['_key'], {column: value(row)}
+            with self.lock:
+                self.events.append(('finish', name, len(rows)))
+        return run
+
+    def started(self, name):
+        return [event for event in self.events if event[:2] == ('start', name)]
+
+
+@pytest.fixture
+def table(tmp_path):
+    table = CompanyTable(str(tmp_path / 'companies.sqlite'))
+    table.upsert_companies([(company_key(name, website), {'Name': name, 'Website': website})
+                            for name, website in [('Acme', 'acme.nl'), ('Globex', 'globex.nl')]])
+    yield table
+    table.close()
+
+
+def chain(recorder, first_delay=0.0, fail_first=False):
+    return [
+        Stage('location', ['Name'], ['address'],
+              recorder.stage('location', 'address', lambda row: f"{row['Name']} street 1",
+                             delay=first_delay, fail=fail_first)),
+        Stage('analysis', ['address'], ['summary'],
+              recorder.stage('analysis', 'summary', lambda row: row['address'].upper()), depends_on=['location']),
+        Stage('letters', ['summary'], ['letter'],
+              recorder.stage('letters', 'letter', lambda row: f"Dear {row['summary']}"), depends_on=['analysis']),
+    ]
+
+
+def test_upstream_stages_are_transitive():
+    stages = chain(Recorder())
+    assert upstream_stages(stages) == {'location': set(), 'analysis': {'location'},
+                                       'letters': {'location', 'analysis'}}
+    assert [stage.name for stage in topological_order(list(reversed(stages)))] == ['location', 'analysis', 'letters']
+
+
+def test_stage_waits_for_selected_stage_through_unselected_one(table, capsys):
+    run_pipeline(table, chain(Recorder()))
+    capsys.readouterr()
+
+    recorder = Recorder()
+    stages = chain(recorder, first_delay=0.2)
+    stages[0].version = '2'  # location recomputes
+    assert run_pipeline(table, stages, selected=['location', 'letters']) == set()
+    lines = capsys.readouterr().out.splitlines()
+    # letters looks at the table only after location is done, even though analysis sits in between
+    location_done = next(i for i, line in enumerate(lines) if line.startswith('[location] computed'))
+    letters_start = next(i for i, line in enumerate(lines) if line.startswith('[letters]'))
+    assert location_done < letters_start
+    assert recorder.started('analysis') == []
+
+
+def test_second_run_computes_nothing(table):
+    run_pipeline(table, chain(Recorder()))
+    recorder = Recorder()
+    run_pipeline(table, chain(recorder))
+    assert recorder.events == []
+
+
+def test_failed_stage_skips_dependents_through_unselected_stage(table):
+    recorder = Recorder()
+    failed = run_pipeline(table, chain(recorder, fail_first=True), selected=['location', 'letters'])
+    assert failed == {'location', 'letters'}
+    assert recorder.started('letters') == []
+
+
+def test_import_reuses_results_from_csv(table, tmp_path):
+    filename = tmp_path / 'ai_companies2.csv'
+    filename.write_text("Name,Website,address\nAcme,acme.nl,Herengracht 1\n", encoding='utf-8')
+    new, seeded = import_csv(table, str(filename), chain(Recorder()))
+    assert (new, seeded) == (0, 1)
+
+    recorder = Recorder()
+    run_pipeline(table, chain(recorder), selected=['location'])
+    assert recorder.started('location') == [('start', 'location', 1)]  # Only Globex is left
@@ -0,0 +1,108 @@
+import threading
+import time
+from types import SimpleNamespace
+
+import pytest
+
+import llm_client
+from llm_client import OpenAIProvider
+from rate_limiter import RateLimiter, TokenBucket
+
+
+def test_token_bucket_paces_concurrent_callers():
+    bucket = TokenBucket(per_minute=6000, capacity=10)  # 100 tokens/s after a burst of 10
+    taken = []
+    lock = threading.Lock()
+    start = time.monotonic()
+
+    def worker():
+        for _ in range(5):
+            bucket.acquire(1)
+            with lock:
+                taken.append(time.monotonic() - start)
+
+    threads = [threading.Thread(target=worker) for _ in range(10)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len(taken) == 50
+    # 40 tokens beyond the burst at 100/s
+    assert 0.35 <= max(taken) < 2.0
+    # The bucket never hands out more than its burst plus what has been refilled
+    for count, elapsed in enumerate(sorted(taken), 1):
+        assert count <= 10 + elapsed * 100 + 1
+
+
+def test_rate_limiter_applies_token_budget():
+    limiter = RateLimiter(requests_per_minute=60000, tokens_per_minute=6000)  # 100 tokens/s
+    start = time.monotonic()
+    limiter.acquire(tokens=6000)  # A full minute's budget is available as a burst
+    limiter.acquire(tokens=60)
+    assert 0.5 <= time.monotonic() - start < 2.0
+
+
+@pytest.fixture
+def stub_llm(stub_server):
+    """OpenAI-compatible chat endpoint; set `latency` to slow down its answers."""
+    def handle(method, path, payload):
+        time.sleep(server.latency)
+        return 200, {
+            'id': 'stub', 'object': 'chat.completion', 'created': 0, 'model': 'stub',
+            'choices': [{'index': 0, 'message': {'role': 'assistant', 'content': 'ok'}, 'finish_reason': 'stop'}],
+            'usage': {'prompt_tokens': 12, 'completion_tokens': 3, 'total_tokens': 15},
+        }
+    server = stub_server(handle)
+    server.latency = 0.0
+    return server
+
+
+@pytest.fixture
+def sleeps(monkeypatch):
+    delays = []
+    # Only llm_client's backoff is faked; the HTTP client keeps the real time module
+    monkeypatch.setattr(llm_client, 'time', SimpleNamespace(perf_counter=time.perf_counter, sleep=delays.append))
+    return delays
+
+
+def provider_for(server, **kwargs):
+    return OpenAIProvider(api_key='test', base_url=f"{server.url}/v1", **kwargs)
+
+
+def test_retries_rate_limits_and_server_errors(stub_llm, sleeps):
+    stub_llm.script = [(429, {'Retry-After': '2'}), 503]
+    response = provider_for(stub_llm).complete('gpt-4o-mini', 'system', 'prompt')
+    assert response.text == 'ok'
+    assert (response.input_tokens, response.output_tokens) == (12, 3)
+    assert len(stub_llm.requests) == 3
+    # Retry-After is honoured; without it the backoff is 2 ** attempt plus jitter
+    assert sleeps[0] == 2.0
+    assert 2.0 <= sleeps[1] < 3.0
+
+
+def test_gives_up_after_max_retries(stub_llm, sleeps):
+    stub_llm.script = [500] * 5
+    with pytest.raises(Exception) as error:
+        provider_for(stub_llm, max_retries=2).complete('gpt-4o-mini', 'system', 'prompt')
+    assert getattr(error.value, 'status_code', None) == 500
+    assert len(stub_llm.requests) == 3
+    assert len(sleeps) == 2
+
+
+def test_client_errors_are_not_retried(stub_llm, sleeps):
+    stub_llm.script = [400]
+    with pytest.raises(Exception):
+        provider_for(stub_llm).complete('gpt-4o-mini', 'system', 'prompt')
+    assert len(stub_llm.requests) == 1
+    assert sleeps == []
+
+
+def test_latency_is_recorded(stub_llm):
+    stub_llm.latency = 0.05
+    provider = provider_for(stub_llm)
+    for _ in range(3):
+        provider.complete('gpt-4o-mini', 'system', 'prompt')
+    stats = provider.latency_stats()
+    assert stats['calls'] == 3
+    assert stats['p50'] >= 0.05
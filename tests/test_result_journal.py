@@ -0,0 +1,36 @@
+from result_journal import ResultJournal
+
+
+def test_append_after_torn_non_ascii_line(tmp_path):
+    path = tmp_path / 'journal.jsonl'
+    path.write_text('{"key": "a", "record": {"address": "x"}}\n', encoding='utf-8')
+    # A crash mid-write leaves half a record that ends inside 'é'
+    with open(path, 'ab') as f:
+        f.write('{"key": "b", "record": {"address": "Café'.encode('utf-8')[:-1])
+
+    journal = ResultJournal(path)
+    journal.append('c', {'address': 'Café Amsterdam'})
+    journal.close()
+
+    assert journal.load() == {'a': {'address': 'x'}, 'c': {'address': 'Café Amsterdam'}}
+
+
+def test_append_to_complete_journal_adds_no_blank_line(tmp_path):
+    path = tmp_path / 'journal.jsonl'
+    journal = ResultJournal(path)
+    journal.append('a', {'address': 'Café'})
+    journal.close()
+    journal.append('b', {'address': 'Damrak 1'})
+    journal.close()
+
+    assert path.read_text(encoding='utf-8').count('\n') == 2
+    assert set(journal.load()) == {'a', 'b'}
+
+
+def test_compact_drops_keys_saved_elsewhere(tmp_path):
+    journal = ResultJournal(str(tmp_path / 'journal.jsonl'))
+    journal.append('acme|acme.nl', {'address': 'Herengracht 1'})
+    journal.append('globex|globex.nl', {'address': 'Damrak 2'})
+    journal.append('acme|acme.nl', {'address': 'Herengracht 500'})
+    assert journal.compact(drop={'globex|globex.nl'}) == 1
+    assert journal.load() == {'acme|acme.nl': {'address': 'Herengracht 500'}}